@@ -1,4 +1,3 @@
-from cookiecutter.main import cookiecutter
 import typer
 import json
 
@@ -23,6 +22,8 @@ def create_project(
     """
     Scaffold your new game project from a template.
     """
+    # cookiecutter (jinja2, requests) is only needed once a project is actually created
+    from cookiecutter.main import cookiecutter
     extra_context = json.loads(extra_context) if extra_context else None
     
     cookiecutter(
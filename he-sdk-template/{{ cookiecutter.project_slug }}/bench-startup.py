@@ -0,0 +1,99 @@
+import argparse
+import json
+import os
+import pathlib
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+# Cold start check for he-admin.py: runs commands that don't need the sdk in fresh interpreters,
+# fails if one of them imports a heavy module, or if its median time is more than --max-ms over a bare
+# `python -c pass`, so the budget doesn't depend on how fast the machine starts python.
+# tests/test_startup.py runs it with the default budget.
+#
+#   python bench-startup.py [--runs 10] [--max-ms 400]
+
+HE_ADMIN = pathlib.Path(__file__).parent.joinpath('he-admin.py')
+
+# the help commands add about 230ms to a bare interpreter start, mostly importing typer, click and rich
+DEFAULT_MAX_MS = 400
+
+COMMANDS = [
+    ['--help'],
+    ['collect', '--help'],
+    ['export', '--help'],
+    ['create-dataclass', '--help'],
+]
+
+# what the commands above must not import
+HEAVY_MODULES = [
+    '{{ cookiecutter.project_slug }}.sdk.dataloader',
+    '{{ cookiecutter.project_slug }}.sdk.client',
+    '{{ cookiecutter.project_slug }}.sdk.models',
+    'pydantic',
+    'requests',
+    'websocket',
+    'multiprocessing',
+]
+
+_PROBE = """
+import atexit, json, runpy, sys
+def _dump(path=sys.argv[1]):
+    with open(path, 'w') as f:
+        json.dump(sorted(sys.modules), f)
+atexit.register(_dump)
+script = sys.argv[2]
+sys.argv = sys.argv[2:]
+sys.path.insert(0, __import__('os').path.dirname(script))
+runpy.run_path(script, run_name='__main__')
+"""
+
+
+def _run(args, modules_path=None) -> float:
+    if modules_path is None:
+        cmd = [sys.executable, str(HE_ADMIN)] + args
+    else:
+        cmd = [sys.executable, '-c', _PROBE, modules_path, str(HE_ADMIN)] + args
+    # cold start is measured, not forwarding to a running daemon
+    env = dict(os.environ, HE_ADMIN_NO_DAEMON='1')
+    started = time.perf_counter()
+    subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True, env=env)
+    return (time.perf_counter() - started) * 1000
+
+
+def _time_python() -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'pass'], check=True)
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='he-admin.py cold start benchmark')
+    parser.add_argument('--runs', type=int, default=10, help='Runs per command')
+    parser.add_argument('--max-ms', type=float, default=DEFAULT_MAX_MS,
+                        help='Fail if any median is more than this many milliseconds over python -c pass')
+    args = parser.parse_args()
+    #
+    baseline = statistics.median(_time_python() for _ in range(args.runs))
+    print(f"{'python -c pass':<32} {baseline:8.1f} ms")
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        modules_path = os.path.join(tmp, 'modules.json')
+        for command in COMMANDS:
+            _run(command, modules_path)
+            with open(modules_path) as f:
+                loaded = set(json.load(f))
+            heavy = [name for name in HEAVY_MODULES if name in loaded]
+            median = statistics.median(_run(command) for _ in range(args.runs))
+            over = median - baseline > args.max_ms
+            print(f"{' '.join(command):<32} {median:8.1f} ms  (+{median - baseline:.1f})"
+                  + (f"  imports {', '.join(heavy)}" if heavy else '') + ('  over budget' if over else ''))
+            failed = failed or bool(heavy) or over
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
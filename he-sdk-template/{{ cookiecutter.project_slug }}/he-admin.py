@@ -1,5 +1,12 @@
-from {{ cookiecutter.project_slug }}.cli import cli_app
+import sys
+
+from {{ cookiecutter.project_slug }}.sdk.daemon import forward
 
 
 if __name__ == "__main__":
+    # a running `he-admin.py daemon` takes the command, otherwise it runs here
+    code = forward(sys.argv[1:])
+    if code is not None:
+        sys.exit(code)
+    from {{ cookiecutter.project_slug }}.cli import cli_app
     cli_app()
@@ -0,0 +1,197 @@
+import json
+import queue
+import sys
+import textwrap
+import threading
+import uuid
+import weakref
+
+import pytest
+import websocket
+
+from {{ cookiecutter.project_slug }}.sdk import ws as ws_module
+from {{ cookiecutter.project_slug }}.sdk.client import HEClient
+from {{ cookiecutter.project_slug }}.sdk.models import BaseData, Inventory
+
+SDK = '{{ cookiecutter.project_slug }}.sdk'
+
+
+class FakeFrame(object):
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeSocket(object):
+    # the websocket side of the backend: a finished job is announced to its subscriber, frames put on
+    # `incoming` are received by the listener thread and sent messages are kept in `sent`
+    def __init__(self):
+        self.incoming = queue.Queue()
+        self.sent = []
+        self._lock = threading.Lock()
+        self._subscribed = set()
+        self._finished = {}
+        self.answer_pings = True
+
+    def send(self, msg):
+        msg = json.loads(msg)
+        self.sent.append(msg)
+        if msg.get('event') == 'subscribe':
+            job_id = msg['subscription'].split('.', 1)[1]
+            with self._lock:
+                self._subscribed.add(job_id)
+                finished = self._finished.get(job_id)
+            if finished is not None:
+                self._push(finished)
+
+    def ping(self, payload):
+        if self.answer_pings:
+            self.incoming.put((websocket.ABNF.OPCODE_PONG, FakeFrame(payload.encode())))
+
+    def recv_data_frame(self, control_frame):
+        return self.incoming.get()
+
+    def close(self):
+        self.incoming.put((websocket.ABNF.OPCODE_CLOSE, FakeFrame(b'')))
+
+    def shutdown(self):
+        self.close()
+
+    def finish(self, job_id, retval=None, success=True):
+        msg = dict(event='message', subscription=f'jobs.{job_id}',
+                   data=dict(status='success' if success else 'failed', retval=retval))
+        with self._lock:
+            self._finished[job_id] = msg
+            subscribed = job_id in self._subscribed
+        if subscribed:
+            self._push(msg)
+
+    def _push(self, msg):
+        self.incoming.put((websocket.ABNF.OPCODE_TEXT, FakeFrame(json.dumps(msg).encode())))
+
+
+class FakeResponse(object):
+    def __init__(self, status_code=200, body=b'', json_data=None, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self._body = body
+        self._json = json_data
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def json(self):
+        return self._json
+
+    @property
+    def text(self):
+        return json.dumps(self._json)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise Exception(f"HTTP {self.status_code}")
+
+    def iter_content(self, chunk_size):
+        for pos in range(0, len(self._body), chunk_size):
+            yield self._body[pos:pos + chunk_size]
+
+
+class FakeBackend(object):
+    # the HTTP side of the backend, in place of HEClient's transport: every POST starts a job,
+    # which finishes at once with `retvals[endpoint](body)` unless its endpoint is in `held`
+    def __init__(self, sock):
+        self.sock = sock
+        self.posts = []
+        self.files = {}
+        self.retvals = {}
+        self.held = set()
+        self.jobs = []
+        self.fail = lambda endpoint, body: False
+
+    def get(self, url, headers=None, stream=False, **kwargs):
+        if url.endswith('/ws/ticket'):
+            return FakeResponse(json_data={'ticket': 'T'})
+        elif '/file/' in url:
+            return FakeResponse(json_data={'url': f"blob://{url.rsplit('/', 1)[1]}"})
+        elif url.startswith('blob://'):
+            body = self.files[url[len('blob://'):]]
+            return FakeResponse(body=body, headers={'Content-Length': str(len(body))})
+        return FakeResponse(404)
+
+    def post(self, url, data=None, headers=None, **kwargs):
+        if hasattr(data, 'read'):
+            body = data.read()
+        elif isinstance(data, (bytes, str)) or data is None:
+            body = data
+        else:
+            body = b''.join(data)
+        endpoint = url.rsplit('/', 1)[1]
+        self.posts.append((endpoint, dict(headers or {}), body))
+        job_id = uuid.uuid4().hex
+        self.jobs.append((endpoint, job_id, body))
+        if endpoint not in self.held:
+            self.finish(endpoint, job_id, body)
+        return FakeResponse(json_data={'JobId': job_id})
+
+    def finish(self, endpoint, job_id, body):
+        retval = self.retvals.get(endpoint, lambda body: {})(body)
+        self.sock.finish(job_id, retval, success=not self.fail(endpoint, body))
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fake_socket(monkeypatch):
+    sock = FakeSocket()
+    monkeypatch.setattr(ws_module.websocket, 'create_connection', lambda url: sock)
+    return sock
+
+
+@pytest.fixture
+def backend(monkeypatch, fake_socket):
+    monkeypatch.setenv('HE_API_KEY', 'k')
+    return FakeBackend(fake_socket)
+
+
+@pytest.fixture
+def make_client(backend):
+    clients = []
+
+    def make_client(**kwargs):
+        client = HEClient(url='backend', **kwargs)
+        client._transport = backend
+        clients.append(client)
+        return client
+
+    yield make_client
+    for client in clients:
+        client.close()
+
+
+@pytest.fixture
+def model_package(tmp_path, monkeypatch):
+    # writes a package of model modules, `{sdk}`, `{pkg}` and the keyword arguments are filled in;
+    # the test gets empty registries, so a loader only sees what these modules define
+    created = []
+    for name in ('_registry', '_sources', '_providers', '_by_name', '_data_files'):
+        monkeypatch.setattr(BaseData, name, {})
+    monkeypatch.setattr(BaseData, '_versions', weakref.WeakKeyDictionary())
+    monkeypatch.setattr(Inventory, '_registry', {})
+
+    def model_package(name, modules, **params):
+        root = tmp_path / name
+        root.mkdir()
+        root.joinpath('__init__.py').write_text('')
+        for module, source in modules.items():
+            root.joinpath(f'{module}.py').write_text(textwrap.dedent(source).format(sdk=SDK, pkg=name, **params))
+        module_names = [f'{name}.{module}' for module in sorted(modules)]
+        created.extend([name] + module_names)
+        return module_names
+
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield model_package
+    for pname in created:
+        sys.modules.pop(pname, None)
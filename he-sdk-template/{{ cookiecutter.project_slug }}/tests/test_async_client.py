@@ -0,0 +1,98 @@
+import asyncio
+import json
+
+import pytest
+
+from {{ cookiecutter.project_slug }}.sdk.async_client import AsyncHEClient
+
+
+async def _wait_for_jobs(backend, count):
+    while len(backend.jobs) < count:
+        await asyncio.sleep(0.01)
+
+
+def test_concurrent_jobs(backend, make_client):
+    backend.held.add('RunApp')
+
+    async def run():
+        async with AsyncHEClient(client=make_client(), max_concurrency=4) as client:
+            runs = asyncio.ensure_future(client.run_app_many('APP', 'V1', ['e1', 'e2', 'e3']))
+            # all three are running at once, they finish in reverse order
+            await asyncio.wait_for(_wait_for_jobs(backend, 3), 5)
+            for endpoint, job_id, body in reversed(backend.jobs):
+                backend.finish(endpoint, job_id, body)
+            return await asyncio.wait_for(runs, 5)
+
+    assert asyncio.run(run()) == [None, None, None]
+    assert sorted(json.loads(body)['EnvId'] for _, _, body in backend.jobs) == ['e1', 'e2', 'e3']
+
+
+def test_timed_out_waiter_leaves_the_job_to_the_others(backend, make_client):
+    sync_client = make_client()
+    job_id = 'job-1'
+
+    async def run():
+        async with AsyncHEClient(client=sync_client) as client:
+            waiting = sync_client.ws.job_future(job_id)
+            other = asyncio.ensure_future(client.wait_for_job(job_id))
+            with pytest.raises(asyncio.TimeoutError):
+                await client.wait_for_job(job_id, timeout=0.05)
+            backend.sock.finish(job_id, retval='done')
+            assert (await asyncio.wait_for(other, 5)).retval == 'done'
+            return waiting.result(timeout=5)
+
+    assert asyncio.run(run()).retval == 'done'
+
+
+def _env_jobs(backend):
+    return {json.loads(body)['EnvId']: (endpoint, job_id, body) for endpoint, job_id, body in backend.jobs}
+
+
+def test_waves_run_in_order(backend, make_client):
+    backend.held.add('RunApp')
+    done = []
+
+    async def run():
+        async with AsyncHEClient(client=make_client()) as client:
+            runs = asyncio.ensure_future(client.run_app_waves(
+                'APP', 'V1', [['e1', 'e2'], ['e3', 'e4'], ['e5']], on_done=lambda env_uid, error: done.append(env_uid)))
+            for count, wave in [(2, ['e2', 'e1']), (4, ['e4', 'e3']), (5, ['e5'])]:
+                await asyncio.wait_for(_wait_for_jobs(backend, count), 5)
+                # the next wave isn't submitted until this one has finished
+                await asyncio.sleep(0.05)
+                assert len(backend.jobs) == count
+                jobs = _env_jobs(backend)
+                for env_uid in wave:
+                    backend.finish(*jobs[env_uid])
+                    await asyncio.sleep(0.01)
+            return await asyncio.wait_for(runs, 5)
+
+    assert asyncio.run(run()) == dict.fromkeys(['e1', 'e2', 'e3', 'e4', 'e5'])
+    assert done == ['e2', 'e1', 'e4', 'e3', 'e5']
+
+
+def test_failed_env_stops_the_waves(backend, make_client):
+    backend.held.add('RunApp')
+    backend.fail = lambda endpoint, body: json.loads(body)['EnvId'] == 'e2'
+    sync_client = make_client()
+
+    async def run():
+        async with AsyncHEClient(client=sync_client) as client:
+            runs = asyncio.ensure_future(client.run_app_waves('APP', 'V1', [['e1', 'e2', 'e3'], ['e4']]))
+            await asyncio.wait_for(_wait_for_jobs(backend, 3), 5)
+            jobs = _env_jobs(backend)
+            endpoint, job_id, body = jobs['e1']
+            waiting = sync_client.ws.job_future(job_id)
+            backend.finish(*jobs['e2'])
+            results = await asyncio.wait_for(runs, 5)
+            # the cancelled waiters leave the jobs themselves alone
+            backend.finish(endpoint, job_id, body)
+            return results, waiting.result(timeout=5)
+
+    results, job_data = asyncio.run(run())
+    assert sorted(results) == ['e1', 'e2', 'e3']
+    assert 'failed' in str(results['e2'])
+    assert isinstance(results['e1'], asyncio.CancelledError)
+    assert isinstance(results['e3'], asyncio.CancelledError)
+    assert job_data.success
+    assert sorted(_env_jobs(backend)) == ['e1', 'e2', 'e3']
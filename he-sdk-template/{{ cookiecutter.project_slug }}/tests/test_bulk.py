@@ -0,0 +1,76 @@
+import pytest
+from pydantic import root_validator, validator
+
+from {{ cookiecutter.project_slug }}.sdk.models import BaseData
+from {{ cookiecutter.project_slug }}.sdk.models.types import UInt32
+
+
+class BulkPlainData(BaseData):
+    Name: str
+    Price: UInt32
+
+
+class BulkUpperData(BaseData):
+    Name: str
+    Price: UInt32
+
+    @validator('Name')
+    def upper_name(cls, v):
+        return v.upper()
+
+
+class BulkPricedData(BaseData):
+    Name: str
+    Price: UInt32
+
+    @root_validator
+    def check_price(cls, values):
+        if values.get('Price') == 0:
+            raise ValueError('free items are not allowed')
+        return values
+
+
+def test_define_many_without_validators():
+    assert BulkPlainData.define_many([dict(id='plain-gold', Name='gold', Price='3')]) == 1
+    inst = BaseData.store(BulkPlainData)['plain-gold']
+    assert inst.Name == 'gold' and inst.Price == 3
+
+
+def test_define_many_runs_field_validators(tmp_path):
+    path = tmp_path.joinpath('items.csv')
+    path.write_text('id,Name,Price\nupper-gold,gold,3\n')
+    BulkUpperData.define_many([dict(id='upper-silver', Name='silver', Price=2)])
+    BulkUpperData.define_many(str(path))
+    store = BaseData.store(BulkUpperData)
+    assert store['upper-silver'].Name == 'SILVER'
+    assert store['upper-gold'].Name == 'GOLD'
+
+
+def test_define_many_runs_root_validators():
+    try:
+        BulkPricedData.define_many([dict(id='priced-free', Name='free', Price=0)])
+    except Exception as e:
+        assert 'free items are not allowed' in str(e)
+    else:
+        raise AssertionError('root validator was skipped')
+    assert 'priced-free' not in BaseData.store(BulkPricedData)
+
+
+def test_define_many_coerces_str_like_the_constructor():
+    BulkPlainData.define_many([dict(id='coerced-1', Name=7, Price=1), dict(id='coerced-2', Name=b'ore', Price=1)])
+    store = BaseData.store(BulkPlainData)
+    assert store['coerced-1'].Name == '7'
+    assert store['coerced-2'].Name == 'ore'
+
+
+@pytest.mark.parametrize('name', [None, ['gold'], {'en': 'gold'}])
+def test_define_many_rejects_non_str_values(name):
+    rows = [dict(id='rejected-1', Name='gold', Price=1), dict(id='rejected-2', Name=name, Price=1)]
+    with pytest.raises(Exception, match='row 2'):
+        BulkPlainData.define_many(rows)
+    assert 'rejected-1' not in BaseData.store(BulkPlainData)
+
+
+def test_define_many_rejects_out_of_range_ints():
+    with pytest.raises(Exception, match="row 2: 'Price'=-1 is out of UInt32 range"):
+        BulkPlainData.define_many([dict(id='range-1', Name='gold', Price=1), dict(id='range-2', Name='gold', Price=-1)])
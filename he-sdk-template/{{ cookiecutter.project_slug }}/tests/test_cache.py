@@ -0,0 +1,50 @@
+import hashlib
+import os
+
+from {{ cookiecutter.project_slug }}.sdk.cache import ArtifactCache
+from {{ cookiecutter.project_slug }}.sdk.client import AppDefDTO
+
+APP_DEF = b'{"Id": "APP", "Name": "game"}'
+
+
+def _export(client, current):
+    app_def = {fname: [] for fname, field in AppDefDTO.__fields__.items() if field.required}
+    app_def.update(Id='APP', Name='game')
+    resp = client.export_app_stream(app_def)
+    client.download_file_by_id(resp.AppDefFileId, str(current))
+
+
+def test_exported_file_is_a_writable_copy(tmp_path, backend, make_client):
+    backend.retvals['ExportApp'] = lambda body: dict(AppId='APP', AppDefFileId='F1')
+    backend.files['F1'] = APP_DEF
+    cache = ArtifactCache(tmp_path / 'cache')
+    client = make_client(cache=cache)
+    current = tmp_path / 'current.json'
+    _export(client, current)
+    _export(client, current)
+    assert os.stat(current).st_nlink == 1
+    assert os.access(current, os.W_OK)
+    # editing the snapshot in place leaves the cached object alone
+    with open(current, 'ab') as f:
+        f.write(b'\n')
+    digest = cache.digest('F1')
+    assert digest == hashlib.sha256(APP_DEF).hexdigest()
+    with open(cache.root / 'objects' / digest[:2] / digest, 'rb') as f:
+        assert f.read() == APP_DEF
+    _export(client, current)
+    assert current.read_bytes() == APP_DEF
+    assert [endpoint for endpoint, _, _ in backend.posts] == ['ExportApp'] * 3
+
+
+def test_changed_cache_object_is_downloaded_again(tmp_path, backend, make_client):
+    backend.files['F1'] = APP_DEF
+    cache = ArtifactCache(tmp_path / 'cache')
+    client = make_client(cache=cache)
+    current = tmp_path / 'current.json'
+    client.download_file_by_id('F1', str(current))
+    digest = cache.digest('F1')
+    obj_path = cache.root / 'objects' / digest[:2] / digest
+    obj_path.write_bytes(b'corrupted')
+    client.download_file_by_id('F1', str(current))
+    assert current.read_bytes() == APP_DEF
+    assert obj_path.read_bytes() == APP_DEF
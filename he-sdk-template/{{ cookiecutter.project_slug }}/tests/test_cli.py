@@ -0,0 +1,135 @@
+import json
+
+import pytest
+from typer.testing import CliRunner
+
+from {{ cookiecutter.project_slug }} import cli
+from {{ cookiecutter.project_slug }}.cli import _read_pipeline_spec, _split_stages, _write_json_file
+from {{ cookiecutter.project_slug }}.sdk import client as client_module
+from {{ cookiecutter.project_slug }}.sdk.appdata import AppData
+
+
+class FailingLoader(object):
+    def write_json(self, f, columnar=False):
+        f.write('{"Data": [')
+        raise ValueError('broken model')
+
+
+def test_failed_collect_keeps_the_previous_output(tmp_path):
+    output = tmp_path / 'app.json'
+    output.write_text('{}\n')
+    try:
+        _write_json_file(FailingLoader(), str(output))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('the error was swallowed')
+    assert output.read_text() == '{}\n'
+    assert [p.name for p in tmp_path.iterdir()] == ['app.json']
+
+
+@pytest.mark.parametrize('args, argvs', [
+    (['build', '0.0.1-beta', '+', 'run', '0.0.1-beta', 'test'], [['build', '0.0.1-beta'], ['run', '0.0.1-beta', 'test']]),
+    (['+', 'export', '--delta', '+', '+', 'build', '0.0.1', '+'], [['export', '--delta'], ['build', '0.0.1']]),
+    (['collect'], [['collect']]),
+    ([], []),
+])
+def test_split_stages(args, argvs):
+    assert _split_stages(args) == argvs
+
+
+def test_pipeline_spec_files(tmp_path):
+    stages = ['export --delta', ['release', '0.0.1'], "run 0.0.1 'test env'"]
+    argvs = [['export', '--delta'], ['release', '0.0.1'], ['run', '0.0.1', 'test env']]
+    json_path = tmp_path / 'pipeline.json'
+    json_path.write_text(json.dumps(stages))
+    assert _read_pipeline_spec(str(json_path)) == argvs
+    yaml_path = tmp_path / 'pipeline.yaml'
+    yaml_path.write_text('stages:\n  - export --delta\n  - [release, 0.0.1]\n  - run 0.0.1 \'test env\'\n')
+    assert _read_pipeline_spec(str(yaml_path)) == argvs
+    json_path.write_text(json.dumps(dict(stages=['build 0.0.1', 7])))
+    with pytest.raises(ValueError, match='not 7'):
+        _read_pipeline_spec(str(json_path))
+
+
+class FakeVersion(object):
+    Id = 'V1'
+
+
+class FakeEnv(object):
+    Id = 'E1'
+
+
+class FakeManifest(object):
+    Id = 'APP'
+
+    def has_version(self, version_name):
+        return version_name == '0.0.1-beta'
+
+    def get_version(self, version_name):
+        return FakeVersion() if self.has_version(version_name) else None
+
+    def get_app_env(self, env_name):
+        return FakeEnv() if env_name == 'test' else None
+
+
+class FakeClient(object):
+    def __init__(self, calls):
+        self.calls = calls
+        calls.append('client')
+
+    def build_app(self, app_id, version_name):
+        self.calls.append(('build', app_id, version_name))
+
+    def run_app(self, app_id, version_id, env_id):
+        self.calls.append(('run', app_id, version_id, env_id))
+
+    def close(self):
+        self.calls.append('close')
+
+
+@pytest.fixture
+def calls(monkeypatch, tmp_path):
+    calls = []
+
+    def load():
+        calls.append('manifest')
+        return FakeManifest()
+
+    monkeypatch.setattr(AppData, 'load', staticmethod(load))
+    monkeypatch.setattr(client_module, 'HEClient', lambda **kwargs: FakeClient(calls))
+    monkeypatch.setattr(cli, '_get_data_path', lambda: tmp_path)
+    return calls
+
+
+def _pipeline(*args):
+    return CliRunner().invoke(cli.cli_app, ['pipeline'] + list(args))
+
+
+def test_pipeline_stages_share_the_client_and_manifest(calls):
+    result = _pipeline('build', '0.0.1-beta', '+', 'run', '0.0.1-beta', 'test')
+    assert result.exit_code == 0, result.output
+    assert calls == ['manifest', 'client', ('build', 'APP', '0.0.1-beta'), ('run', 'APP', 'V1', 'E1'), 'close']
+    assert 'build 0.0.1-beta' in result.output and 'run 0.0.1-beta test' in result.output
+    assert cli._session == {}
+
+
+@pytest.mark.parametrize('args', [
+    ['build', '0.0.1-beta', '+', 'watch'],
+    ['build', '0.0.1-beta', '+', 'run', '0.0.1-beta'],
+    ['build', '0.0.1-beta', '+', 'run', '0.0.1-beta', 'test', '--unknown'],
+    [],
+])
+def test_bad_stage_fails_before_anything_runs(calls, args):
+    result = _pipeline(*args)
+    assert result.exit_code == 2
+    assert calls == []
+
+
+def test_failed_stage_stops_the_pipeline(calls):
+    result = _pipeline('build', '0.0.2', '+', 'run', '0.0.1-beta', 'test')
+    assert 'Unknown version: 0.0.2' in str(result.exception)
+    # the version check fails before the client is needed
+    assert calls == ['manifest']
+    assert 'failed' in result.output and '1 stage(s) not run' in result.output
+    assert cli._session == {}
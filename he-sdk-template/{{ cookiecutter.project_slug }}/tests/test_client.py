@@ -0,0 +1,24 @@
+import pytest
+import requests
+
+from {{ cookiecutter.project_slug }}.sdk.client import AppDefDTO
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_export_is_sent_with_a_content_length(backend, make_client, compress):
+    prepared = []
+    post = backend.post
+
+    def prepare_and_post(url, data=None, headers=None, **kwargs):
+        prepared.append(requests.Request('POST', url, data=data, headers=headers).prepare())
+        return post(url, data=data, headers=headers, **kwargs)
+
+    backend.post = prepare_and_post
+    backend.retvals['ExportApp'] = lambda body: dict(AppId='APP', AppDefFileId='F1')
+    app_def = {fname: [] for fname, field in AppDefDTO.__fields__.items() if field.required}
+    app_def.update(Id='APP', Name='game')
+    make_client().export_app_stream(app_def, compress=compress)
+    (request, ) = prepared
+    _, _, body = backend.posts[0]
+    assert 'Transfer-Encoding' not in request.headers
+    assert request.headers['Content-Length'] == str(len(body))
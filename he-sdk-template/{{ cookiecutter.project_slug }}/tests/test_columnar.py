@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from {{ cookiecutter.project_slug }}.sdk.columnar import decode_instances, encode_instances, expand_app_def
+from {{ cookiecutter.project_slug }}.sdk.dataloader import DataLoader
+
+
+def _row(name, **values):
+    return dict(Name=name, Fields=[{'Name': fname, 'Value': value} for fname, value in values.items()])
+
+
+INSTANCES = {
+    'ItemData': [_row('sword', Price=10, Kind='KindData/blade', Tags=['melee'], Stats={'atk': 3}),
+                 _row('shield', Price=5, Kind=None, Tags=[], Stats={})],
+    'MarkerData': [_row('first'), _row('second')],
+    'EmptyData': [],
+}
+
+
+def test_round_trip():
+    tables = encode_instances(INSTANCES)
+    assert tables['ItemData'] == dict(Fields=['Price', 'Kind', 'Tags', 'Stats'], Names=['sword', 'shield'],
+                                      Columns=[[10, 5], ['KindData/blade', None], [['melee'], []], [{'atk': 3}, {}]])
+    assert tables['MarkerData'] == dict(Fields=[], Names=['first', 'second'], Columns=[])
+    assert decode_instances(json.loads(json.dumps(tables))) == INSTANCES
+
+
+def test_rows_with_other_fields_are_rejected():
+    with pytest.raises(ValueError, match="'shield'"):
+        encode_instances({'ItemData': [_row('sword', Price=10), _row('shield', Cost=5)]})
+
+
+def test_expand_app_def():
+    app_def = dict(Name='game', DataClassInstances={'OtherData': [_row('x', Value=1)]},
+                   DataClassInstanceColumns=encode_instances(INSTANCES))
+    expanded = expand_app_def(app_def)
+    assert expanded['DataClassInstances'] == dict(OtherData=[_row('x', Value=1)], **INSTANCES)
+    assert expanded['DataClassInstanceColumns'] is None
+    assert app_def['DataClassInstanceColumns'] is not None
+    rows_only = dict(Name='game', DataClassInstances=INSTANCES)
+    assert expand_app_def(rows_only) is rows_only
+
+
+def test_loader_columns_match_rows(model_package):
+    model_package('columnar_models', {'items': '''
+        import typing
+        from {sdk}.models import BaseData, DataRef
+
+
+        class ColumnarKindData(BaseData):
+            Name: str
+
+
+        class ColumnarItemData(BaseData):
+            Price: int
+            Kind: typing.Optional[DataRef[ColumnarKindData]]
+
+
+        ColumnarKindData.define(id='blade', Name='Blade')
+        ColumnarItemData.define(id='sword', Price=10, Kind='ColumnarKindData/blade')
+        ColumnarItemData.define(id='stick', Price=1, Kind=None)
+    '''})
+    loader = DataLoader('columnar_models')
+    columnar = json.loads(loader.to_json(columnar=True))
+    assert columnar['DataClassInstances'] == {}
+    assert expand_app_def(columnar) == dict(json.loads(loader.to_json()), DataClassInstanceColumns=None)
@@ -0,0 +1,89 @@
+import typing
+
+import pytest
+
+from {{ cookiecutter.project_slug }}.sdk.dataloader import datainst_to_json
+from {{ cookiecutter.project_slug }}.sdk.models import BaseData, DataRef
+from {{ cookiecutter.project_slug }}.sdk.models.compact import CompactStore
+from {{ cookiecutter.project_slug }}.sdk.models.types import UInt32
+from {{ cookiecutter.project_slug }}.sdk.schema import compile_schema
+
+
+class CompactKindData(BaseData):
+    Name: str
+
+
+class PlainStoredData(BaseData):
+    Name: str
+    Title: str
+    Price: UInt32
+    Weight: typing.Optional[int]
+    Note: typing.Optional[str]
+    Kind: DataRef[CompactKindData]
+
+
+class CompactStoredData(BaseData):
+    _compact = True
+    Name: str
+    Title: str
+    Price: UInt32
+    Weight: typing.Optional[int]
+    Note: typing.Optional[str]
+    Kind: DataRef[CompactKindData]
+
+
+# required fields only, so define_many appends whole columns to the compact store
+class PlainTypedData(BaseData):
+    Name: str
+    Price: UInt32
+    Kind: DataRef[CompactKindData]
+
+
+class CompactTypedData(BaseData):
+    _compact = True
+    Name: str
+    Price: UInt32
+    Kind: DataRef[CompactKindData]
+
+
+PAIRS = [(PlainStoredData, CompactStoredData), (PlainTypedData, CompactTypedData)]
+
+# enough distinct names for the Name column to give up its string pool
+ROWS = [dict(id=f'stored-{i}', Name=f'name-{i}', Title=f'title-{i % 7}', Price=i % 1000,
+             Weight=None if i % 3 == 0 else i * 1000, Note=None if i % 2 else f'note-{i % 5}',
+             Kind=f'CompactKindData/kind-{i % 4}') for i in range(5000)]
+
+for plain_cls, compact_cls in PAIRS:
+    rows = [{fname: row[fname] for fname in plain_cls.__fields__} for row in ROWS]
+    for cls in (plain_cls, compact_cls):
+        cls.define_many(rows[:-2])
+        for row in rows[-2:]:
+            cls.define(**row)
+
+
+@pytest.mark.parametrize('plain_cls, compact_cls', PAIRS)
+def test_instances_match_plain_storage(plain_cls, compact_cls):
+    store = BaseData.store(compact_cls)
+    assert isinstance(store, CompactStore)
+    plain = list(BaseData.instances(plain_cls))
+    compact = list(BaseData.instances(compact_cls))
+    assert [inst.__dict__ for inst in compact] == [inst.__dict__ for inst in plain]
+    assert store['stored-3'].__dict__ == BaseData.store(plain_cls)['stored-3'].__dict__
+
+
+def test_optional_values_round_trip():
+    store = BaseData.store(CompactStoredData)
+    assert (store['stored-3'].Weight, store['stored-3'].Note) == (None, None)
+    assert (store['stored-4'].Weight, store['stored-4'].Note) == (4000, 'note-4')
+
+
+@pytest.mark.parametrize('plain_cls, compact_cls', PAIRS)
+def test_json_matches_plain_storage(plain_cls, compact_cls):
+    plain = [datainst_to_json(plain_cls, inst) for inst in BaseData.instances(plain_cls)]
+    compact = [datainst_to_json(compact_cls, inst) for inst in BaseData.instances(compact_cls)]
+    assert compact == plain
+    # the column reader used for compact stores gives the same output
+    schema = compile_schema(compact_cls)
+    assert schema.instances_to_json(BaseData.store(compact_cls).values()) == plain
+    plain_table = compile_schema(plain_cls).instances_to_table(BaseData.store(plain_cls).values())
+    assert schema.instances_to_table(BaseData.store(compact_cls).values()) == plain_table
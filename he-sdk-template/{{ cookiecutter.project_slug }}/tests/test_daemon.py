@@ -0,0 +1,201 @@
+import io
+import os
+import pathlib
+import shutil
+import sys
+import tempfile
+import threading
+
+import pytest
+
+from {{ cookiecutter.project_slug }}.sdk import daemon
+from {{ cookiecutter.project_slug }}.sdk.daemon import DaemonServer, ModuleReloader
+from {{ cookiecutter.project_slug }}.sdk.dataloader import DataLoader
+from {{ cookiecutter.project_slug }}.sdk.models import BaseData
+
+MODELS = {
+    'a_kind': '''
+        from {sdk}.models import BaseData
+
+
+        class ReloadKindData(BaseData):
+            Name: str
+
+
+        ReloadKindData.define(id='blade', Name='Blade')
+    ''',
+    'b_item': '''
+        from {sdk}.models import BaseData, DataRef
+        from {pkg}.a_kind import ReloadKindData
+
+
+        class ReloadItemData(BaseData):
+            Kind: DataRef[ReloadKindData]
+
+
+        ReloadItemData.define(id='sword', Kind='ReloadKindData/blade')
+    ''',
+    'c_other': '''
+        from {sdk}.models import BaseData
+
+
+        class ReloadOtherData(BaseData):
+            Name: str
+
+
+        ReloadOtherData.define(id='other', Name='Other')
+    ''',
+}
+
+
+@pytest.fixture
+def sock_path(monkeypatch):
+    # unix socket paths are limited to about 100 bytes, pytest's tmp_path can be longer
+    root = pathlib.Path(tempfile.mkdtemp(prefix='he-daemon-'))
+    path = root / 'daemon.sock'
+    monkeypatch.setattr(daemon, 'socket_path', lambda: path)
+    monkeypatch.delenv(daemon.NO_DAEMON_ENV, raising=False)
+    yield path
+    shutil.rmtree(root, ignore_errors=True)
+
+
+@pytest.fixture
+def serve(sock_path):
+    servers = []
+
+    def serve(run_command, reloader=None):
+        server = DaemonServer(sock_path, run_command, reloader=reloader, log=io.StringIO())
+        thread = threading.Thread(target=server.serve, daemon=True)
+        thread.start()
+        servers.append((server, thread))
+        return server
+
+    yield serve
+    for server, thread in servers:
+        server.shutdown()
+        thread.join(5)
+
+
+def _forward(argv):
+    out, err = io.StringIO(), io.StringIO()
+    code = daemon.request(dict(argv=argv, cwd=os.getcwd()), out=out, err=err)
+    return code, out.getvalue(), err.getvalue()
+
+
+def test_no_daemon_listening(sock_path):
+    assert daemon.forward(['list']) is None
+    sock_path.touch()
+    # left behind by a daemon that is gone
+    assert daemon.forward(['list']) is None
+
+
+def test_not_forwarded(serve, monkeypatch):
+    serve(lambda argv: 0)
+    assert daemon.forward(['--verbose', 'watch']) is None
+    assert daemon.forward(['daemon', '--status']) is None
+    monkeypatch.setenv(daemon.NO_DAEMON_ENV, '1')
+    assert daemon.forward(['list']) is None
+
+
+def test_output_and_exit_code_are_forwarded(serve, tmp_path, monkeypatch):
+    calls = []
+
+    def run_command(argv):
+        calls.append((argv, os.getcwd()))
+        print('out ' + ' '.join(argv))
+        print('err', file=sys.stderr)
+        return 3
+
+    serve(run_command)
+    monkeypatch.chdir(tmp_path)
+    assert _forward(['list', '--all']) == (3, 'out list --all\n', 'err\n')
+    # the command runs in the caller's directory, the daemon's own is left alone
+    assert calls == [(['list', '--all'], str(tmp_path))]
+    assert os.getcwd() == str(tmp_path)
+
+
+def test_large_output_is_streamed_in_chunks(serve):
+    text = 'x' * 100 + '\n'
+    serve(lambda argv: print(text * 2000, end='') or 0)
+    assert _forward(['list']) == (0, text * 2000, '')
+
+
+@pytest.mark.parametrize('exit_code, code', [(None, 0), (4, 4), ('usage', 1)])
+def test_system_exit(serve, exit_code, code):
+    def run_command(argv):
+        raise SystemExit(exit_code)
+
+    serve(run_command)
+    assert _forward(['list'])[0] == code
+
+
+def test_failing_command_reports_the_traceback(serve):
+    def run_command(argv):
+        raise ValueError('boom')
+
+    serve(run_command)
+    code, out, err = _forward(['list'])
+    assert code == 1
+    assert 'Traceback' in err and 'ValueError: boom' in err
+    # the daemon keeps serving
+    assert _forward(['list'])[0] == 1
+
+
+def test_local_command_is_refused(serve):
+    serve(lambda argv: 0)
+    code, out, err = _forward(['watch'])
+    assert code == 2
+    assert daemon.NO_DAEMON_ENV in err
+
+
+def test_status_and_stop(serve, sock_path):
+    server = serve(lambda argv: 0)
+    out = io.StringIO()
+    assert daemon.request(dict(status=True), out=out) == 0
+    assert str(sock_path) in out.getvalue()
+    with pytest.raises(Exception, match='already listening'):
+        DaemonServer(sock_path, lambda argv: 0)
+    assert daemon.request(dict(stop=True), out=io.StringIO()) == 0
+    server.shutdown()
+    assert daemon.forward(['list']) is None
+
+
+def _edit(pname, source):
+    fpath = pathlib.Path(sys.modules[pname].__file__)
+    fpath.write_text(fpath.read_text() + source)
+
+
+def test_reloader_drops_changed_modules_and_their_importers(model_package):
+    model_package('reload_models', MODELS)
+    DataLoader('reload_models')
+    reloader = ModuleReloader('reload_models')
+    assert reloader.refresh() == []
+    _edit('reload_models.a_kind', "\nReloadKindData.define(id='axe', Name='Axe')\n")
+    assert reloader.refresh() == ['reload_models.a_kind', 'reload_models.b_item']
+    assert 'reload_models.a_kind' not in sys.modules and 'reload_models.b_item' not in sys.modules
+    assert 'reload_models.c_other' in sys.modules
+    assert sorted(cls.__name__ for cls in BaseData._registry) == ['ReloadOtherData']
+    # the next load imports them again, with the edit
+    DataLoader('reload_models')
+    kind_cls = sys.modules['reload_models.a_kind'].ReloadKindData
+    assert sorted(BaseData._registry[kind_cls].keys()) == ['axe', 'blade']
+    assert reloader.refresh() == []
+
+
+def test_reloader_notices_changed_data_files(model_package, tmp_path):
+    csv_path = tmp_path / 'kinds.csv'
+    csv_path.write_text('id,Name\nblade,Blade\n')
+    model_package('reload_csv', dict(kinds='''
+        from {sdk}.models import BaseData
+
+
+        class ReloadCsvKindData(BaseData):
+            Name: str
+
+
+        ReloadCsvKindData.define_many('{csv}')
+    '''), csv=csv_path)
+    DataLoader('reload_csv')
+    reloader = ModuleReloader('reload_csv')
+    csv_path.write_text('id,Name\nblade,Blade\naxe,Axe\n')
+    assert reloader.refresh() == ['reload_csv.kinds']
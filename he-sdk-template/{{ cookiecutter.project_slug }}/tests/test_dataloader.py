@@ -0,0 +1,66 @@
+import sys
+
+import pytest
+
+from {{ cookiecutter.project_slug }}.sdk import dataloader
+from {{ cookiecutter.project_slug }}.sdk.dataloader import DataLoader
+
+DUPLICATES = {
+    'instance': ({
+        'a_kind': '''
+            from {sdk}.models import BaseData
+
+
+            class {prefix}KindData(BaseData):
+                Name: str
+
+
+            {prefix}KindData.define(id='blade', Name='Blade')
+        ''',
+        'b_more': '''
+            from {pkg}.a_kind import {prefix}KindData
+
+            {prefix}KindData.define(id='blade', Name='Another blade')
+        ''',
+    }, "Instance of '{prefix}KindData' with id='blade' is already defined"),
+    'inventory': ({
+        'a_shop': '''
+            from {sdk}.models import Inventory
+
+            shop = Inventory('{prefix}Shop')
+        ''',
+        'b_shop': '''
+            from {sdk}.models import Inventory
+
+            shop = Inventory('{prefix}Shop')
+        ''',
+    }, "Inventory with name '{prefix}Shop' already defined"),
+}
+
+
+@pytest.mark.parametrize('case', sorted(DUPLICATES))
+def test_parallel_import_reports_duplicates_like_serial(model_package, case):
+    modules, message = DUPLICATES[case]
+    errors = {}
+    for workers in (1, 2):
+        prefix = f'Dup{case.title()}{workers}'
+        name = f'dupes_{case}_{workers}'
+        model_package(name, modules, prefix=prefix)
+        with pytest.raises(Exception) as excinfo:
+            DataLoader(name, workers=workers)
+        errors[workers] = str(excinfo.value).replace(prefix, '')
+    assert errors[1] == errors[2] == message.format(prefix='')
+
+
+def test_small_package_is_imported_in_process(model_package, monkeypatch):
+    source = DUPLICATES['instance'][0]['a_kind']
+    modules = {f'mod{i}': source.replace('{prefix}', '{prefix}' + str(i)) for i in range(3)}
+    module_names = model_package('inproc', modules, prefix='InProc')
+    monkeypatch.setattr(dataloader.os, 'cpu_count', lambda: 8)
+
+    def no_pool(self, module_names, workers):
+        raise AssertionError('started a process pool')
+
+    monkeypatch.setattr(DataLoader, '_import_parallel', no_pool)
+    DataLoader('inproc', workers=0)
+    assert all(pname in sys.modules for pname in module_names)
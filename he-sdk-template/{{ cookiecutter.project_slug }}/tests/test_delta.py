@@ -0,0 +1,76 @@
+import copy
+import json
+
+import pytest
+
+from {{ cookiecutter.project_slug }}.sdk.dataloader import DataLoader
+from {{ cookiecutter.project_slug }}.sdk.delta import build_delta
+
+MODULES = {
+    'items': '''
+        from {sdk}.models import BaseData, Inventory
+        from {sdk}.models.types import UInt32
+
+
+        class DeltaItemData(BaseData):
+            Name: str
+            Price: UInt32
+
+
+        class DeltaKindData(BaseData):
+            Name: str
+
+
+        DeltaItemData.define(id='sword', Name='Sword', Price=10)
+        DeltaKindData.define(id='blade', Name='Blade')
+        shop = Inventory('DeltaShop')
+        shop.add(DeltaItemData.define(id='shield', Name='Shield', Price=5))
+    ''',
+}
+
+
+@pytest.fixture
+def loader(model_package):
+    model_package('delta_models', MODULES)
+    return DataLoader('delta_models')
+
+
+def _data_class(snapshot, name):
+    return next(j for j in snapshot['DataClasses'] if j['Name'] == name)
+
+
+@pytest.mark.parametrize('columnar', [False, True])
+def test_unchanged_snapshot_has_no_delta(loader, columnar):
+    assert build_delta(loader, json.loads(loader.to_json(columnar=columnar))) is None
+
+
+def test_changed_instances_are_sent_alone(loader):
+    snapshot = json.loads(loader.to_json())
+    snapshot['DataClassInstances']['DeltaItemData'][0]['Fields'][1]['Value'] = 99
+    delta = build_delta(loader, snapshot)
+    assert list(delta['DataClassInstances']) == ['DeltaItemData']
+    assert delta['DataClassInstances']['DeltaItemData'] == loader.instances_to_dict(['DeltaItemData'])['DeltaItemData']
+    assert delta['DataClasses'] == [] and delta['RemovedDataClassInstances'] == []
+
+
+def test_changed_and_removed_classes(loader):
+    snapshot = json.loads(loader.to_json())
+    _data_class(snapshot, 'DeltaKindData')['Fields'][0]['Typename'] = 'uint32'
+    removed = copy.deepcopy(_data_class(snapshot, 'DeltaKindData'))
+    removed['Name'] = 'DeltaGoneData'
+    snapshot['DataClasses'].append(removed)
+    snapshot['DataClassInstances']['DeltaGoneData'] = []
+    delta = build_delta(loader, snapshot)
+    assert [j['Name'] for j in delta['DataClasses']] == ['DeltaKindData']
+    assert delta['RemovedDataClasses'] == ['DeltaGoneData']
+    assert delta['RemovedDataClassInstances'] == ['DeltaGoneData']
+    assert delta['DataClassInstances'] == {}
+
+
+def test_changed_inventory_is_a_change(loader):
+    snapshot = json.loads(loader.to_json())
+    (shop, ) = [inv for inv in snapshot['Inventories'] if inv['Name'] == 'DeltaShop']
+    shop['Items'] = []
+    delta = build_delta(loader, snapshot)
+    assert delta['Inventories'] == loader.inventories_to_list()
+    assert delta['DataClasses'] == [] and delta['DataClassInstances'] == {}
@@ -0,0 +1,101 @@
+import json
+import sys
+
+import pytest
+
+from {{ cookiecutter.project_slug }}.sdk.dataloader import DataLoader
+from {{ cookiecutter.project_slug }}.sdk.discovery import DiscoveryCache, module_deps
+from {{ cookiecutter.project_slug }}.sdk.models import BaseData, Inventory
+
+MODULES = {
+    'a_kind': '''
+        from {sdk}.models import BaseData
+
+
+        class CachedKindData(BaseData):
+            Name: str
+
+
+        CachedKindData.define(id='blade', Name='{kind_name}')
+    ''',
+    'b_item': '''
+        from {pkg}.a_kind import CachedKindData
+        from {sdk}.models import BaseData, DataRef
+
+
+        class CachedItemData(BaseData):
+            Kind: DataRef[CachedKindData]
+
+
+        CachedItemData.define(id='sword', Kind='CachedKindData/blade')
+    ''',
+    'c_level': '''
+        from {sdk}.models import BaseData
+
+
+        class CachedLevelData(BaseData):
+            Exp: int
+
+
+        CachedLevelData.define_many('levels.csv')
+    ''',
+}
+
+
+@pytest.fixture
+def package(tmp_path, model_package):
+    model_package('cached_models', MODULES, kind_name='Blade')
+    tmp_path.joinpath('cached_models', 'levels.csv').write_text('id,Exp\nlevel1,100\n')
+    return tmp_path / 'cached_models'
+
+
+def _load(tmp_path):
+    # a fresh process would start with none of the package's modules imported
+    module_names = [name for name in sys.modules if name.startswith('cached_models.')]
+    BaseData.drop_modules(module_names)
+    Inventory.drop_modules(module_names)
+    for name in module_names:
+        del sys.modules[name]
+    loader = DataLoader('cached_models', cache_path=tmp_path / 'discovery.json')
+    imported = sorted(name[len('cached_models.'):] for name in sys.modules if name.startswith('cached_models.'))
+    return loader, imported
+
+
+def test_unchanged_modules_come_from_the_cache(tmp_path, package):
+    loader, imported = _load(tmp_path)
+    assert imported == ['a_kind', 'b_item', 'c_level']
+    expected = loader.to_json()
+    loader, imported = _load(tmp_path)
+    assert imported == []
+    assert loader.to_json() == expected
+
+
+def test_changed_module_invalidates_its_importers(tmp_path, package):
+    _load(tmp_path)
+    source = package.joinpath('a_kind.py')
+    source.write_text(source.read_text().replace("'Blade'", "'Sharp blade'"))
+    loader, imported = _load(tmp_path)
+    assert imported == ['a_kind', 'b_item']
+    assert '"Sharp blade"' in loader.to_json()
+
+
+def test_changed_data_file_invalidates_its_module(tmp_path, package):
+    _load(tmp_path)
+    package.joinpath('levels.csv').write_text('id,Exp\nlevel1,100\nlevel2,300\n')
+    loader, imported = _load(tmp_path)
+    assert imported == ['c_level']
+    assert [row['Name'] for row in loader.instances_to_dict(['CachedLevelData'])['CachedLevelData']] == ['level1', 'level2']
+
+
+def test_sdk_change_discards_the_cache(tmp_path, package):
+    _load(tmp_path)
+    cache_path = tmp_path / 'discovery.json'
+    fingerprint = json.loads(cache_path.read_text())['fingerprint']
+    assert DiscoveryCache(cache_path, fingerprint).get('cached_models.a_kind') is not None
+    assert DiscoveryCache(cache_path, 'another sdk').get('cached_models.a_kind') is None
+
+
+def test_module_deps_resolve_relative_imports():
+    source = b'from . import sibling\nfrom ..models import BaseData\nimport json\n'
+    assert module_deps(source, 'pkg.data.item') == ['json', 'pkg.data', 'pkg.data.sibling', 'pkg.models', 'pkg.models.BaseData']
+    assert module_deps(b'from .item import ItemData\n', 'pkg.data', is_package=True) == ['pkg.data.item', 'pkg.data.item.ItemData']
@@ -0,0 +1,102 @@
+import hashlib
+
+import pytest
+import requests
+
+from {{ cookiecutter.project_slug }}.sdk.download import download_to_file
+
+
+class FakeResponse(object):
+    def __init__(self, status_code, body=b'', headers=None, fail_after=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self._body = body
+        self._fail_after = fail_after
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(str(self.status_code))
+
+    def iter_content(self, chunk_size):
+        for pos in range(0, len(self._body), chunk_size):
+            if self._fail_after is not None and pos >= self._fail_after:
+                raise requests.exceptions.ChunkedEncodingError('connection dropped')
+            yield self._body[pos:pos + chunk_size]
+
+
+class FakeTransport(object):
+    # serves `body` honouring Range unless `ranges_supported` is off, the first response may drop the connection
+    # after `fail_after` bytes
+    def __init__(self, body, fail_after=None, ranges_supported=True):
+        self._body = body
+        self._fail_after = fail_after
+        self._ranges_supported = ranges_supported
+        self.ranges = []
+
+    def get(self, url, headers=None, stream=False):
+        rng = (headers or {}).get('Range')
+        self.ranges.append(rng)
+        fail_after, self._fail_after = self._fail_after, None
+        if rng is None or not self._ranges_supported:
+            return FakeResponse(200, self._body, {'Content-Length': str(len(self._body))}, fail_after)
+        offset = int(rng[len('bytes='):-1])
+        if offset >= len(self._body):
+            return FakeResponse(416, headers={'Content-Range': f'bytes */{len(self._body)}'})
+        rest = self._body[offset:]
+        return FakeResponse(206, rest, {'Content-Length': str(len(rest))}, fail_after)
+
+
+BODY = bytes(range(256)) * 40
+
+
+def _download(tmp_path, transport):
+    progress = []
+    filepath = str(tmp_path / 'app.json')
+    digest = download_to_file(transport, 'http://blob', filepath, chunk_size=1000,
+                              on_progress=lambda completed, total: progress.append((completed, total)))
+    with open(filepath, 'rb') as f:
+        assert f.read() == BODY
+    assert digest == hashlib.sha256(BODY).hexdigest()
+    return progress
+
+
+def test_retry_resumes_progress(tmp_path):
+    transport = FakeTransport(BODY, fail_after=3000)
+    progress = _download(tmp_path, transport)
+    assert transport.ranges == [None, 'bytes=3000-']
+    assert progress[3:6] == [(3000, len(BODY)), (3000, len(BODY)), (4000, len(BODY))]
+    assert progress[-1] == (len(BODY), len(BODY))
+    assert [completed for completed, _ in progress] == sorted(completed for completed, _ in progress)
+
+
+def test_complete_part_file_is_reused(tmp_path):
+    (tmp_path / 'app.json.part').write_bytes(BODY)
+    transport = FakeTransport(BODY)
+    progress = _download(tmp_path, transport)
+    assert transport.ranges == [f'bytes={len(BODY)}-']
+    assert progress == [(len(BODY), len(BODY))]
+
+
+@pytest.mark.parametrize('stale', [b'x' * (len(BODY) + 10), b'x' * len(BODY) * 2], ids=['longer', 'double'])
+def test_stale_part_file_is_downloaded_again(tmp_path, stale):
+    (tmp_path / 'app.json.part').write_bytes(stale)
+    transport = FakeTransport(BODY)
+    progress = _download(tmp_path, transport)
+    assert transport.ranges == [f'bytes={len(stale)}-', None]
+    assert progress[-1] == (len(BODY), len(BODY))
+
+
+def test_range_ignored_after_a_dropped_connection_starts_over(tmp_path):
+    transport = FakeTransport(BODY, fail_after=3000, ranges_supported=False)
+    progress = _download(tmp_path, transport)
+    assert transport.ranges == [None, 'bytes=3000-']
+    # the 200 answer to the resumed request resets the progress instead of going backwards
+    restart = progress.index((0, len(BODY)), 1)
+    assert progress[restart - 1] == (3000, len(BODY))
+    assert progress[-1] == (len(BODY), len(BODY))
@@ -0,0 +1,36 @@
+import pydantic
+import pytest
+
+from {{ cookiecutter.project_slug }}.sdk.client import AppDefDTO, DataClassInstanceDTO, _app_request_stream, _spool_request
+from {{ cookiecutter.project_slug }}.sdk.dto import dto_encoder
+
+
+def _row(value):
+    return dict(Name='sword', Fields=[dict(Name='Name', Value='Sword'), dict(Name='Loot', Value=value)])
+
+
+def _encode(row, trusted: bool) -> bytes:
+    # the export request body
+    app_def = {fname: [] for fname, field in AppDefDTO.__fields__.items() if field.required}
+    app_def.update(Name='app', DataClassInstances={'ItemData': [row]})
+    body, _ = _spool_request(_app_request_stream([('AppId', 'app')], app_def, trusted=trusted), compress=False)
+    with body:
+        return body.read()
+
+
+@pytest.mark.parametrize('value', ['ItemData/axe', 100, 1.5, True])
+def test_trusted_scalars_match_strict(value):
+    assert dto_encoder(DataClassInstanceDTO)(_row(value)) == DataClassInstanceDTO(**_row(value)).dict()
+    assert _encode(_row(value), trusted=True) == _encode(_row(value), trusted=False)
+
+
+@pytest.mark.parametrize('value', [['ItemData/axe'], {'ItemData/axe': 1}, None])
+def test_trusted_rejects_non_scalars_like_strict(value):
+    with pytest.raises(pydantic.ValidationError):
+        DataClassInstanceDTO(**_row(value))
+    with pytest.raises(ValueError):
+        dto_encoder(DataClassInstanceDTO)(_row(value))
+    with pytest.raises(ValueError):
+        _encode(_row(value), trusted=True)
+    with pytest.raises(ValueError):
+        _encode(_row(value), trusted=False)
@@ -0,0 +1,18 @@
+from {{ cookiecutter.project_slug }}.sdk.models import BaseData
+from {{ cookiecutter.project_slug }}.sdk.models.types import UInt32
+
+
+class ProvidedData(BaseData):
+    Name: str
+    Price: UInt32
+
+
+def test_iterator_source_is_replayed():
+    rows = (dict(id=f'provided-{i}', Name=f'item {i}', Price=i) for i in range(3))
+    ProvidedData.provide(rows)
+    first = BaseData.provided_instances(ProvidedData)
+    assert next(first).id == 'provided-0'
+    # a second pass starts over, while the first one resumes where it stopped
+    assert [inst.id for inst in BaseData.provided_instances(ProvidedData)] == ['provided-0', 'provided-1', 'provided-2']
+    assert [inst.id for inst in first] == ['provided-1', 'provided-2']
+    assert [inst.Price for inst in BaseData.provided_instances(ProvidedData)] == [0, 1, 2]
@@ -0,0 +1,49 @@
+import gc
+import typing
+
+import pytest
+
+from {{ cookiecutter.project_slug }}.sdk.models import BaseData, Query
+from {{ cookiecutter.project_slug }}.sdk.models import query
+
+
+class MixedData(BaseData):
+    Value: typing.Optional[typing.Union[int, str]]
+
+
+MixedData.define(id='mixed-1', Value=1)
+MixedData.define(id='mixed-text', Value='text')
+MixedData.define(id='mixed-none', Value=None)
+MixedData.define(id='mixed-3', Value=3)
+
+
+def test_range_skips_values_that_dont_compare():
+    # mixed values can't be sorted, so the range is checked row by row
+    assert Query(MixedData).range('Value', lo=2).ids() == ['mixed-3']
+    assert Query(MixedData).range('Value', hi='z').ids() == ['mixed-text']
+
+
+def test_order_by_mixed_values_names_the_field():
+    # no sorted index can be built, the sort that replaces it fails the same way
+    with pytest.raises(ValueError, match="'MixedData' by 'Value': its values of type int, str don't compare"):
+        Query(MixedData).order_by('Value').ids()
+    with pytest.raises(ValueError, match="by 'Value'"):
+        Query(MixedData).range('Value').order_by('-Value').ids()
+    # once the values that don't compare are filtered out, ordering works
+    assert Query(MixedData).range('Value', lo=0).order_by('-Value').ids() == ['mixed-3', 'mixed-1']
+
+
+def test_dropped_class_releases_its_indexes():
+    def define():
+        class DroppedData(BaseData):
+            __module__ = 'tests.dropped'
+            Price: int
+
+        DroppedData.define(id='dropped-1', Price=1)
+        assert Query(DroppedData).range('Price', lo=0).ids() == ['dropped-1']
+        return len(query._indexes)
+
+    indexed = define()
+    BaseData.drop_modules(['tests.dropped'])
+    gc.collect()
+    assert len(query._indexes) == indexed - 1
@@ -0,0 +1,68 @@
+import sys
+
+import pytest
+
+from {{ cookiecutter.project_slug }}.sdk.dataloader import DataLoader
+from {{ cookiecutter.project_slug }}.sdk.models import BaseData
+
+MODELS = '''
+    import typing
+    from {sdk}.models import BaseData, DataRef
+
+
+    class RefKindData(BaseData):
+        Name: str
+
+
+    class RefItemData(BaseData):
+        Kind: DataRef[RefKindData]
+        Parts: typing.List[DataRef[RefKindData]]
+        Bonus: typing.Dict[str, DataRef[RefKindData]]
+
+
+    class RefRecipeData(BaseData):
+        Result: typing.Optional[DataRef[RefItemData]]
+
+
+    RefKindData.define(id='blade', Name='Blade')
+    RefItemData.define(id='sword', Kind='RefKindData/blade', Parts=['RefKindData/blade'], Bonus=dict())
+    RefRecipeData.define(id='nothing', Result=None)
+    {extra}
+'''
+
+
+def test_resolved_references_pass(model_package):
+    model_package('ref_models', {'items': MODELS}, extra="RefItemData.define(id='axe', Kind='RefKindData/blade', "
+                                                         "Parts=[], Bonus={'fire': 'RefKindData/blade'}); "
+                                                         "RefRecipeData.define(id='forge', Result='RefItemData/sword')")
+    loader = DataLoader('ref_models')
+    loader.check_refs()
+    index = loader.ref_index()
+    assert index.resolve('RefKindData', 'blade') and not index.resolve('RefKindData', 'hilt')
+    assert sorted(index.referrers('RefKindData', 'blade')) == [
+        ('RefItemData', 'axe', 'Bonus'), ('RefItemData', 'axe', 'Kind'),
+        ('RefItemData', 'sword', 'Kind'), ('RefItemData', 'sword', 'Parts')]
+    assert index.referrers('RefItemData', 'sword') == [('RefRecipeData', 'forge', 'Result')]
+    assert BaseData.get('RefRecipeData', 'forge').Result.get_id().id == 'sword'
+
+
+# modules loaded from the discovery cache are checked from their descriptors, not from registered instances
+@pytest.mark.parametrize('cached', [False, True])
+def test_dangling_references_are_listed(tmp_path, model_package, cached):
+    model_package('ref_models', {'items': MODELS}, extra="RefItemData.define(id='axe', Kind='RefKindData/hilt', "
+                                                         "Parts=['GoneData/x'], Bonus={'fire': 'RefKindData/ember'})")
+    loader = DataLoader('ref_models', cache_path=tmp_path / 'discovery.json')
+    if cached:
+        BaseData.drop_modules(['ref_models.items'])
+        del sys.modules['ref_models.items']
+        loader = DataLoader('ref_models', cache_path=tmp_path / 'discovery.json')
+        assert 'ref_models.items' not in sys.modules
+    with pytest.raises(Exception) as excinfo:
+        loader.check_refs()
+    message = str(excinfo.value)
+    assert message.startswith('3 dangling data reference(s):')
+    lines = message.splitlines()[1:]
+    assert all(line.startswith('ref_models.items:') for line in lines)
+    assert any(line.endswith("RefItemData(id='axe').Kind -> 'RefKindData/hilt': no such instance") for line in lines)
+    assert any(line.endswith("RefItemData(id='axe').Parts -> 'GoneData/x': unknown data class 'GoneData'") for line in lines)
+    assert any(line.endswith("RefItemData(id='axe').Bonus -> 'RefKindData/ember': no such instance") for line in lines)
@@ -0,0 +1,72 @@
+import typing
+
+import pytest
+
+from {{ cookiecutter.project_slug }}.sdk.dataloader import datadef_to_json, datainst_to_json
+from {{ cookiecutter.project_slug }}.sdk.models import BaseData, DataRef
+from {{ cookiecutter.project_slug }}.sdk.models.types import UInt32, Ulid
+from {{ cookiecutter.project_slug }}.sdk.schema import Wrapped, compile_schema, get_cs_type
+
+
+class SchemaKindData(BaseData):
+    Name: str
+
+
+class SchemaItemData(BaseData):
+    Price: UInt32
+    Code: Ulid
+    Weight: typing.Optional[int]
+    Kind: DataRef[SchemaKindData]
+    Tags: typing.List[str]
+    Parts: typing.List[DataRef[SchemaKindData]]
+    Stats: typing.Dict[str, UInt32]
+
+
+class ItemBox(object):
+    pass
+
+
+@pytest.mark.parametrize('annotation, dto, expected', [
+    (UInt32, False, 'uint32'),
+    (int, False, 'int'),
+    (str, False, 'string'),
+    (Ulid, False, 'Ulid'),
+    (typing.List[str], False, 'List<string>'),
+    (typing.Dict[str, UInt32], False, 'Dict<string, uint32>'),
+    (DataRef[SchemaKindData], False, 'SchemaKindData'),
+    (typing.List[SchemaKindData], False, 'List<SchemaKindData>'),
+    (typing.List[SchemaKindData], True, 'List<SchemaKindDataDTO>'),
+])
+def test_cs_types(annotation, dto, expected):
+    assert get_cs_type(annotation, dto=dto) == expected
+
+
+def test_schema_is_compiled_once():
+    schema = compile_schema(SchemaItemData)
+    assert compile_schema(SchemaItemData) is schema
+    assert schema.field_names == ['Price', 'Code', 'Weight', 'Kind', 'Tags', 'Parts', 'Stats']
+    assert schema.ref_fields == {'Kind': 'ref', 'Parts': ['list', 'ref']}
+    assert datadef_to_json(SchemaItemData) == dict(Name='SchemaItemData', Fields=[
+        {'Name': 'Price', 'Typename': 'uint32'}, {'Name': 'Code', 'Typename': 'Ulid'}, {'Name': 'Weight', 'Typename': 'int'},
+        {'Name': 'Kind', 'Typename': 'SchemaKindData'}, {'Name': 'Tags', 'Typename': 'List<string>'},
+        {'Name': 'Parts', 'Typename': 'List<SchemaKindData>'}, {'Name': 'Stats', 'Typename': 'Dict<string, uint32>'}])
+    # the caller gets a copy, the schema stays as compiled
+    datadef_to_json(SchemaItemData)['Fields'][0]['Typename'] = 'int'
+    assert datadef_to_json(SchemaItemData)['Fields'][0]['Typename'] == 'uint32'
+
+
+def test_instance_values_are_encoded():
+    code = '01H5Z9Y6W3M4N5P6Q7R8S9T0V1'
+    inst = SchemaItemData(id='sword', Price=10, Code=code, Weight=None, Kind='SchemaKindData/blade', Tags=['melee'],
+                          Parts=['SchemaKindData/hilt'], Stats={'atk': 3})
+    assert datainst_to_json(SchemaItemData, inst) == dict(Name='sword', Fields=[
+        {'Name': 'Price', 'Value': 10}, {'Name': 'Code', 'Value': code}, {'Name': 'Weight', 'Value': None},
+        {'Name': 'Kind', 'Value': 'SchemaKindData/blade'}, {'Name': 'Tags', 'Value': ['melee']},
+        {'Name': 'Parts', 'Value': ['SchemaKindData/hilt']}, {'Name': 'Stats', 'Value': {'atk': 3}}])
+
+
+def test_wrapped_names():
+    wrapped = Wrapped(ItemBox)
+    assert (wrapped.entity_name, wrapped.entity_name_plural, wrapped.entity_name_us) == ('ItemBox', 'ItemBoxes', 'item_box')
+    assert (wrapped.var_name, wrapped.var_name_plural) == ('item_box', 'item_boxes')
+    assert (wrapped.var_name_camel, wrapped.var_name_camel_plural) == ('ItemBox', 'ItemBoxes')
@@ -0,0 +1,11 @@
+import pathlib
+import subprocess
+import sys
+
+BENCH = pathlib.Path(__file__).parent.parent.joinpath('bench-startup.py')
+
+
+def test_help_commands_start_within_budget():
+    # fails on a heavy import in the help path or a median over the default budget
+    result = subprocess.run([sys.executable, str(BENCH), '--runs', '3'], capture_output=True, text=True)
+    assert result.returncode == 0, result.stdout + result.stderr
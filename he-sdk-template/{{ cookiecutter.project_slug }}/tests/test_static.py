@@ -0,0 +1,99 @@
+import textwrap
+
+import pytest
+
+from {{ cookiecutter.project_slug }}.sdk.static import StaticExtractor
+
+PACKAGE = '{{ cookiecutter.project_slug }}.models'
+SDK = '{{ cookiecutter.project_slug }}.sdk'
+
+
+def _extract(tmp_path, source, **params):
+    fpath = tmp_path / 'item.py'
+    fpath.write_text(textwrap.dedent(source).format(sdk=SDK, **params))
+    module_name = f'{PACKAGE}.item'
+    return StaticExtractor(PACKAGE, {module_name: fpath}).extract(module_name)
+
+
+def test_literal_module(tmp_path):
+    descriptor = _extract(tmp_path, '''
+        import typing
+        from {sdk}.models import BaseData, DataRef
+        from {sdk}.models.types import *
+
+
+        class KindData(BaseData):
+            Name: str
+
+
+        class ItemData(BaseData):
+            Price: UInt32
+            Tags: typing.List[str]
+            Kind: typing.Optional[DataRef[KindData]]
+
+
+        ItemData.define(id='sword', Price=10, Tags=['melee'], Kind='KindData/blade')
+    ''')
+    assert descriptor is not None
+    fields = descriptor['classes'][0]['def']['Fields']
+    assert [f['Typename'] for f in fields] == ['uint32', 'List<string>', 'KindData']
+    assert descriptor['instances']['ItemData'][0]['Fields'][2] == {'Name': 'Kind', 'Value': 'KindData/blade'}
+
+
+@pytest.mark.parametrize('annotation', ['List[int]', 'Dict[str, int]', 'Optional[int]'])
+def test_generic_not_exported_by_types_falls_back(tmp_path, annotation):
+    # the types module doesn't export the typing generics, so the import raises NameError
+    assert _extract(tmp_path, '''
+        from {sdk}.models import BaseData
+        from {sdk}.models.types import *
+
+
+        class ItemData(BaseData):
+            Values: {annotation}
+    ''', annotation=annotation) is None
+
+
+def test_dataref_from_types_falls_back(tmp_path):
+    assert _extract(tmp_path, '''
+        from {sdk}.models import BaseData
+        from {sdk}.models.types import *
+
+
+        class KindData(BaseData):
+            Name: str
+
+
+        class ItemData(BaseData):
+            Kind: DataRef[KindData]
+    ''') is None
+
+
+@pytest.mark.parametrize('ref', ['KindData/', '/blade', 'KindData/a/b', 'blade'])
+def test_invalid_ref_falls_back(tmp_path, ref):
+    assert _extract(tmp_path, '''
+        from {sdk}.models import BaseData, DataRef
+
+
+        class KindData(BaseData):
+            Name: str
+
+
+        class ItemData(BaseData):
+            Kind: DataRef[KindData]
+
+
+        ItemData.define(id='sword', Kind='{ref}')
+    ''', ref=ref) is None
+
+
+def test_shadowed_class_falls_back(tmp_path):
+    assert _extract(tmp_path, '''
+        from {sdk}.models import BaseData
+
+
+        class ItemData(BaseData):
+            Price: int
+
+
+        from {sdk}.models import BaseData as ItemData
+    ''') is None
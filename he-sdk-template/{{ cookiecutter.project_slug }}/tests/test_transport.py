@@ -0,0 +1,104 @@
+import http.server
+import threading
+
+import pytest
+import requests
+
+from {{ cookiecutter.project_slug }}.sdk import transport as transport_module
+from {{ cookiecutter.project_slug }}.sdk.transport import HttpTransport
+
+
+class StubResponse(object):
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    # backoff sleeps take their upper bound and are recorded instead of slept
+    sleeps = []
+    monkeypatch.setattr(transport_module.random, 'uniform', lambda lo, hi: hi)
+    monkeypatch.setattr(transport_module.time, 'sleep', sleeps.append)
+    return sleeps
+
+
+def _transport(answers, **kwargs):
+    # each request gets the next answer: a status code, or an exception to raise
+    transport = HttpTransport(**kwargs)
+    calls = []
+
+    def request(method, url, **kwargs):
+        calls.append(method)
+        answer = answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return StubResponse(answer)
+
+    transport.session.request = request
+    return transport, calls
+
+
+def test_get_is_retried_with_backoff(sleeps):
+    transport, calls = _transport([503, requests.exceptions.ConnectionError(), 429, 200], backoff=0.5, backoff_max=1.5)
+    assert transport.get('http://backend/files/1').status_code == 200
+    assert calls == ['GET'] * 4
+    assert sleeps == [0.5, 1.0, 1.5]
+    stats = transport.stats['GET /files/1']
+    assert (stats.count, stats.errors) == (3, 1)
+
+
+def test_retries_are_bounded(sleeps):
+    transport, calls = _transport([503] * 3, retries=2)
+    assert transport.get('http://backend/files/1').status_code == 503
+    assert len(calls) == 3
+    transport, calls = _transport([requests.exceptions.Timeout()] * 3, retries=2)
+    with pytest.raises(requests.exceptions.Timeout):
+        transport.get('http://backend/files/1')
+    assert len(calls) == 3
+
+
+def test_post_is_not_retried_unless_asked(sleeps):
+    transport, calls = _transport([503, requests.exceptions.ConnectionError()])
+    assert transport.post('http://backend/ExportApp').status_code == 503
+    with pytest.raises(requests.exceptions.ConnectionError):
+        transport.post('http://backend/ExportApp')
+    assert calls == ['POST', 'POST'] and sleeps == []
+    transport, calls = _transport([503, 200])
+    assert transport.post('http://backend/ExportApp', retry=True).status_code == 200
+    assert calls == ['POST', 'POST']
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.peers.add(self.client_address)
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args):
+        pass
+
+
+def test_connections_are_kept_alive():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    server.peers = set()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    transport = HttpTransport(pool_size=2)
+    try:
+        url = 'http://127.0.0.1:{}/ping'.format(server.server_address[1])
+        for _ in range(5):
+            with transport.get(url) as resp:
+                assert resp.content == b'ok'
+        assert len(server.peers) == 1
+        assert transport.session.get_adapter(url)._pool_maxsize == 2
+    finally:
+        transport.close()
+        server.shutdown()
+        server.server_close()
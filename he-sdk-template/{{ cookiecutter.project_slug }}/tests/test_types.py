@@ -0,0 +1,70 @@
+import pytest
+from pydantic import ValidationError
+
+from {{ cookiecutter.project_slug }}.sdk.models import BaseData, DataRef
+from {{ cookiecutter.project_slug }}.sdk.models.types import Ulid
+
+ULID_STR = '01M57NR8J3NTG9P9CS4G50QFWE'
+
+
+class InternedKindData(BaseData):
+    Name: str
+
+
+class InternedItemData(BaseData):
+    Code: Ulid
+    Kind: DataRef[InternedKindData]
+
+
+class TaggedUlid(Ulid):
+    pass
+
+
+def test_ulid_parsing_is_shared():
+    parsed = Ulid.validate(ULID_STR)
+    assert type(parsed) is Ulid and parsed == ULID_STR
+    assert Ulid.validate(ULID_STR) is parsed
+    assert Ulid.validate(ULID_STR.lower()) == parsed
+    # subclasses get their own type, not the cached Ulid
+    assert type(TaggedUlid.validate(ULID_STR)) is TaggedUlid
+
+
+def test_invalid_ulids_are_rejected():
+    with pytest.raises(ValueError):
+        Ulid.validate('not-a-ulid')
+    with pytest.raises(TypeError):
+        Ulid.validate(1)
+
+
+def test_refs_are_interned():
+    ref = DataRef.validate_ref('InternedKindData/blade')
+    assert DataRef.validate_ref('InternedKindData/blade') is ref
+    assert DataRef.validate_ref(ref) is ref
+    # a ref built directly is equal and hashes the same as the interned one
+    direct = DataRef('InternedKindData', 'blade')
+    assert direct == ref and {ref: 1}[direct] == 1
+    assert not hasattr(ref, '__dict__')
+
+
+@pytest.mark.parametrize('value', ['InternedKindData/', '/blade', 'InternedKindData/a/b', 'blade'])
+def test_invalid_refs_are_rejected(value):
+    with pytest.raises(ValueError, match='Invalid data reference'):
+        DataRef.validate_ref(value)
+
+
+def test_rows_share_values():
+    rows = [dict(id=f'interned-{i}', Code=ULID_STR, Kind='InternedKindData/blade') for i in range(3)]
+    InternedItemData.define_many(rows)
+    InternedItemData.define(id='interned-single', Code=ULID_STR, Kind='InternedKindData/blade')
+    insts = [BaseData.get(InternedItemData, row['id']) for row in rows] + [BaseData.get(InternedItemData, 'interned-single')]
+    assert len(set(id(inst.Kind) for inst in insts)) == 1
+    assert len(set(id(inst.Code) for inst in insts)) == 1
+
+
+def test_invalid_values_report_their_row():
+    rows = [dict(id='bad-1', Code=ULID_STR, Kind='InternedKindData/blade'),
+            dict(id='bad-2', Code='nope', Kind='InternedKindData/blade')]
+    with pytest.raises(Exception, match="row 2: 'Code'='nope'"):
+        InternedItemData.define_many(rows)
+    with pytest.raises(ValidationError):
+        InternedItemData.define(id='bad-3', Code=ULID_STR, Kind='blade')
@@ -0,0 +1,91 @@
+import queue
+import threading
+import time
+
+import pytest
+
+from {{ cookiecutter.project_slug }}.sdk.watch import Watcher
+
+
+class ScriptedBackend(object):
+    # answers wait() with the scripted batches, then with nothing; the timeouts asked for are kept
+    name = 'scripted'
+
+    def __init__(self, batches):
+        self._batches = list(batches)
+        self.timeouts = []
+
+    def wait(self, timeout):
+        self.timeouts.append(timeout)
+        if not self._batches:
+            raise AssertionError('no more changes scripted')
+        return set(self._batches.pop(0))
+
+    def close(self):
+        pass
+
+
+def _scripted(monkeypatch, batches, debounce=0.3):
+    watcher = Watcher('.', debounce=debounce, poll=True)
+    backend = ScriptedBackend(batches)
+    monkeypatch.setattr(watcher, '_backend', backend)
+    return watcher, backend
+
+
+def test_burst_comes_out_as_one_batch(monkeypatch):
+    watcher, backend = _scripted(monkeypatch, [['b.py'], ['a.py'], ['b.py', 'c.py'], [], ['d.py'], []])
+    changes = watcher.changes()
+    assert next(changes) == ['a.py', 'b.py', 'c.py']
+    assert next(changes) == ['d.py']
+    # blocks for the first change, then waits `debounce` for more
+    assert backend.timeouts == [None, 0.3, 0.3, 0.3, None, 0.3]
+
+
+def test_empty_wakeup_is_not_a_change(monkeypatch):
+    watcher, backend = _scripted(monkeypatch, [[], [], ['a.py'], []])
+    assert next(watcher.changes()) == ['a.py']
+
+
+@pytest.fixture(params=[False, True], ids=['inotify', 'polling'])
+def watched(request, tmp_path):
+    root = tmp_path / 'models'
+    root.mkdir()
+    root.joinpath('kind.py').write_text('x = 1\n')
+    watcher = Watcher(root, debounce=0.2, poll=request.param, poll_interval=0.02)
+    batches = queue.Queue()
+
+    def collect():
+        for batch in watcher.changes():
+            batches.put(batch)
+
+    # changes() never returns, the watcher stays open for the thread, which goes with the test process
+    threading.Thread(target=collect, daemon=True).start()
+    return root, watcher, batches
+
+
+def test_saves_are_debounced(watched):
+    root, watcher, batches = watched
+    time.sleep(0.1)
+    for i in range(5):
+        root.joinpath('kind.py').write_text('x = 1\n' * (i + 2))
+        root.joinpath(f'item{i}.py').write_text('y = 1\n')
+        time.sleep(0.05)
+    batch = batches.get(timeout=5)
+    assert batch == sorted([str(root / 'kind.py')] + [str(root / f'item{i}.py') for i in range(5)])
+    time.sleep(0.4)
+    assert batches.empty()
+
+
+def test_only_sources_and_watched_files_count(watched, tmp_path):
+    root, watcher, batches = watched
+    csv_path = tmp_path / 'kinds.csv'
+    csv_path.write_text('id\n')
+    watcher.watch_files([csv_path])
+    time.sleep(0.1)
+    root.joinpath('notes.txt').write_text('ignored\n')
+    root.joinpath('__pycache__').mkdir()
+    root.joinpath('__pycache__', 'cached.py').write_text('ignored\n')
+    time.sleep(0.4)
+    csv_path.write_text('id\nblade\n')
+    assert batches.get(timeout=5) == [str(csv_path)]
+    assert batches.empty()
@@ -0,0 +1,116 @@
+import time
+
+import pytest
+
+from conftest import FakeSocket
+from {{ cookiecutter.project_slug }}.sdk import ws as ws_module
+from {{ cookiecutter.project_slug }}.sdk.ws import HeWsClient
+
+
+@pytest.fixture
+def sockets(monkeypatch):
+    # a new connection takes the next socket
+    sockets = [FakeSocket(), FakeSocket()]
+    connections = list(sockets)
+
+    def create_connection(url):
+        return connections.pop(0)
+
+    monkeypatch.setattr(ws_module.websocket, 'create_connection', create_connection)
+    return sockets
+
+
+def _wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_finished_jobs_are_forgotten(fake_socket):
+    client = HeWsClient('ws://backend/ws/', ticket='T', ping_interval=0)
+    try:
+        futures = {job_id: client.job_future(job_id) for job_id in ('a', 'b', 'c')}
+        assert sorted(client._pending_jobs()) == ['a', 'b', 'c']
+        fake_socket.finish('b', retval='b')
+        assert futures['b'].result(timeout=5).retval == 'b'
+        assert sorted(client._pending_jobs()) == ['a', 'c']
+        fake_socket.finish('c')
+        fake_socket.finish('a')
+        assert sorted(job.job_id for job in client.as_completed(['a', 'c'], timeout=5)) == ['a', 'c']
+        # a repeated message for a finished job doesn't bring it back, messages are handled in order
+        future_d = client.job_future('d')
+        fake_socket.finish('b', retval='b')
+        fake_socket.finish('d')
+        assert future_d.result(timeout=5).job_id == 'd'
+        assert client._pending_jobs() == []
+        assert client._dispatcher._futures == {}
+    finally:
+        client.close()
+
+
+def test_close_fails_pending_jobs(fake_socket):
+    client = HeWsClient('ws://backend/ws/', ticket='T', ping_interval=0)
+    future = client.job_future('a')
+    client.close()
+    with pytest.raises(ConnectionError):
+        future.result(timeout=5)
+    with pytest.raises(ConnectionError):
+        client.wait_for_job('b')
+
+
+def test_heartbeat_measures_round_trips(fake_socket):
+    client = HeWsClient('ws://backend/ws/', ticket='T', ping_interval=0.01)
+    try:
+        assert _wait_until(lambda: client.latency.count >= 3)
+        assert client.stats['reconnects'] == 0
+    finally:
+        client.close()
+
+
+def test_reconnect_resubscribes_pending_jobs(sockets):
+    tickets = iter(['T2'])
+    client = HeWsClient('ws://backend/ws/', ticket='T1', ticket_provider=lambda: next(tickets), ping_interval=0, backoff=0)
+    try:
+        pending = client.job_future('a')
+        finished = client.job_future('b')
+        sockets[0].finish('b')
+        finished.result(timeout=5)
+        # the server drops the connection, the job finishes on the new one
+        sockets[0].close()
+        sockets[1].finish('a', retval='after reconnect')
+        assert pending.result(timeout=5).retval == 'after reconnect'
+        assert client.stats['reconnects'] == 1
+        assert sockets[1].sent == [dict(event='auth', method='ticket', ticket='T2'),
+                                   dict(event='subscribe', subscription='jobs.a')]
+    finally:
+        client.close()
+
+
+def test_failed_reconnect_fails_pending_jobs(fake_socket, monkeypatch):
+    client = HeWsClient('ws://backend/ws/', ticket='T', ping_interval=0, reconnect_attempts=2, backoff=0)
+    try:
+        pending = client.job_future('a')
+
+        def refuse(url):
+            raise ConnectionRefusedError(url)
+
+        monkeypatch.setattr(ws_module.websocket, 'create_connection', refuse)
+        fake_socket.close()
+        with pytest.raises(ConnectionError, match='lost'):
+            pending.result(timeout=5)
+        with pytest.raises(ConnectionError):
+            client.job_future('b')
+    finally:
+        client.close()
+
+
+def test_missing_pong_reconnects(sockets):
+    sockets[0].answer_pings = False
+    client = HeWsClient('ws://backend/ws/', ticket='T', ping_interval=0.01, ping_timeout=0.05, backoff=0)
+    try:
+        assert _wait_until(lambda: client.stats['reconnects'] == 1)
+        # round trips are measured on the new connection, which answers
+        assert _wait_until(lambda: client.latency.count >= 1)
+    finally:
+        client.close()
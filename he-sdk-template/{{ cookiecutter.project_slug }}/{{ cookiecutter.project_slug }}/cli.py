@@ -1,89 +1,184 @@
 import inflection
+import os
 import pathlib
-import typing
+import subprocess
+import sys
+import time
 import typer
 from typing import List, Optional
 import json 
 
-from {{ cookiecutter.project_slug }}.sdk.dataloader import DataLoader
-from {{ cookiecutter.project_slug }}.sdk.client import HEClient, AppDefDTO
-from {{ cookiecutter.project_slug }}.sdk.appdata import AppData, AppEnvData, AppVersionData
+# sdk modules pull in pydantic, requests and the models; commands import what they use,
+# so --help and the create-* commands start fast (see bench-startup.py)
 
 
 cli_app = typer.Typer()
 
+# set while running as a daemon: the shared client
+_daemon = {}
+# set while running a pipeline: the client, app manifest and data loader shared by its stages, and their setup times
+_session = {}
+
+
+def _get_data_path():
+    return pathlib.Path(__file__).parents[1].joinpath('data')
+
+
+def _shared(key, factory):
+    if not _session:
+        return factory()
+    if key not in _session:
+        started = time.perf_counter()
+        _session[key] = factory()
+        _session['setup'][key] = time.perf_counter() - started
+    return _session[key]
+
+
+def _get_client():
+    from {{ cookiecutter.project_slug }}.sdk.cache import ArtifactCache
+    from {{ cookiecutter.project_slug }}.sdk.client import HEClient
+    if 'client' in _daemon:
+        return _daemon['client']
+    return _shared('client', lambda: HEClient(cache=ArtifactCache(_get_data_path().joinpath('.cache'))))
+
+
+def _load_manifest():
+    from {{ cookiecutter.project_slug }}.sdk.appdata import AppData
+    return _shared('manifest', AppData.load)
+
+
+def _get_loader(static=True, jobs=0):
+    from {{ cookiecutter.project_slug }}.sdk.dataloader import DataLoader
+    return _shared('loader', lambda: DataLoader('{{cookiecutter.project_slug}}.models',
+                                                cache_path=_get_data_path().joinpath('.cache', 'discovery.json'),
+                                                static=static,
+                                                # the daemon imports in-process, so the modules stay loaded for the next command
+                                                workers=jobs or (1 if _daemon else 0)))
 
 
 @cli_app.command()
-def collect():
+def collect(static: bool = typer.Option(True, '--static/--no-static', help='Read model files with literal definitions without importing them'),
+            jobs: int = typer.Option(0, '--jobs', '-j', help='Number of processes importing model files, 0 for one per CPU when there are many'),
+            columnar: bool = typer.Option(False, '--columnar', help='Print data class instances as one array per field'),
+            output: Optional[str] = typer.Option(None, '--output', '-o', help='Write the JSON to this file instead of stdout')):
     """
     Collects all data model definitions in the project, and prints them out in JSON format.
     """
-    dl = DataLoader('{{cookiecutter.project_slug}}.models')
-    print(dl.to_json())
+    dl = _get_loader(static=static, jobs=jobs)
+    if output:
+        _write_json_file(dl, output, columnar=columnar)
+    else:
+        dl.write_json(sys.stdout, columnar=columnar)
+        sys.stdout.write('\n')
+
+
+def _write_json_file(dl, output, columnar=False):
+    # written next to the output and renamed, so a failed collection keeps the previous file
+    tmp_path = f'{output}.tmp'
+    try:
+        with open(tmp_path, 'w') as f:
+            dl.write_json(f, columnar=columnar)
+            f.write('\n')
+        os.replace(tmp_path, output)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
 
 
 @cli_app.command()
-def export():
+def export(force: bool = typer.Option(False, '--force', help='Send the full app definition when --delta finds nothing changed'),
+           skip_unchanged: bool = typer.Option(False, '--skip-unchanged', help='Skip the export if the app definition is unchanged since the last export from this machine'),
+           delta: bool = typer.Option(False, '--delta', help='Send only the sections changed since the last exported snapshot'),
+           columnar: bool = typer.Option(False, '--columnar', help='Send data class instances as one array per field'),
+           compress: bool = typer.Option(False, '--gzip', help='Upload the app definition gzip-compressed'),
+           strict: bool = typer.Option(False, '--strict', help='Validate the whole app definition with pydantic before sending it'),
+           check_refs: bool = typer.Option(True, '--check-refs/--no-check-refs', help='Check that every data reference resolves before sending anything')):
     """
     Exports all data model definitions in the project to hyperedge's backend
     """
-    app_manifest = AppData.load()
-    dl = DataLoader('{{cookiecutter.project_slug}}.models')
-    j_app_data = dl.to_dict()
-    app_def = AppDefDTO(Name=app_manifest.Name, **j_app_data)
-    if app_manifest.Id:
-        app_def.Id = app_manifest.Id
-    client = HEClient()
-    resp = client.export_app(app_def)
+    dl = _get_loader()
+    if check_refs:
+        dl.check_refs()
+    _export_app(dl, force=force, delta=delta, columnar=columnar, compress=compress, strict=strict, skip_unchanged=skip_unchanged)
+
+
+def _export_app(dl, force=False, delta=False, columnar=False, compress=False, strict=False, skip_unchanged=False, client=None):
+    from {{ cookiecutter.project_slug }}.sdk.client import AppDefDeltaDTO
+    from {{ cookiecutter.project_slug }}.sdk.delta import build_delta
+    from {{ cookiecutter.project_slug }}.sdk.dto import construct_trusted
+    app_manifest = _load_manifest()
+    client = client or _get_client()
+    current_app_def_filepath = _get_data_path().joinpath('current.json')
+    resp = None
+    if delta and app_manifest.Id and app_manifest.AppDefFileId and current_app_def_filepath.exists():
+        with open(current_app_def_filepath, 'r') as f:
+            snapshot = json.load(f)
+        j_delta = build_delta(dl, snapshot)
+        if j_delta is None and not force:
+            print("Nothing changed since the last export")
+            return
+        if j_delta is not None:
+            j_delta = dict(Id=app_manifest.Id, Name=app_manifest.Name, **j_delta)
+            app_def_delta = AppDefDeltaDTO(**j_delta) if strict else construct_trusted(AppDefDeltaDTO, j_delta)
+            resp = client.export_app_delta(app_def_delta, app_manifest.AppDefFileId)
+    if resp is None:
+        app_def = dict(Id=app_manifest.Id, Name=app_manifest.Name, **dl.to_stream(columnar=columnar))
+        resp = client.export_app_stream(app_def, skip_unchanged=skip_unchanged, compress=compress, trusted=not strict)
     app_manifest.Id = resp.AppId
+    app_manifest.AppDefFileId = resp.AppDefFileId
     app_manifest.save()
     #
-    current_app_def_filepath = pathlib.Path(__file__).parents[1].joinpath('data', 'current.json')
     client.download_file_by_id(resp.AppDefFileId, str(current_app_def_filepath))
 
 
 @cli_app.command()
-def release(version_name: str):
+def release(version_name: str,
+            columnar: bool = typer.Option(False, '--columnar', help='Send data class instances as one array per field'),
+            compress: bool = typer.Option(False, '--gzip', help='Upload the app definition gzip-compressed'),
+            strict: bool = typer.Option(False, '--strict', help='Validate the whole app definition with pydantic before sending it'),
+            check_refs: bool = typer.Option(True, '--check-refs/--no-check-refs', help='Check that every data reference resolves before sending anything')):
     """
     Make a release and push all data model definitions in the project to hyperedge's backend
     """
-    app_manifest = AppData.load()
+    from {{ cookiecutter.project_slug }}.sdk.appdata import AppVersionData
+    app_manifest = _load_manifest()
     if not app_manifest.Id:
         raise Exception("AppId is empty. You should export app first")
     if app_manifest.has_version(version_name):
         print(f"Version {version_name} already exist")
         return
-    dl = DataLoader('{{cookiecutter.project_slug}}.models')
-    j_app_data = dl.to_dict()
-    app_def = AppDefDTO(Name=app_manifest.Name, **j_app_data)
-    client = HEClient()
-    resp = client.release_app(app_def, app_manifest.Id, version_name)
+    dl = _get_loader()
+    if check_refs:
+        dl.check_refs()
+    app_def = dict(Name=app_manifest.Name, **dl.to_stream(columnar=columnar))
+    client = _get_client()
+    resp = client.release_app_stream(app_def, app_manifest.Id, version_name, compress=compress, trusted=not strict)
     #
     app_manifest.add_version(AppVersionData(Id=resp.VersionId, Name=resp.VersionName))
     app_manifest.save()
     #
-    current_app_def_filepath = pathlib.Path(__file__).parents[1].joinpath('data', f'app-{version_name}.json')
+    current_app_def_filepath = _get_data_path().joinpath(f'app-{version_name}.json')
     client.download_file_by_id(resp.AppDefFileId, str(current_app_def_filepath))
 
 
 @cli_app.command()
 def build(version_name: str):
-    app_manifest = AppData.load()
+    app_manifest = _load_manifest()
     if not app_manifest.has_version(version_name):
         raise Exception(f"Unknown version: {version_name}")
-    client = HEClient()
+    client = _get_client()
     resp = client.build_app(app_manifest.Id, version_name)
     print(resp)
 
 
 @cli_app.command()
 def create_env(env_name: str):
-    app_manifest = AppData.load()
+    from {{ cookiecutter.project_slug }}.sdk.appdata import AppEnvData
+    app_manifest = _load_manifest()
     if app_manifest.has_app_env(env_name):
         print(f'AppEnv {env_name} already exists.')
         return
-    client = HEClient()
+    client = _get_client()
     resp = client.create_app_env(app_manifest.Id, env_name)
     app_manifest.add_app_env(AppEnvData(Id=resp.Id, Name=resp.Name))
     app_manifest.save()
@@ -91,7 +186,7 @@ def create_env(env_name: str):
 
 @cli_app.command()
 def run(version_name: str, env_name: str):
-    app_manifest = AppData.load()
+    app_manifest = _load_manifest()
     version = app_manifest.get_version(version_name)
     if version is None:
         print(f"Version {env_name} doesn't exist.")
@@ -100,26 +195,270 @@ def run(version_name: str, env_name: str):
     if app_env is None:
         print(f"AppEnv {env_name} doesn't exist.")
         return
-    client = HEClient()
+    client = _get_client()
     resp = client.run_app(app_manifest.Id, version.Id, app_env.Id)
 
 
 @cli_app.command()
-def gen_code():
-    app_manifest = AppData.load()
-    client = HEClient()
+def rollout(version_name: str,
+            envs: Optional[List[str]] = typer.Argument(None, help='AppEnv names or globs, comma-separated lists allowed; every AppEnv if omitted'),
+            limit: int = typer.Option(8, '--limit', '-j', help='Jobs running at the same time'),
+            canary: int = typer.Option(0, '--canary', help='Run on this many AppEnvs first, the rest only if they all succeed'),
+            wave_size: int = typer.Option(0, '--wave-size', help='Run on the rest in waves of this many AppEnvs, each once the previous one succeeded'),
+            fail_fast: bool = typer.Option(True, '--fail-fast/--no-fail-fast', help='Stop waiting for a wave on its first failure'),
+            dry_run: bool = typer.Option(False, '--dry-run', help='Only print the waves')):
+    """
+    Runs a version on many AppEnvs at once, e.g. rollout 0.0.1 'eu-*' us-east --canary 1 --wave-size 10
+    """
+    import asyncio
+    from {{ cookiecutter.project_slug }}.sdk.async_client import AsyncHEClient
+    app_manifest = _load_manifest()
+    version = app_manifest.get_version(version_name)
+    if version is None:
+        raise Exception(f"Unknown version: {version_name}")
+    patterns = [pattern for arg in (envs or ['*']) for pattern in arg.split(',') if pattern]
+    app_envs = app_manifest.match_app_envs(patterns)
+    rest = app_envs[canary:]
+    size = wave_size or len(rest) or 1
+    waves = [app_envs[:canary]] + [rest[i:i + size] for i in range(0, len(rest), size)]
+    waves = [[env.Id for env in wave] for wave in waves if wave]
+    env_names = {env.Id: env.Name for env in app_envs}
+    for i, wave in enumerate(waves):
+        print(f"Wave {i + 1}: {', '.join(env_names[env_id] for env_id in wave)}")
+    if dry_run:
+        return
+    #
+    started = time.perf_counter()
+    done = []
+
+    def _on_done(env_id, error):
+        done.append(env_id)
+        status = 'ok' if error is None else f"failed: {error}"
+        print(f"[{len(done)}/{len(app_envs)}] {env_names[env_id]} {status} ({time.perf_counter() - started:.1f} s)", flush=True)
+
+    async def _rollout():
+        # the client's websocket waits for every job
+        async_client = AsyncHEClient(max_concurrency=limit, client=_get_client())
+        try:
+            return await async_client.run_app_waves(app_manifest.Id, version.Id, waves, fail_fast=fail_fast, on_done=_on_done)
+        finally:
+            async_client.close()
+
+    results = asyncio.run(_rollout())
+    failed = [env_names[env_id] for env_id, error in results.items() if error is not None and not isinstance(error, asyncio.CancelledError)]
+    abandoned = [env_names[env_id] for env_id, error in results.items() if isinstance(error, asyncio.CancelledError)]
+    skipped = [env.Name for env in app_envs if env.Id not in results]
+    print(f"{len(results) - len(failed) - len(abandoned)} of {len(app_envs)} AppEnvs succeeded in {time.perf_counter() - started:.1f} s")
+    if failed:
+        print(f"Failed: {', '.join(failed)}")
+    if abandoned:
+        print(f"Submitted but not waited for: {', '.join(abandoned)}")
+    if skipped:
+        print(f"Not run: {', '.join(skipped)}")
+    if failed or abandoned or skipped:
+        raise typer.Exit(1)
+
+
+@cli_app.command()
+def gen_code(output: Optional[str] = typer.Option(None, '--output', help='Download the generated server archive to this path')):
+    app_manifest = _load_manifest()
+    client = _get_client()
     resp = client.gen_code(app_manifest.Id)
     print(resp)
+    if output:
+        client.download_file_by_id(resp.ServerFilesArchiveId, output)
 
 
 @cli_app.command()
 def start_server():
-    app_manifest = AppData.load()
-    client = HEClient()
+    app_manifest = _load_manifest()
+    client = _get_client()
     resp = client.start_server(app_manifest.Id)
     print(resp)
 
 
+_PIPELINE_STAGES = ('collect', 'export', 'release', 'build', 'create-env', 'run', 'rollout', 'gen-code', 'start-server')
+
+
+def _read_pipeline_spec(path: str) -> List[List[str]]:
+    # a list of stages, or a mapping with a 'stages' list; a stage is a command line or a list of arguments
+    import shlex
+    with open(path, 'r') as f:
+        if path.endswith('.json'):
+            spec = json.load(f)
+        else:
+            import yaml
+            spec = yaml.safe_load(f)
+    stages = spec.get('stages') if isinstance(spec, dict) else spec
+    if not isinstance(stages, list):
+        raise ValueError(f"{path}: expected a list of stages")
+    argvs = []
+    for stage in stages:
+        if isinstance(stage, str):
+            argvs.append(shlex.split(stage))
+        elif isinstance(stage, list):
+            argvs.append([str(arg) for arg in stage])
+        else:
+            raise ValueError(f"{path}: a stage is a command line or a list of arguments, not {stage!r}")
+    return argvs
+
+
+def _split_stages(args: List[str]) -> List[List[str]]:
+    argvs = [[]]
+    for arg in args:
+        if arg == '+':
+            argvs.append([])
+        else:
+            argvs[-1].append(arg)
+    return [argv for argv in argvs if argv]
+
+
+def _print_timings(timings, n_stages: int, setup: dict):
+    print("Pipeline timings:")
+    for label, elapsed, ok in timings:
+        print(f"  {label:<40} {elapsed * 1000:9.0f} ms" + ('' if ok else '  failed'))
+    if len(timings) < n_stages:
+        print(f"  {n_stages - len(timings)} stage(s) not run")
+    print(f"  {'total':<40} {sum(elapsed for _, elapsed, _ in timings) * 1000:9.0f} ms")
+    if 'loader' in setup:
+        print(f"  models collected once in {setup['loader'] * 1000:.0f} ms, included above")
+
+
+@cli_app.command(context_settings=dict(allow_extra_args=True, ignore_unknown_options=True))
+def pipeline(ctx: typer.Context,
+             spec: Optional[str] = typer.Option(None, '--spec', '-f', help='YAML or JSON file listing the stages, run before the chained ones')):
+    """
+    Runs commands chained with '+' with one client, app manifest and models collection, e.g.
+    pipeline export + release 0.0.1 + build 0.0.1 + run 0.0.1 test
+    """
+    argvs = (_read_pipeline_spec(spec) if spec else []) + _split_stages(ctx.args)
+    if not argvs:
+        raise typer.BadParameter("No stages: chain commands with '+' or pass --spec")
+    group = ctx.parent.command
+    # every stage is parsed before the first one runs, so a typo in the last one doesn't fail halfway
+    stages = []
+    for argv in argvs:
+        if argv[0] not in _PIPELINE_STAGES:
+            raise typer.BadParameter(f"'{argv[0]}' can't be a pipeline stage, use one of: {', '.join(_PIPELINE_STAGES)}")
+        command = group.get_command(ctx, argv[0])
+        stages.append((' '.join(argv), command, command.make_context(argv[0], argv[1:], parent=ctx.parent)))
+    #
+    _session['setup'] = {}
+    timings = []
+    try:
+        for label, command, stage_ctx in stages:
+            started = time.perf_counter()
+            ok = False
+            try:
+                with stage_ctx:
+                    command.invoke(stage_ctx)
+                ok = True
+            finally:
+                timings.append((label, time.perf_counter() - started, ok))
+    finally:
+        setup = _session['setup']
+        client = _session.get('client')
+        _session.clear()
+        if client is not None:
+            client.close()
+        _print_timings(timings, len(stages), setup)
+
+
+def _run_forwarded(argv: List[str]) -> int:
+    import click
+    command = typer.main.get_command(cli_app)
+    try:
+        return command.main(args=argv, prog_name='he-admin.py', standalone_mode=False) or 0
+    except click.exceptions.ClickException as e:
+        e.show()
+        return e.exit_code
+    except click.exceptions.Abort:
+        return 1
+
+
+@cli_app.command()
+def daemon(stop: bool = typer.Option(False, '--stop', help='Stop the running daemon'),
+           status: bool = typer.Option(False, '--status', help='Show whether a daemon is running'),
+           detach: bool = typer.Option(False, '--detach', help='Start the daemon in the background, logging to data/.cache/daemon.log')):
+    """
+    Keeps the models imported and the backend connection open; he-admin.py forwards its commands to a running daemon.
+    """
+    from {{ cookiecutter.project_slug }}.sdk.daemon import DaemonServer, ModuleReloader, request, socket_path
+    if stop or status:
+        if request(dict(stop=stop, status=status)) is None:
+            print("No daemon is running")
+        return
+    if detach:
+        log_path = _get_data_path().joinpath('.cache', 'daemon.log')
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(log_path, 'a') as log:
+            subprocess.Popen([sys.executable, str(pathlib.Path(__file__).parents[1].joinpath('he-admin.py')), 'daemon'],
+                             stdin=subprocess.DEVNULL, stdout=log, stderr=log, start_new_session=True)
+        print(f"Daemon started, logging to {log_path}")
+        return
+    #
+    server = DaemonServer(socket_path(), run_command=_run_forwarded, reloader=None)
+    client = _get_client()
+    try:
+        client.ws
+    except Exception as e:
+        # opened again on first use
+        print(f"Job channel not connected: {e}")
+    _daemon['client'] = client
+    _get_loader()
+    server.reloader = ModuleReloader('{{cookiecutter.project_slug}}.models')
+    print(f"Listening on {server.path}", flush=True)
+    try:
+        server.serve()
+    finally:
+        _daemon.clear()
+        client.close()
+
+
+@cli_app.command()
+def watch(export_changes: bool = typer.Option(False, '--export', help='Export the changed sections after every change'),
+          output: Optional[str] = typer.Option(None, '--output', '-o', help='Rewrite this file with the collected JSON after every change'),
+          debounce: float = typer.Option(0.3, '--debounce', help='Seconds without further saves before re-collecting'),
+          poll: bool = typer.Option(False, '--poll', help='Poll the files instead of using inotify')):
+    """
+    Watches the models and re-imports the changed modules on every save, optionally exporting the changes.
+    """
+    from {{ cookiecutter.project_slug }}.sdk.daemon import ModuleReloader
+    from {{ cookiecutter.project_slug }}.sdk.watch import Watcher
+    # jobs=1 imports in-process, so unchanged modules stay loaded between changes
+    dl = _get_loader(jobs=1)
+    reloader = ModuleReloader('{{cookiecutter.project_slug}}.models')
+    watcher = Watcher(_get_models_paths(), debounce=debounce, poll=poll)
+    watcher.watch_files(dl.data_files())
+    # one client for the whole watch, so its websocket and connections are reused between exports
+    client = _get_client() if export_changes else None
+    print(f"Watching {_get_models_paths()} ({watcher.backend}), {len(dl.dataclass_names())} data classes", flush=True)
+    try:
+        for paths in watcher.changes():
+            started = time.perf_counter()
+            try:
+                # a changed instance file of a cached module reloads nothing here, the loader's cache check catches it
+                reloaded = reloader.refresh() or paths
+                dl = _get_loader(jobs=1)
+                watcher.watch_files(dl.data_files())
+                if output:
+                    _write_json_file(dl, output)
+                dl.check_refs()
+                print(f"Reloaded {', '.join(reloaded)} in {(time.perf_counter() - started) * 1000:.0f} ms", flush=True)
+                if export_changes:
+                    _export_app(dl, delta=True, client=client)
+            except Exception as e:
+                # keep watching, the next save may fix it
+                reloader.drop_unloaded()
+                print(f"Error: {e}", flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+        if client is not None:
+            client.close()
+
+
 def _get_models_paths():
     return pathlib.Path(__file__).parent.joinpath('models')
 
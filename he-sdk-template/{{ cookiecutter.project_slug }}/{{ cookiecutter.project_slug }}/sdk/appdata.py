@@ -1,3 +1,4 @@
+import fnmatch
 import json
 import pathlib
 import pydantic
@@ -19,6 +20,7 @@ class AppData(pydantic.BaseModel):
     Name: str
     Versions: typing.List[AppVersionData]
     AppEnvironments: typing.List[AppEnvData]
+    AppDefFileId: typing.Optional[str] = None
 
     @staticmethod
     def default_path():
@@ -59,6 +61,14 @@ class AppDataWrapper(object):
     def Name(self):
         return self._app_data.Name
 
+    @property
+    def AppDefFileId(self):
+        return self._app_data.AppDefFileId
+
+    @AppDefFileId.setter
+    def AppDefFileId(self, value):
+        self._app_data.AppDefFileId = value
+
     def has_version(self, version_name: str) -> bool:
         return version_name in self._versions
 
@@ -79,5 +89,15 @@ class AppDataWrapper(object):
     def get_app_env(self, env_name: str) -> AppEnvData:
         return self._envs.get(env_name)
 
+    def match_app_envs(self, patterns: typing.Iterable[str]) -> typing.List[AppEnvData]:
+        # names or globs, in app.json order and without duplicates; a pattern matching nothing is an error
+        matched = set()
+        for pattern in patterns:
+            names = [name for name in self._envs if fnmatch.fnmatchcase(name, pattern)]
+            if not names:
+                raise ValueError(f"No AppEnv matches '{pattern}'")
+            matched.update(names)
+        return [env for env in self._app_data.AppEnvironments if env.Name in matched]
+
     def save(self, path=None):
         return self._app_data.save(path)
@@ -0,0 +1,169 @@
+import asyncio
+import concurrent.futures
+import functools
+import typing
+
+from .client import (
+    HEClient,
+    AppDefDTO,
+    ExportAppRequest,
+    ExportAppResponse,
+    ReleaseAppRequest,
+    ReleaseAppResponse,
+    BuildAppVersionRequest,
+    BuildAppVersionResponse,
+    CreateAppEnvRequest,
+    CreateAppEnvResponse,
+    RunAppRequest,
+    GenCodeRequest,
+    GenCodeResponse,
+    StartServerRequest,
+    _EMPTY_ULID,
+    _app_request_json
+)
+from .ws import JobData
+
+
+async def gather_bounded(aws: typing.Iterable[typing.Awaitable], limit: int, return_exceptions: bool = False):
+    sem = asyncio.Semaphore(limit)
+
+    async def _run(aw):
+        async with sem:
+            return await aw
+
+    return await asyncio.gather(*[_run(aw) for aw in aws], return_exceptions=return_exceptions)
+
+
+async def map_bounded(fn: typing.Callable[..., typing.Awaitable], items: typing.Iterable, limit: int,
+                      return_exceptions: bool = False):
+    return await gather_bounded([fn(item) for item in items], limit, return_exceptions=return_exceptions)
+
+
+class AsyncHEClient(object):
+    def __init__(self, url='localhost:9000', max_concurrency=16, client: typing.Optional[HEClient] = None):
+        # a client passed in belongs to the caller and stays open
+        self._owns_client = client is None
+        self._client = client or HEClient(url=url, pool_size=max_concurrency)
+        self._max_concurrency = max_concurrency
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrency)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def sync_client(self) -> HEClient:
+        return self._client
+
+    @property
+    def max_concurrency(self) -> int:
+        return self._max_concurrency
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        if self._owns_client:
+            self._client.close()
+
+    async def _call(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    async def _post_json(self, url: str, data: str) -> dict:
+        return await self._call(self._client._post_json, url, data)
+
+    async def wait_for_job(self, job_id: str, timeout: typing.Optional[float] = None) -> JobData:
+        ws = await self._call(lambda: self._client.ws)
+        return await asyncio.wait_for(asyncio.wrap_future(ws.job_future(job_id)), timeout)
+
+    async def _run_job(self, url: str, data: str) -> JobData:
+        resp = await self._post_json(url, data)
+        job_data = await self.wait_for_job(resp['JobId'])
+        if not job_data.success:
+            raise Exception(f"Job {job_data.job_id} failed: {job_data.retval}")
+        return job_data
+
+    async def export_app(self, data: AppDefDTO):
+        req = ExportAppRequest(AppId=data.Id or str(_EMPTY_ULID), AppDef=data)
+        job_data = await self._run_job(f'{self._client._depot_base_url}/ExportApp', _app_request_json(req))
+        return ExportAppResponse(**job_data.retval)
+
+    async def release_app(self, data: AppDefDTO, app_uid: str, version_name: str):
+        req = ReleaseAppRequest(AppId=str(app_uid), VersionName=version_name, AppDef=data)
+        job_data = await self._run_job(f'{self._client._depot_base_url}/ReleaseApp', _app_request_json(req))
+        return ReleaseAppResponse(**job_data.retval)
+
+    async def build_app(self, app_uid: str, version_name: str):
+        req = BuildAppVersionRequest(AppId=str(app_uid), VersionName=version_name)
+        job_data = await self._run_job(f'{self._client._apps_base_url}/BuildApp', req.json())
+        return BuildAppVersionResponse(**job_data.retval)
+
+    async def create_app_env(self, app_uid: str, env_name: str):
+        req = CreateAppEnvRequest(AppId=str(app_uid), Name=env_name)
+        resp = await self._post_json(f'{self._client._apps_base_url}/CreateAppEnv', req.json())
+        return CreateAppEnvResponse(**resp.get('AppEnv', dict()))
+
+    async def run_app(self, app_uid: str, version_uid: str, env_uid: str):
+        req = RunAppRequest(AppId=app_uid, VersionId=version_uid, EnvId=env_uid)
+        await self._run_job(f'{self._client._apps_base_url}/RunApp', req.json())
+
+    async def run_app_many(self, app_uid: str, version_uid: str, env_uids: typing.Iterable[str],
+                           limit: typing.Optional[int] = None, return_exceptions: bool = False):
+        return await map_bounded(lambda env_uid: self.run_app(app_uid, version_uid, env_uid),
+                                 env_uids, limit or self._max_concurrency, return_exceptions=return_exceptions)
+
+    async def run_app_waves(self, app_uid: str, version_uid: str, waves: typing.Iterable[typing.Iterable[str]],
+                            limit: typing.Optional[int] = None, fail_fast: bool = True,
+                            on_done: typing.Optional[typing.Callable[[str, typing.Optional[Exception]], None]] = None
+                            ) -> typing.Dict[str, typing.Optional[BaseException]]:
+        # env uid -> None if its job succeeded, the error if it failed, CancelledError if it was submitted but not
+        # waited for; envs never submitted are left out. A wave starts once the previous one fully succeeded,
+        # with fail_fast the rest of a wave is cancelled on its first failure
+        sem = asyncio.Semaphore(limit or self._max_concurrency)
+        started = set()
+        results = {}
+
+        async def _run(env_uid):
+            async with sem:
+                started.add(env_uid)
+                try:
+                    await self.run_app(app_uid, version_uid, env_uid)
+                except Exception as e:
+                    return env_uid, e
+                return env_uid, None
+
+        for wave in waves:
+            tasks = [asyncio.ensure_future(_run(env_uid)) for env_uid in wave]
+            failed = False
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    env_uid, error = await next_done
+                    results[env_uid] = error
+                    failed = failed or error is not None
+                    if on_done is not None:
+                        on_done(env_uid, error)
+                    if failed and fail_fast:
+                        break
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+            for env_uid in started:
+                results.setdefault(env_uid, asyncio.CancelledError())
+            if failed:
+                break
+        return results
+
+    async def gen_code(self, uid: str):
+        req = GenCodeRequest(Id=uid)
+        job_data = await self._run_job(f'{self._client._misc_base_url}/GenCode', req.json())
+        return GenCodeResponse(ServerFilesArchiveId=job_data.retval['ServerFilesArchiveId'])
+
+    async def start_server(self, uid: str):
+        req = StartServerRequest(Id=uid)
+        await self._run_job(f"{self._client._misc_base_url}/server/start", req.json())
+        return None
+
+    async def download_file_by_id(self, file_uid: str, filepath: str, sha256: typing.Optional[str] = None) -> str:
+        return await self._call(self._client.download_file_by_id, file_uid, filepath, sha256=sha256)
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import pathlib
+import threading
+import time
+import typing
+
+
+class ArtifactCache(object):
+    def __init__(self, root, max_bytes: int = 512 * 1024 * 1024):
+        self._root = pathlib.Path(root)
+        self._objects_path = self._root.joinpath('objects')
+        self._index_path = self._root.joinpath('index.json')
+        self._max_bytes = max_bytes
+        self._lock = threading.RLock()
+        self._index = self._load_index()
+
+    @property
+    def root(self) -> pathlib.Path:
+        return self._root
+
+    def _load_index(self) -> dict:
+        try:
+            with open(self._index_path, 'r') as f:
+                index = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            index = {}
+        index.setdefault('files', {})
+        index.setdefault('objects', {})
+        index.setdefault('meta', {})
+        return index
+
+    def _save_index(self):
+        self._root.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._index_path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self._index_path)
+
+    def _object_path(self, digest: str) -> pathlib.Path:
+        return self._objects_path.joinpath(digest[:2], digest)
+
+    def get_meta(self, key: str):
+        return self._index['meta'].get(key)
+
+    def set_meta(self, key: str, value):
+        with self._lock:
+            self._index['meta'][key] = value
+            self._save_index()
+
+    def digest(self, file_uid: str) -> typing.Optional[str]:
+        with self._lock:
+            digest = self._index['files'].get(file_uid)
+            if digest is None or not self._object_path(digest).exists():
+                return None
+            return digest
+
+    def materialize(self, file_uid: str, filepath: str) -> typing.Optional[str]:
+        with self._lock:
+            digest = self.digest(file_uid)
+            if digest is None:
+                return None
+            if not self._copy(self._object_path(digest), pathlib.Path(filepath), digest):
+                # changed on disk, e.g. through a hard link an older version handed out, so it's downloaded again
+                self._drop(digest)
+                self._save_index()
+                return None
+            self._index['objects'][digest]['atime'] = time.time()
+            self._save_index()
+            return digest
+
+    def fetch(self, file_uid: str, filepath: str, download_fn: typing.Callable[[str, str], str]) -> str:
+        digest = self.materialize(file_uid, filepath)
+        if digest is not None:
+            return digest
+        tmp_dir = self._root.joinpath('tmp')
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = tmp_dir.joinpath(file_uid)
+        digest = download_fn(file_uid, str(tmp_path))
+        self.add(file_uid, str(tmp_path), digest)
+        self.materialize(file_uid, filepath)
+        return digest
+
+    def add(self, file_uid: str, filepath: str, digest: typing.Optional[str] = None):
+        if digest is None:
+            hasher = hashlib.sha256()
+            with open(filepath, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    hasher.update(chunk)
+            digest = hasher.hexdigest()
+        with self._lock:
+            obj_path = self._object_path(digest)
+            if obj_path.exists():
+                os.remove(filepath)
+            else:
+                obj_path.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(filepath, obj_path)
+            self._index['files'][file_uid] = digest
+            self._index['objects'][digest] = dict(size=obj_path.stat().st_size, atime=time.time())
+            self._evict(keep=digest)
+            self._save_index()
+        return digest
+
+    def _evict(self, keep: str):
+        objects = self._index['objects']
+        total = sum(obj['size'] for obj in objects.values())
+        for digest, obj in sorted(objects.items(), key=lambda kv: kv[1]['atime']):
+            if total <= self._max_bytes:
+                break
+            if digest == keep:
+                continue
+            try:
+                os.remove(self._object_path(digest))
+            except FileNotFoundError:
+                pass
+            total -= obj['size']
+            del objects[digest]
+        self._index['files'] = {uid: digest for uid, digest in self._index['files'].items() if digest in objects}
+
+    def _drop(self, digest: str):
+        try:
+            os.remove(self._object_path(digest))
+        except FileNotFoundError:
+            pass
+        self._index['objects'].pop(digest, None)
+        self._index['files'] = {uid: d for uid, d in self._index['files'].items() if d != digest}
+
+    @staticmethod
+    def _copy(src: pathlib.Path, dst: pathlib.Path, digest: str) -> bool:
+        # a private, writable copy, checked against the digest while copying and renamed into place
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = dst.with_name(dst.name + '.tmp')
+        hasher = hashlib.sha256()
+        with open(src, 'rb') as fsrc, open(tmp_path, 'wb') as fdst:
+            for chunk in iter(lambda: fsrc.read(1 << 20), b''):
+                hasher.update(chunk)
+                fdst.write(chunk)
+        if hasher.hexdigest() != digest:
+            os.remove(tmp_path)
+            return False
+        os.replace(tmp_path, dst)
+        return True
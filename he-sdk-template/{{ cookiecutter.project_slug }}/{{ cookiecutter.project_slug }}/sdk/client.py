@@ -1,13 +1,25 @@
+import functools
+import gzip
+import hashlib
 import os
 import pydantic
+import pydantic.json
 import requests
+import tempfile
+import threading
 import typing
 import ulid
 
+from .cache import ArtifactCache
+from .download import download_to_file, download_many
+from .dto import dto_encoder, field_encoder
+from .stream import StreamDict, StreamList, write_json
+from .transport import HttpTransport
 from .ws import HeWsClient
 
 
 _EMPTY_ULID = ulid.ULID(bytes(16))
+_SPOOL_MAX_SIZE = 16 << 20
 
 
 class DataClassFieldDTO(pydantic.BaseModel):
@@ -37,6 +49,12 @@ class DataClassInstanceFieldsDTO(pydantic.BaseModel):
     Fields: typing.List[DataClassInstanceFieldDTO]
 
 
+class DataClassInstanceColumnsDTO(pydantic.BaseModel):
+    Fields: typing.List[str]
+    Names: typing.List[str]
+    Columns: typing.List[typing.List[str]]
+
+
 class InventoryItemDefDTO(pydantic.BaseModel):
     Id: str
     Typename: str
@@ -159,6 +177,7 @@ class AppDefDTO(pydantic.BaseModel):
     StructClasses: typing.List[DataClassDTO]
     StorageClasses: typing.List[typing.Tuple[int, DataClassDTO]]
     DataClassInstances: typing.Dict[str, typing.List[DataClassInstanceDTO]]
+    DataClassInstanceColumns: typing.Optional[typing.Dict[str, DataClassInstanceColumnsDTO]]
     Inventories: typing.List[InventoryDefDTO]
     Quests: typing.List[QuestDTO]
     Tournaments: typing.List[TournamentDTO]
@@ -171,11 +190,31 @@ class AppDefDTO(pydantic.BaseModel):
     RequestHandlers: typing.List[RequestHandlerDTO]
 
 
+class AppDefDeltaDTO(pydantic.BaseModel):
+    Id: typing.Optional[str]
+    Name: str
+    DataClasses: typing.List[DataClassDTO]
+    RemovedDataClasses: typing.List[str]
+    ModelClasses: typing.List[DataClassDTO]
+    RemovedModelClasses: typing.List[str]
+    StructClasses: typing.List[DataClassDTO]
+    RemovedStructClasses: typing.List[str]
+    DataClassInstances: typing.Dict[str, typing.List[DataClassInstanceDTO]]
+    RemovedDataClassInstances: typing.List[str]
+    Inventories: typing.List[InventoryDefDTO]
+
+
 class ExportAppRequest(pydantic.BaseModel):
     AppId: str
     AppDef: AppDefDTO
 
 
+class ExportAppDeltaRequest(pydantic.BaseModel):
+    AppId: str
+    BaseRevisionId: str
+    AppDef: AppDefDeltaDTO
+
+
 class ExportAppResponse(pydantic.BaseModel):
     AppId: str
     AppDefFileId: str
@@ -238,18 +277,132 @@ class StartServerRequest(pydantic.BaseModel):
     Id: str
 
 
+def _app_request_json(req) -> str:
+    # rows-only app definitions are sent exactly as before the columnar field existed
+    if req.AppDef.DataClassInstanceColumns is None:
+        return req.json(exclude={'AppDef': {'DataClassInstanceColumns'}})
+    return req.json()
+
+
+def _validate_field(model, fname: str, value):
+    field = model.__fields__[fname]
+    value, errors = field.validate(value, {}, loc=fname, cls=model)
+    if errors:
+        raise pydantic.ValidationError([errors], model)
+    return value
+
+
+def _stream_rows(rows):
+    return rows.items if isinstance(rows, StreamList) else rows
+
+
+def _validated(model):
+    return lambda data: model(**data).dict()
+
+
+def _app_request_stream(head: typing.List[typing.Tuple[str, typing.Any]], app_def: dict, trusted: bool = False) -> StreamDict:
+    # AppDefDTO layout, validated (or, when trusted, only encoded) a piece at a time so that instance tables are never held as DTOs
+    encode_row = dto_encoder(DataClassInstanceDTO) if trusted else _validated(DataClassInstanceDTO)
+    encode_table = dto_encoder(DataClassInstanceColumnsDTO) if trusted else _validated(DataClassInstanceColumnsDTO)
+
+    def _sections():
+        for fname in AppDefDTO.__fields__.keys():
+            value = app_def.get(fname)
+            if fname == 'DataClassInstanceColumns' and value is None:
+                continue
+            if fname == 'DataClassInstances' and isinstance(value, StreamDict):
+                value = StreamDict((cls_name, StreamList(map(encode_row, _stream_rows(rows)))) for cls_name, rows in value.items)
+            elif fname == 'DataClassInstanceColumns' and isinstance(value, StreamDict):
+                value = StreamDict((cls_name, encode_table(table)) for cls_name, table in value.items)
+            elif trusted:
+                value = field_encoder(AppDefDTO, fname)(value)
+            else:
+                value = _validate_field(AppDefDTO, fname, value)
+            yield fname, value
+    return StreamDict(head + [('AppDef', StreamDict(_sections()))])
+
+
+class _HashingWriter(object):
+    def __init__(self, fp):
+        self._fp = fp
+        self._hasher = hashlib.sha256()
+
+    def write(self, text: str):
+        data = text.encode('utf-8')
+        self._hasher.update(data)
+        self._fp.write(data)
+
+    def hexdigest(self) -> str:
+        return self._hasher.hexdigest()
+
+
+class _SizedBody(object):
+    # the spooled body with its size, so that requests sends it with a Content-Length like any other body;
+    # given the file itself, requests would call fileno() and roll an in-memory body over to disk
+    def __init__(self, fp):
+        self._fp = fp
+        fp.seek(0, os.SEEK_END)
+        self._size = fp.tell()
+        fp.seek(0)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def read(self, size: int = -1) -> bytes:
+        return self._fp.read(size)
+
+
+def _spool_request(req: StreamDict, compress: bool):
+    # the body is spooled (to disk once large) so its hash and size are known before the upload
+    body = tempfile.SpooledTemporaryFile(max_size=_SPOOL_MAX_SIZE)
+    out = gzip.GzipFile(fileobj=body, mode='wb', mtime=0) if compress else body
+    writer = _HashingWriter(out)
+    write_json(req, writer, default=pydantic.json.pydantic_encoder)
+    if compress:
+        out.close()
+    body.seek(0)
+    return body, writer.hexdigest()
+
+
 class HEClient(object):
-    def __init__(self, url='localhost:9000'):
+    def __init__(self, url='localhost:9000', pool_size=10, timeout=(5.0, 60.0), retries=3,
+                 cache: typing.Optional[ArtifactCache] = None):
         self._api_key = os.environ.get('HE_API_KEY')
         self._host = url
         self._url = f'http://{url}'
         self._ws = None
+        self._ws_lock = threading.Lock()
+        self._headers = None
+        self._cache = cache
+        self._transport = HttpTransport(pool_size=pool_size, timeout=timeout, retries=retries)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        with self._ws_lock:
+            ws, self._ws = self._ws, None
+        if ws is not None:
+            ws.close()
+        self._transport.close()
+
+    @property
+    def stats(self):
+        return self._transport.stats
+
+    @property
+    def cache(self) -> typing.Optional[ArtifactCache]:
+        return self._cache
 
     @property
     def ws(self):
-        if self._ws is None:
-            ticket = self.get_ticket()
-            self._ws = HeWsClient(url=f'ws://{self._host}/ws/', ticket=ticket)
+        with self._ws_lock:
+            if self._ws is None:
+                ticket = self.get_ticket()
+                self._ws = HeWsClient(url=f'ws://{self._host}/ws/', ticket=ticket, ticket_provider=self.get_ticket)
         return self._ws
 
     @property
@@ -268,9 +421,50 @@ class HEClient(object):
     def _misc_base_url(self):
         return f'{self._url}/api/bc'
 
-    def export_app(self, data: AppDefDTO):
+    def export_app(self, data: AppDefDTO, skip_unchanged: bool = False):
         req = ExportAppRequest(AppId=data.Id or str(_EMPTY_ULID), AppDef=data)
-        resp = self._post_json(f'{self._depot_base_url}/ExportApp', req.json())
+        payload = _app_request_json(req)
+        payload_hash = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+        if data.Id and skip_unchanged:
+            last_export = self._last_export(req.AppId, payload_hash)
+            if last_export is not None:
+                return last_export
+        resp = self._post_json(f'{self._depot_base_url}/ExportApp', payload)
+        return self._finish_export(resp, payload_hash)
+
+    def export_app_stream(self, app_def: dict, skip_unchanged: bool = False, compress: bool = False, trusted: bool = False):
+        app_id = app_def.get('Id') or str(_EMPTY_ULID)
+        body, payload_hash = _spool_request(_app_request_stream([('AppId', app_id)], app_def, trusted=trusted), compress)
+        with body:
+            if app_def.get('Id') and skip_unchanged:
+                last_export = self._last_export(app_id, payload_hash)
+                if last_export is not None:
+                    return last_export
+            resp = self._post_json_stream(f'{self._depot_base_url}/ExportApp', body, compress)
+        return self._finish_export(resp, payload_hash)
+
+    def _last_export(self, app_id: str, payload_hash: str) -> typing.Optional[ExportAppResponse]:
+        # skip the round-trip when this exact app definition was the last one exported for the app
+        if self._cache is None:
+            return None
+        last_export = self._cache.get_meta(f'export:{app_id}')
+        if last_export and last_export['hash'] == payload_hash and self._cache.digest(last_export['retval']['AppDefFileId']):
+            print(f"App definition of {app_id} is unchanged since the last export, skipping it")
+            return ExportAppResponse(**last_export['retval'])
+        return None
+
+    def _finish_export(self, resp: dict, payload_hash: str) -> ExportAppResponse:
+        job_data = self.ws.wait_for_job(resp['JobId'])
+        if not job_data.success:
+            raise Exception()
+        export_resp = ExportAppResponse(**job_data.retval)
+        if self._cache is not None:
+            self._cache.set_meta(f'export:{export_resp.AppId}', dict(hash=payload_hash, retval=export_resp.dict()))
+        return export_resp
+
+    def export_app_delta(self, data: AppDefDeltaDTO, base_revision_id: str):
+        req = ExportAppDeltaRequest(AppId=data.Id, BaseRevisionId=base_revision_id, AppDef=data)
+        resp = self._post_json(f'{self._depot_base_url}/ExportAppDelta', req.json())
         job_data = self.ws.wait_for_job(resp['JobId'])
         if not job_data.success:
             raise Exception()
@@ -278,7 +472,18 @@ class HEClient(object):
 
     def release_app(self, data: AppDefDTO, app_uid: ulid.ULID, version_name: str):
         req = ReleaseAppRequest(AppId=str(app_uid), VersionName=version_name, AppDef=data)
-        resp = self._post_json(f'{self._depot_base_url}/ReleaseApp', req.json())
+        resp = self._post_json(f'{self._depot_base_url}/ReleaseApp', _app_request_json(req))
+        job_data = self.ws.wait_for_job(resp['JobId'])
+        if not job_data.success:
+            raise Exception()
+        return ReleaseAppResponse(**job_data.retval)
+
+    def release_app_stream(self, app_def: dict, app_uid: ulid.ULID, version_name: str,
+                           compress: bool = False, trusted: bool = False):
+        req = _app_request_stream([('AppId', str(app_uid)), ('VersionName', version_name)], app_def, trusted=trusted)
+        body, _ = _spool_request(req, compress)
+        with body:
+            resp = self._post_json_stream(f'{self._depot_base_url}/ReleaseApp', body, compress)
         job_data = self.ws.wait_for_job(resp['JobId'])
         if not job_data.success:
             raise Exception()
@@ -332,35 +537,46 @@ class HEClient(object):
         resp = self._get_json(f"{self._misc_base_url}/ws/ticket")
         return resp['ticket']
 
-    def download_file_by_id(self, file_uid: str, filepath: str):
+    def download_file_by_id(self, file_uid: str, filepath: str, sha256: typing.Optional[str] = None, progress=None) -> str:
+        download_fn = functools.partial(self._download_file, sha256=sha256, progress=progress)
+        if self._cache is not None:
+            return self._cache.fetch(file_uid, filepath, download_fn)
+        return download_fn(file_uid, filepath)
+
+    def _download_file(self, file_uid: str, filepath: str, sha256: typing.Optional[str] = None, progress=None) -> str:
         link = self._get_file_link(file_uid)
-        resp = requests.get(link)
-        with open(filepath, 'w') as f:
-            f.write(resp.text)
+        return download_to_file(self._transport, link, filepath, sha256=sha256, on_progress=progress)
+
+    def download_many(self, files: typing.Dict[str, str], sha256: typing.Optional[typing.Dict[str, str]] = None,
+                      max_workers: int = 4, show_progress: bool = True) -> typing.Dict[str, str]:
+        return download_many(self.download_file_by_id, files, sha256=sha256,
+                             max_workers=max_workers, show_progress=show_progress)
 
     def _get_file_link(self, file_uid: str) -> str:
         resp = self._get_json(f"{self._misc_base_url}/file/{file_uid}")
         return resp['url']
 
     def _get_headers(self) -> dict:
-        if not self._api_key:
-            raise ValueError('HyperEdge API key is not defined')
-        return {
-            'Content-type': 'application/json',
-            'Accept': 'text/plain',
-            'X-API-Key': self._api_key
-        }
+        if self._headers is None:
+            if not self._api_key:
+                raise ValueError('HyperEdge API key is not defined')
+            self._headers = {
+                'Content-type': 'application/json',
+                'Accept': 'text/plain',
+                'X-API-Key': self._api_key
+            }
+        return self._headers
 
     def _get_json(self, url: str) -> dict:
         headers = self._get_headers()
-        resp = requests.get(url, headers=headers)
+        resp = self._transport.get(url, headers=headers)
         print(f'Status: {resp.status_code}')
         print(resp.json())
         return resp.json()
 
-    def _post_json(self, url: str, data: str) -> dict:
-        headers = self._get_headers()
-        resp = requests.post(url, data=data, headers=headers)
+    def _post_json(self, url: str, data, headers: typing.Optional[dict] = None) -> dict:
+        headers = headers or self._get_headers()
+        resp = self._transport.post(url, data=data, headers=headers)
         print(f'Status: {resp.status_code}')
         try:
             print(resp.json())
@@ -368,3 +584,9 @@ class HEClient(object):
             print(resp.text)
             raise
         return resp.json()
+
+    def _post_json_stream(self, url: str, body, compress: bool = False) -> dict:
+        headers = self._get_headers()
+        if compress:
+            headers = dict(headers, **{'Content-Encoding': 'gzip'})
+        return self._post_json(url, _SizedBody(body), headers=headers)
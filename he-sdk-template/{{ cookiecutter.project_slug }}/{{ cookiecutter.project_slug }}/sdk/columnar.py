@@ -0,0 +1,62 @@
+import typing
+
+
+# DataClassInstances in columnar form: {class name: {'Fields': [field names], 'Names': [instance ids], 'Columns': [[values of field 0], ...]}}
+
+
+def empty_table(field_names: typing.List[str]) -> dict:
+    return dict(Fields=list(field_names), Names=[], Columns=[[] for _ in field_names])
+
+
+def append_rows(table: dict, rows: typing.Iterable[dict]):
+    field_names = table['Fields']
+    names = table['Names']
+    columns = table['Columns']
+    for row in rows:
+        flds = row['Fields']
+        if len(flds) != len(field_names) or any(f['Name'] != fname for f, fname in zip(flds, field_names)):
+            raise ValueError(f"Instance '{row['Name']}' fields {[f['Name'] for f in flds]} don't match {field_names}")
+        names.append(row['Name'])
+        for column, f in zip(columns, flds):
+            column.append(f['Value'])
+
+
+def extend_table(table: dict, other: dict):
+    if other['Fields'] != table['Fields']:
+        raise ValueError(f"Fields {other['Fields']} don't match {table['Fields']}")
+    table['Names'].extend(other['Names'])
+    for column, other_column in zip(table['Columns'], other['Columns']):
+        column.extend(other_column)
+
+
+def encode_instances(instances: typing.Dict[str, typing.List[dict]]) -> typing.Dict[str, dict]:
+    tables = {}
+    for cls_name, rows in instances.items():
+        table = tables[cls_name] = empty_table([f['Name'] for f in rows[0]['Fields']] if rows else [])
+        append_rows(table, rows)
+    return tables
+
+
+def decode_instances(tables: typing.Dict[str, dict]) -> typing.Dict[str, typing.List[dict]]:
+    instances = {}
+    for cls_name, table in tables.items():
+        field_names = table['Fields']
+        rows = zip(*table['Columns']) if field_names else [()] * len(table['Names'])
+        instances[cls_name] = [
+            dict(Name=name, Fields=[{'Name': fname, 'Value': value} for fname, value in zip(field_names, values)])
+            for name, values in zip(table['Names'], rows)
+        ]
+    return instances
+
+
+def expand_app_def(app_def: dict) -> dict:
+    # for backends that only take rows
+    tables = app_def.get('DataClassInstanceColumns')
+    if not tables:
+        return app_def
+    app_def = dict(app_def)
+    instances = dict(app_def.get('DataClassInstances') or {})
+    instances.update(decode_instances(tables))
+    app_def['DataClassInstances'] = instances
+    app_def['DataClassInstanceColumns'] = None
+    return app_def
@@ -0,0 +1,263 @@
+import contextlib
+import importlib
+import json
+import os
+import pathlib
+import socket
+import socketserver
+import sys
+import threading
+import traceback
+import typing
+
+
+# he-admin daemon: a long-lived process that keeps the models imported and the client connected.
+# he-admin.py forwards its argv over a unix socket, the daemon runs the command in-process and
+# streams its output back as json lines: {"stdout": text}, {"stderr": text}, then {"exit": code}.
+# Only the standard library is imported at module level, forward() runs before anything else.
+
+NO_DAEMON_ENV = 'HE_ADMIN_NO_DAEMON'
+# commands that don't return until interrupted, the daemon runs one command at a time
+LOCAL_COMMANDS = ('daemon', 'watch')
+
+
+def socket_path() -> pathlib.Path:
+    return pathlib.Path(__file__).parents[2].joinpath('data', '.cache', 'daemon.sock')
+
+
+def _connect(path: pathlib.Path) -> typing.Optional[socket.socket]:
+    if not path.exists():
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(path))
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def request(message: dict, out=None, err=None) -> typing.Optional[int]:
+    # None if no daemon is listening
+    sock = _connect(socket_path())
+    if sock is None:
+        return None
+    out = out or sys.stdout
+    err = err or sys.stderr
+    with sock, sock.makefile('rwb') as f:
+        f.write(json.dumps(message).encode('utf-8') + b'\n')
+        f.flush()
+        try:
+            for line in f:
+                reply = json.loads(line)
+                if 'stdout' in reply:
+                    out.write(reply['stdout'])
+                    out.flush()
+                elif 'stderr' in reply:
+                    err.write(reply['stderr'])
+                    err.flush()
+                elif 'exit' in reply:
+                    return reply['exit']
+        except BrokenPipeError:
+            # output piped into something that stopped reading, e.g. head
+            return 1
+    # the daemon went away mid-command
+    return 1
+
+
+def _command_name(argv: typing.List[str]) -> typing.Optional[str]:
+    return next((arg for arg in argv if not arg.startswith('-')), None)
+
+
+def forward(argv: typing.List[str]) -> typing.Optional[int]:
+    if os.environ.get(NO_DAEMON_ENV) or _command_name(argv) in LOCAL_COMMANDS:
+        return None
+    return request(dict(argv=argv, cwd=os.getcwd()))
+
+
+class _LineWriter(object):
+    # file-like object sending what is written as {key: text} lines, in chunks
+    def __init__(self, wfile, key: str, buffer_size: int = 1 << 16):
+        self._wfile = wfile
+        self._key = key
+        self._buffer_size = buffer_size
+        self._buf = []
+        self._size = 0
+
+    def write(self, s: str) -> int:
+        # click probes streams with b'' to tell text from binary ones
+        if not isinstance(s, str):
+            raise TypeError(f"write() argument must be str, not {type(s).__name__}")
+        self._buf.append(s)
+        self._size += len(s)
+        if self._size >= self._buffer_size:
+            self.flush()
+        return len(s)
+
+    def flush(self):
+        if self._buf:
+            text = ''.join(self._buf)
+            self._buf = []
+            self._size = 0
+            self._wfile.write(json.dumps({self._key: text}).encode('utf-8') + b'\n')
+        self._wfile.flush()
+
+    def isatty(self) -> bool:
+        return False
+
+
+def _file_stamp(path: str) -> tuple:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return path, None, None
+    return path, st.st_mtime_ns, st.st_size
+
+
+class ModuleReloader(object):
+    # drops project modules whose files changed, and every module importing them, so the next DataLoader imports them again
+    def __init__(self, package_name: str):
+        self._package_name = package_name
+        self._stamps = self._scan()
+
+    def _scan(self) -> typing.Dict[str, tuple]:
+        from .dataloader import package_files
+        from .models import BaseData
+        stamps = {}
+        for pname, fpath in package_files(self._package_name).items():
+            st = fpath.stat()
+            # and the instance files it read, when it was imported
+            files = tuple(_file_stamp(path) for path in BaseData.data_files([pname]))
+            stamps[pname] = (fpath, st.st_mtime_ns, st.st_size, files)
+        return stamps
+
+    def refresh(self) -> typing.List[str]:
+        from .discovery import module_deps
+        from .models import BaseData, Inventory
+        stamps = self._scan()
+        changed = set(pname for pname in set(stamps) | set(self._stamps) if stamps.get(pname) != self._stamps.get(pname))
+        self._stamps = stamps
+        if not changed:
+            return []
+        loaded = [pname for pname in stamps if pname in sys.modules]
+        importers = {}
+        for pname in loaded:
+            fpath = stamps[pname][0]
+            try:
+                deps = module_deps(fpath.read_bytes(), pname, is_package=fpath.name == '__init__.py')
+            except SyntaxError:
+                # reported when the module is imported again, it's stale anyway since its file changed
+                continue
+            for dep in deps:
+                importers.setdefault(dep, set()).add(pname)
+        stale = set()
+        pending = list(changed)
+        while pending:
+            pname = pending.pop()
+            if pname in stale:
+                continue
+            stale.add(pname)
+            pending.extend(importers.get(pname, ()))
+        stale = [pname for pname in stale if pname in sys.modules or pname in changed]
+        BaseData.drop_modules(stale)
+        Inventory.drop_modules(stale)
+        for pname in stale:
+            module = sys.modules.pop(pname, None)
+            # an edit within the same second and with the same size would still match the old .pyc
+            cached = getattr(module, '__cached__', None)
+            if cached:
+                with contextlib.suppress(OSError):
+                    os.remove(cached)
+        importlib.invalidate_caches()
+        return sorted(stale)
+
+    def drop_unloaded(self):
+        # a module whose import failed half-way may have registered part of its definitions
+        from .models import BaseData, Inventory
+        unloaded = [pname for pname in self._stamps if pname not in sys.modules]
+        BaseData.drop_modules(unloaded)
+        Inventory.drop_modules(unloaded)
+
+
+class DaemonServer(socketserver.UnixStreamServer):
+    # one command at a time: commands share the registries and the client
+    def __init__(self, path: pathlib.Path, run_command: typing.Callable[[typing.List[str]], int],
+                 reloader: typing.Optional[ModuleReloader] = None, log=None):
+        self.path = path
+        self.run_command = run_command
+        self.reloader = reloader
+        self.log = log or sys.stderr
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.exists():
+            probe = _connect(path)
+            if probe is not None:
+                # closed at once, the running daemon serves one connection at a time
+                probe.close()
+                raise Exception(f"A daemon is already listening on {path}")
+            # left behind by a daemon that didn't shut down cleanly
+            path.unlink()
+        old_umask = os.umask(0o077)
+        try:
+            super().__init__(str(path), _DaemonHandler)
+        finally:
+            os.umask(old_umask)
+
+    def serve(self):
+        try:
+            self.serve_forever()
+        finally:
+            self.server_close()
+            with contextlib.suppress(FileNotFoundError):
+                self.path.unlink()
+
+    def stop(self):
+        # shutdown() waits for serve_forever() to return, so it can't run on the serving thread
+        threading.Thread(target=self.shutdown, daemon=True).start()
+
+
+class _DaemonHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        message = json.loads(line)
+        server = self.server
+        out = _LineWriter(self.wfile, 'stdout')
+        err = _LineWriter(self.wfile, 'stderr')
+        code = 0
+        if message.get('stop'):
+            out.write("Daemon stopped\n")
+            server.stop()
+        elif message.get('status'):
+            out.write(f"Daemon {os.getpid()} listening on {server.path}\n")
+        elif _command_name(message.get('argv', [])) in LOCAL_COMMANDS:
+            err.write(f"'{_command_name(message['argv'])}' doesn't run in the daemon, run it with {NO_DAEMON_ENV}=1\n")
+            code = 2
+        else:
+            cwd = os.getcwd()
+            try:
+                if server.reloader is not None:
+                    reloaded = server.reloader.refresh()
+                    if reloaded:
+                        server.log.write(f"reloading {', '.join(reloaded)}\n")
+                        server.log.flush()
+                os.chdir(message.get('cwd') or cwd)
+                with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+                    code = server.run_command(message['argv'])
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+            except Exception:
+                err.write(traceback.format_exc())
+                code = 1
+                if server.reloader is not None:
+                    server.reloader.drop_unloaded()
+            finally:
+                os.chdir(cwd)
+        try:
+            out.flush()
+            err.flush()
+            self.wfile.write(json.dumps({'exit': code}).encode('utf-8') + b'\n')
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # the forwarding he-admin.py is gone, nobody to report to
+            pass
@@ -1,129 +1,92 @@
-import json
+import concurrent.futures
 import importlib
 import inspect
-import inflection
+import os
 import pathlib
+import sys
 import typing
 
-from {{ cookiecutter.project_slug }}.sdk.models.types import is_new_type, Ulid
+from {{ cookiecutter.project_slug }}.sdk.columnar import append_rows, empty_table, extend_table
+from {{ cookiecutter.project_slug }}.sdk.refs import RefIndex
+from {{ cookiecutter.project_slug }}.sdk.discovery import DiscoveryCache, file_hash, module_deps, sdk_fingerprint
+from {{ cookiecutter.project_slug }}.sdk.static import StaticExtractor
+from {{ cookiecutter.project_slug }}.sdk.stream import StreamDict, StreamList, iter_json, write_json
+from {{ cookiecutter.project_slug }}.sdk.schema import Wrapped, compile_schema, get_cs_type, json_value
 from {{ cookiecutter.project_slug }}.sdk.models.base import _BaseModel
+from {{ cookiecutter.project_slug }}.sdk.models.compact import CompactRows, CompactStore
 from {{ cookiecutter.project_slug }}.sdk.models import *
 
 
-class Wrapped(object):
-    def __init__(self, cls):
-        self._cls = cls
-        self._entity_name = inflection.camelize(cls.__name__)
-        self._entity_name_plural = inflection.pluralize(self._entity_name)
-        self._entity_name_us = inflection.underscore(self._entity_name)
-        self._var_name = inflection.underscore(cls.__name__)
-        self._var_name_camel = inflection.camelize(self._var_name)
-        self._var_name_camel_plural = inflection.pluralize(self._var_name_camel)
-        self._var_name_plural = inflection.pluralize(self._var_name)
-        self._data = None
-
+def datadef_to_json(cls):
+    return compile_schema(cls).class_def()
 
-    @property
-    def uid(self):
-        return self._cls._uid
 
-    @property
-    def storage_flags(self):
-        return self._cls._storage_flags
+def datainst_to_json(cls, data_inst):
+    return compile_schema(cls).instance_to_json(data_inst)
 
-    @property
-    def data(self):
-        return self._data
 
-    @property
-    def entity_name(self):
-        return self._entity_name
+def package_files(package_name: str) -> typing.Dict[str, pathlib.Path]:
+    # module name -> file, for every module in the package, sorted by path
+    package = importlib.import_module(package_name)
+    package_path = pathlib.Path(package.__path__[0])
+    files = {}
+    for fpath in sorted(package_path.rglob("*.py")):
+        rel_path = str(fpath.relative_to(package_path))
+        rel_path = rel_path[:-len(".py")]
+        parts = rel_path.split('/')
+        if parts[-1] == '__init__':
+            parts = parts[:-1]
+        files['.'.join([package_name] + parts)] = fpath
+    return files
 
-    @property
-    def entity_name_plural(self):
-        return self._entity_name_plural
 
-    @property
-    def entity_name_us(self):
-        return self._entity_name_us
+def _data_file_hashes(paths: typing.Iterable[str]) -> typing.Dict[str, typing.Optional[str]]:
+    hashes = {}
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                hashes[path] = file_hash(f.read())
+        except OSError:
+            hashes[path] = None
+    return hashes
 
-    @property
-    def var_name(self):
-        return self._var_name
 
-    @property
-    def var_name_camel(self):
-        return self._var_name_camel
+# starting a process pool costs about as much as importing a few dozen small model modules,
+# so with workers=0 it's only used past this many modules to import
+_PARALLEL_MIN_MODULES = 64
 
-    @property
-    def var_name_camel_plural(self):
-        return self._var_name_camel_plural
 
-    @property
-    def var_name_plural(self):
-        return self._var_name_plural
+def _import_descriptors(module_names: typing.List[str]) -> typing.Dict[str, dict]:
+    loader = DataLoader(None)
+    for pname in module_names:
+        loader.iterate_dataclasses_in_package(pname)
+    return loader.module_descriptors(module_names)
 
 
-def datadef_to_json(cls):
-    flds = []
-    for fname, fdef in cls.__fields__.items():
-        if fname == 'id':
-            continue
-        flds.append({'Name': fname, 'Typename': get_cs_type(fdef.outer_type_)})
-    return dict(
-        Name=cls.__name__,
-        Fields=flds
-    )
+class _ProvidedInstances(object):
+    # re-iterable view over the lazy instance providers of a class
+    def __init__(self, cls):
+        self._cls = cls
 
-def datainst_to_json(cls, data_inst):
-    flds = []
-    for fname, fdef in cls.__fields__.items():
-        if fname == 'id':
-            continue
-        flds.append({'Name': fname, 'Value': getattr(data_inst, fname)})
-    #
-    return dict(
-        Name=data_inst.id,
-        Fields=flds
-    )
-
-
-def get_cs_type(fdef: type, dto=False):
-    #
-    t_origin = typing.get_origin(fdef)
-    #
-    if is_new_type(fdef):
-        return fdef.__name__.lower()
-    elif fdef == int:
-        return "int"
-    elif fdef == str:
-        return "string"
-    elif fdef == Ulid:
-        return "Ulid"
-    elif t_origin:
-        t_args = typing.get_args(fdef)
-        if t_origin is typing.Optional:
-            return get_cs_type(t_args[0])
-        elif t_origin is list:
-            return f"List<{get_cs_type(t_args[0], dto=dto)}>"
-        elif t_origin is dict:
-            return f"Dict<{get_cs_type(t_args[0], dto=dto)}, {get_cs_type(t_args[1], dto=dto)}>"
-        elif t_origin == DataRef:
-            return f"{get_cs_type(t_args[0], dto=dto)}"
-        else:
-            assert False, f"{t_origin} not supported"
-    else:
-        if issubclass(fdef, _BaseModel) and dto:
-            wrp_cls = Wrapped(fdef)
-            return f'{wrp_cls.var_name_camel}DTO'
-        return fdef.__name__
+    def __iter__(self):
+        return BaseData.provided_instances(self._cls)
 
 
 class DataLoader(object):
-    def __init__(self, package_name):
+    def __init__(self, package_name, cache_path=None, static=False, workers=1):
         self._data_classes = []
         self._model_classes = []
-        self.iterate_dataclasses(package_name)
+        self._modules = []
+        self._module_rank = {}
+        self._descriptors = {}
+        self._cache = DiscoveryCache(cache_path, sdk_fingerprint()) if cache_path else None
+        self._use_static = static
+        self._static = None
+        # 0 picks one per CPU for large packages and imports in-process otherwise
+        self._workers = workers
+        self._refs_checked = False
+        if package_name is not None:
+            self.iterate_dataclasses(package_name)
 
     def iterate_dataclasses_in_package(self, package_name):
         package = importlib.import_module(package_name)
@@ -136,7 +99,6 @@ class DataLoader(object):
                 if obj is _BaseModel:
                     continue
                 if issubclass(obj, DataModel):
-                    print(obj)
                     self._model_classes.append(obj)
                 elif issubclass(obj, BaseData):
                     self._data_classes.append(obj)
@@ -144,51 +106,345 @@ class DataLoader(object):
                 pass
 
     def iterate_dataclasses(self, package_name: str):
-        package = importlib.import_module(package_name)
-        package_path = pathlib.Path(package.__path__[0])
-        for fpath in package_path.rglob("*.py"):
-            print(fpath)
-            rel_path = str(fpath.relative_to(package_path))
-            rel_path = rel_path[:-len(".py")]
-            pname = package_name + '.' + '.'.join(rel_path.split('/'))
-            #
+        files = package_files(package_name)
+        for pname in files:
+            self._module_rank[pname] = len(self._modules)
+            self._modules.append(pname)
+        #
+        self._static = StaticExtractor(package_name, files) if self._use_static else None
+        dirty = set(self._modules)
+        entries = {}
+        if self._cache is not None:
+            dirty = set()
+            for pname, fpath in files.items():
+                content = fpath.read_bytes()
+                digest = file_hash(content)
+                entry = self._cache.get(pname)
+                if entry is None or entry['hash'] != digest or _data_file_hashes(entry.get('files', {})) != entry.get('files', {}):
+                    dirty.add(pname)
+                    deps = module_deps(content, pname, is_package=fpath.name == '__init__.py')
+                    entry = dict(hash=digest, deps=[dep for dep in deps if dep in files and dep != pname])
+                entries[pname] = entry
+            # a cached module is stale if anything it imports from the package changed
+            changed = True
+            while changed:
+                changed = False
+                for pname, entry in entries.items():
+                    if pname not in dirty and any(dep in dirty or dep not in files for dep in entry['deps']):
+                        dirty.add(pname)
+                        changed = True
+        #
+        descriptor_modules = set()
+        to_import = []
+        for pname in self._modules:
+            if pname not in dirty:
+                self._descriptors[pname] = entries[pname]
+                continue
+            descriptor = self._static.extract(pname) if self._static is not None else None
+            if descriptor is None:
+                to_import.append(pname)
+            else:
+                self._descriptors[pname] = descriptor
+                descriptor_modules.add(pname)
+        # modules the parent already has (the package itself) are inspected in place
+        to_fork = [pname for pname in to_import if pname not in sys.modules]
+        workers = self._workers
+        if not workers:
+            workers = (os.cpu_count() or 1) if len(to_fork) >= _PARALLEL_MIN_MODULES else 1
+        if workers > 1 and len(to_fork) > 1:
+            self._descriptors.update(self._import_parallel(to_fork, workers))
+            descriptor_modules.update(to_fork)
+            to_import = [pname for pname in to_import if pname not in descriptor_modules]
+        for pname in to_import:
             self.iterate_dataclasses_in_package(pname)
+        # cached or statically extracted modules may have been imported by a live one, then the registries have them;
+        # lazy instance providers can't leave the process that registered them
+        live_modules = [pname for pname in self._modules if pname not in self._descriptors]
+        for pname in self._modules:
+            if pname in self._descriptors and (pname in sys.modules or self._descriptors[pname].get('lazy')):
+                del self._descriptors[pname]
+                self.iterate_dataclasses_in_package(pname)
+                live_modules.append(pname)
+        #
+        if self._cache is not None:
+            for pname, descriptor in self.module_descriptors(live_modules).items():
+                if descriptor['lazy']:
+                    continue
+                self._cache.put(pname, dict(hash=entries[pname]['hash'], deps=entries[pname]['deps'], **descriptor))
+            for pname in descriptor_modules:
+                if pname in self._descriptors:
+                    self._cache.put(pname, dict(hash=entries[pname]['hash'], deps=entries[pname]['deps'], **self._descriptors[pname]))
+            self._cache.save(self._modules)
+        self._check_duplicates()
+
+    def _import_parallel(self, module_names: typing.List[str], workers: int) -> typing.Dict[str, dict]:
+        workers = min(workers, len(module_names))
+        # every worker imports its slice in a fresh registry and sends back only what its own modules defined
+        slices = [module_names[i::workers] for i in range(workers)]
+        descriptors = {}
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            for result in executor.map(_import_descriptors, slices):
+                descriptors.update(result)
+        return {pname: descriptors[pname] for pname in module_names}
+
+    def _check_duplicates(self):
+        if not self._descriptors:
+            return
+        # walk modules in discovery order, so the later definition is the one reported, as with a plain import
+        ranked = sorted(self._descriptors.items(), key=lambda kv: self._rank(kv[0]))
+        instance_ids = {cls.__name__: set(data_inst.id for data_inst in BaseData.instances(cls)) for cls in BaseData.dataclasses()}
+        inventory_items = {inv.name: set(item['Id'] for item, _ in inv.items_with_modules()) for inv in Inventory.all()}
+        for _, descriptor in ranked:
+            for cls_name, rows in descriptor['instances'].items():
+                ids = instance_ids.setdefault(cls_name, set())
+                for row in rows:
+                    if row['Name'] in ids:
+                        raise Exception(f"Instance of '{cls_name}' with id='{row['Name']}' is already defined")
+                    ids.add(row['Name'])
+            for inv_name in descriptor['new_inventories']:
+                if inv_name in inventory_items:
+                    raise Exception(f"Inventory with name '{inv_name}' already defined")
+                inventory_items[inv_name] = set()
+        for _, descriptor in ranked:
+            for inv_name, items in descriptor['inventories'].items():
+                ids = inventory_items.setdefault(inv_name, set())
+                for item in items:
+                    if item['Id'] in ids:
+                        raise Exception(f"Inventory already have item with id='{item['Id']}'")
+                    ids.add(item['Id'])
+
+    def module_descriptors(self, module_names: typing.Iterable[str]) -> typing.Dict[str, dict]:
+        descriptors = {pname: dict(classes=[], instances={}, linenos={}, inventories={}, new_inventories=[], lazy=False,
+                                   files=_data_file_hashes(BaseData.data_files([pname])))
+                       for pname in module_names}
+        for cls in self._data_classes + self._model_classes:
+            if cls.__module__ in descriptors:
+                kind = 'model' if issubclass(cls, DataModel) else 'data'
+                schema = compile_schema(cls)
+                descriptors[cls.__module__]['classes'].append({'kind': kind, 'def': schema.class_def(), 'refs': schema.ref_fields})
+        for cls in BaseData.dataclasses():
+            for module, insts in self._registered_by_module(cls).items():
+                if module in descriptors:
+                    descriptors[module]['instances'].setdefault(cls.__name__, []).extend(compile_schema(cls).instances_to_json(insts))
+                    if isinstance(insts, CompactRows):
+                        linenos = insts.linenos()
+                    else:
+                        linenos = [BaseData.source(cls, data_inst.id)[1] for data_inst in insts]
+                    descriptors[module]['linenos'].setdefault(cls.__name__, []).extend(linenos)
+        for cls in BaseData.provided_dataclasses():
+            for provider in BaseData.providers(cls):
+                if provider.module in descriptors:
+                    descriptors[provider.module]['lazy'] = True
+        for inv in Inventory.all():
+            if inv.module in descriptors:
+                descriptors[inv.module]['new_inventories'].append(inv.name)
+            for item, module in inv.items_with_modules():
+                if module in descriptors:
+                    descriptors[module]['inventories'].setdefault(inv.name, []).append(item)
+        return descriptors
+
+    def ref_index(self) -> RefIndex:
+        index = RefIndex()
+        ref_fields = {}
+        for descriptor in self._descriptors.values():
+            for j in descriptor['classes']:
+                ref_fields[j['def']['Name']] = j.get('refs', {})
+        #
+        for cls in BaseData.dataclasses():
+            store = BaseData.store(cls)
+            index.add_ids(cls.__name__, store)
+            fields = ref_fields[cls.__name__] = compile_schema(cls).ref_fields
+            if isinstance(store, CompactStore):
+                rows = store.values()
+                for fname, shape in fields.items():
+                    for id_, value in zip(rows.ids(), rows.column(fname)):
+                        index.add_refs(cls.__name__, id_, fname, shape, value, cls)
+            else:
+                for data_inst in store.values():
+                    values = data_inst.__dict__
+                    for fname, shape in fields.items():
+                        index.add_refs(cls.__name__, data_inst.id, fname, shape, values[fname], cls)
+        #
+        for module, descriptor in self._descriptors.items():
+            for cls_name, rows in descriptor['instances'].items():
+                index.add_ids(cls_name, set(row['Name'] for row in rows))
+                fields = ref_fields.get(cls_name, {})
+                if not fields:
+                    continue
+                linenos = descriptor.get('linenos', {}).get(cls_name) or [None] * len(rows)
+                for row, lineno in zip(rows, linenos):
+                    for f in row['Fields']:
+                        if f['Name'] in fields:
+                            index.add_refs(cls_name, row['Name'], f['Name'], fields[f['Name']], f['Value'], ('module', module, lineno))
+        #
+        for cls in BaseData.provided_dataclasses():
+            fields = compile_schema(cls).ref_fields
+            ids = set()
+            for provider, row_no, data_inst in BaseData.provided_rows(cls):
+                ids.add(data_inst.id)
+                values = data_inst.__dict__
+                for fname, shape in fields.items():
+                    index.add_refs(cls.__name__, data_inst.id, fname, shape, values[fname], ('row', provider.describe(), row_no))
+            index.add_ids(cls.__name__, ids)
+        return index
 
-    def to_json(self):
-        data = self.to_dict()
-        return json.dumps(data, indent=4)
+    def check_refs(self):
+        # once per collection, export and release in one pipeline share the loader
+        if self._refs_checked:
+            return
+        index = self.ref_index()
+        dangling = index.dangling()
+        if dangling:
+            lines = '\n'.join(index.describe(ref) for ref in dangling)
+            raise Exception(f"{len(dangling)} dangling data reference(s):\n{lines}")
+        self._refs_checked = True
 
-    def to_dict(self):
+    def _rank(self, module: typing.Optional[str]) -> int:
+        return self._module_rank.get(module, len(self._modules))
+
+    @staticmethod
+    def _registered_by_module(cls):
+        store = BaseData.store(cls)
+        if isinstance(store, CompactStore):
+            return {module: CompactRows(store, indices) for module, indices in store.indices_by_module().items()}
+        by_module = {}
+        for data_inst in store.values():
+            module, _ = BaseData.source(cls, data_inst.id)
+            by_module.setdefault(module, []).append(data_inst)
+        return by_module
+
+    def _instance_groups(self, class_names: typing.Optional[typing.Collection[str]] = None):
+        # instances are grouped by the module that defined them, and ordered by module
+        groups = {}
+        for cls in BaseData.dataclasses():
+            if class_names is not None and cls.__name__ not in class_names:
+                continue
+            for module, insts in self._registered_by_module(cls).items():
+                groups.setdefault(cls.__name__, []).append((self._rank(module), cls, insts))
+        for module, descriptor in self._descriptors.items():
+            for cls_name, rows in descriptor['instances'].items():
+                if class_names is not None and cls_name not in class_names:
+                    continue
+                groups.setdefault(cls_name, []).append((self._rank(module), None, rows))
+        for cls in BaseData.provided_dataclasses():
+            if class_names is not None and cls.__name__ not in class_names:
+                continue
+            rank = min(self._rank(provider.module) for provider in BaseData.providers(cls))
+            groups.setdefault(cls.__name__, []).append((rank, cls, _ProvidedInstances(cls)))
+        for cls_groups in groups.values():
+            cls_groups.sort(key=lambda g: g[0])
+        return dict(sorted(groups.items(), key=lambda kv: kv[1][0][0]))
+
+    def data_files(self) -> typing.List[str]:
+        # instance files read by the collected modules, imported or cached
+        files = set(BaseData.data_files(self._modules))
+        for descriptor in self._descriptors.values():
+            files.update(descriptor.get('files', ()))
+        return sorted(files)
+
+    def dataclass_names(self) -> typing.List[str]:
+        return list(self._instance_groups().keys())
+
+    def iter_instance_fields(self, cls_name: str):
+        for _, cls, items in self._instance_groups([cls_name]).get(cls_name, []):
+            if cls is None:
+                for row in items:
+                    yield row['Name'], [(f['Name'], f['Value']) for f in row['Fields']]
+            else:
+                fnames = [fname for fname in cls.__fields__.keys() if fname != 'id']
+                for data_inst in items:
+                    yield data_inst.id, [(fname, getattr(data_inst, fname)) for fname in fnames]
+
+    def to_json(self, columnar=False):
+        return ''.join(iter_json(StreamDict(self.to_stream(columnar=columnar).items()), indent=4))
+
+    def write_json(self, fp, columnar=False):
+        write_json(StreamDict(self.to_stream(columnar=columnar).items()), fp, indent=4)
+
+    def class_defs(self):
         data_classes = []
         model_classes = []
         struct_classes = []
-        data_class_instances = {}
         #
+        ranked = []
         for cls in self._data_classes:
-            j = datadef_to_json(cls)
-            if issubclass(cls, BaseData):
+            ranked.append((self._rank(cls.__module__), 'data' if issubclass(cls, BaseData) else 'struct', datadef_to_json(cls)))
+        for cls in self._model_classes:
+            ranked.append((self._rank(cls.__module__), 'model', datadef_to_json(cls)))
+        for module, descriptor in self._descriptors.items():
+            for j in descriptor['classes']:
+                ranked.append((self._rank(module), j['kind'], j['def']))
+        ranked.sort(key=lambda r: r[0])
+        #
+        for _, kind, j in ranked:
+            if kind == 'data':
                 data_classes.append(j)
+            elif kind == 'model':
+                model_classes.append(j)
             else:
                 struct_classes.append(j)
         #
-        for cls in self._model_classes:
-            j = datadef_to_json(cls)
-            model_classes.append(j)
-        #
-        for cls in BaseData.dataclasses():
-            for data_inst in BaseData.instances(cls):
-                j = datainst_to_json(cls, data_inst)
-                if cls.__name__ not in data_class_instances:
-                    data_class_instances[cls.__name__] = []
-                data_class_instances[cls.__name__].append(j)
+        return data_classes, model_classes, struct_classes
+
+    def instances_to_dict(self, class_names: typing.Optional[typing.Collection[str]] = None):
+        data_class_instances = {}
+        for cls_name, cls_groups in self._instance_groups(class_names).items():
+            j_insts = data_class_instances[cls_name] = []
+            for _, cls, items in cls_groups:
+                if cls is None:
+                    j_insts.extend(items)
+                else:
+                    j_insts.extend(compile_schema(cls).instances_to_json(items))
+        return data_class_instances
+
+    def iter_instances(self, cls_name: str):
+        for _, cls, items in self._instance_groups([cls_name]).get(cls_name, []):
+            if cls is None:
+                yield from items
+            else:
+                yield from compile_schema(cls).iter_instances_json(items)
+
+    def instances_to_columns(self, class_names: typing.Optional[typing.Collection[str]] = None):
+        tables = {}
+        for cls_name, cls_groups in self._instance_groups(class_names).items():
+            table = None
+            for _, cls, items in cls_groups:
+                if cls is None:
+                    if table is None:
+                        table = empty_table([f['Name'] for f in items[0]['Fields']] if items else [])
+                    append_rows(table, items)
+                elif table is None:
+                    table = compile_schema(cls).instances_to_table(items)
+                else:
+                    extend_table(table, compile_schema(cls).instances_to_table(items))
+            tables[cls_name] = table
+        return tables
+
+    def inventories_to_list(self):
+        inventories = {}
+        created = []
+        for inv in Inventory.all():
+            created.append((self._rank(inv.module), inv.name))
+            inventories[inv.name] = [(self._rank(module), item) for item, module in inv.items_with_modules()]
+        for module, descriptor in self._descriptors.items():
+            for inv_name in descriptor['new_inventories']:
+                created.append((self._rank(module), inv_name))
+            for inv_name, items in descriptor['inventories'].items():
+                inventories.setdefault(inv_name, []).extend((self._rank(module), item) for item in items)
+        created.sort(key=lambda c: c[0])
+        return [dict(Name=inv_name, Items=[item for _, item in sorted(inventories.get(inv_name, []), key=lambda i: i[0])])
+                for _, inv_name in created]
+
+    def to_dict(self, columnar=False, instances=True):
+        data_classes, model_classes, struct_classes = self.class_defs()
         #
-        return dict(
+        data = dict(
             DataClasses=data_classes,
             ModelClasses=model_classes,
             StructClasses=struct_classes,
             StorageClasses=[],
-            DataClassInstances=data_class_instances,
-            Inventories=[inv.to_dict() for inv in Inventory.all()],
+            DataClassInstances=self.instances_to_dict() if instances and not columnar else {},
+            Inventories=self.inventories_to_list(),
             Quests=[],
             Tournaments=[],
             BattlePasses=[],
@@ -199,3 +455,19 @@ class DataLoader(object):
             EnergySystems=[],
             RequestHandlers=[]
         )
+        if columnar and instances:
+            data['DataClassInstanceColumns'] = self.instances_to_columns()
+        return data
+
+    def to_stream(self, columnar=False):
+        # same layout as to_dict, with instance tables only serialized while being written
+        data = self.to_dict(instances=False)
+        cls_names = self.dataclass_names()
+        if columnar:
+            data['DataClassInstances'] = {}
+            data['DataClassInstanceColumns'] = StreamDict((cls_name, self.instances_to_columns([cls_name])[cls_name])
+                                                          for cls_name in cls_names)
+        else:
+            data['DataClassInstances'] = StreamDict((cls_name, StreamList(self.iter_instances(cls_name)))
+                                                    for cls_name in cls_names)
+        return data
@@ -0,0 +1,78 @@
+import hashlib
+import json
+import typing
+
+from {{ cookiecutter.project_slug }}.sdk.columnar import expand_app_def
+from {{ cookiecutter.project_slug }}.sdk.models import DataRef
+
+
+_CLASS_SECTIONS = ('DataClasses', 'ModelClasses', 'StructClasses')
+
+
+def _dto_value(v) -> str:
+    if isinstance(v, DataRef):
+        return v.ref_str()
+    return str(v)
+
+
+def _update_instance(hasher, name: str, fields: typing.Iterable[typing.Tuple[str, str]]):
+    hasher.update(json.dumps([name, list(fields)], separators=(',', ':')).encode('utf-8'))
+
+
+def class_hash(class_def: dict) -> str:
+    flds = [[f['Name'], f['Typename']] for f in class_def.get('Fields', [])]
+    return hashlib.sha256(json.dumps([class_def['Name'], flds], separators=(',', ':')).encode('utf-8')).hexdigest()
+
+
+def instances_hash(instances: typing.Iterable[dict]) -> str:
+    hasher = hashlib.sha256()
+    for inst in instances:
+        _update_instance(hasher, inst['Name'], [(f['Name'], _dto_value(f['Value'])) for f in inst.get('Fields', [])])
+    return hasher.hexdigest()
+
+
+def loader_instances_hash(loader, cls_name: str) -> str:
+    hasher = hashlib.sha256()
+    for name, fields in loader.iter_instance_fields(cls_name):
+        _update_instance(hasher, name, [(fname, _dto_value(value)) for fname, value in fields])
+    return hasher.hexdigest()
+
+
+def _inventories_key(inventories: typing.List[dict]):
+    return [(inv['Name'], [(item['Id'], item['Typename']) for item in inv['Items']]) for inv in inventories]
+
+
+def section_hashes(app_def: dict) -> dict:
+    app_def = expand_app_def(app_def)
+    hashes = {section: {j['Name']: class_hash(j) for j in app_def.get(section) or []} for section in _CLASS_SECTIONS}
+    hashes['DataClassInstances'] = {name: instances_hash(insts)
+                                    for name, insts in (app_def.get('DataClassInstances') or {}).items()}
+    return hashes
+
+
+def build_delta(loader, snapshot: dict) -> typing.Optional[dict]:
+    base = section_hashes(snapshot)
+    delta = {}
+    has_changes = False
+    #
+    for section, class_defs in zip(_CLASS_SECTIONS, loader.class_defs()):
+        base_hashes = base[section]
+        delta[section] = [j for j in class_defs if base_hashes.get(j['Name']) != class_hash(j)]
+        delta[f'Removed{section}'] = sorted(set(base_hashes) - set(j['Name'] for j in class_defs))
+        has_changes = has_changes or bool(delta[section] or delta[f'Removed{section}'])
+    #
+    base_hashes = base['DataClassInstances']
+    changed = set()
+    current = set()
+    for cls_name in loader.dataclass_names():
+        current.add(cls_name)
+        if base_hashes.get(cls_name) != loader_instances_hash(loader, cls_name):
+            changed.add(cls_name)
+    delta['DataClassInstances'] = loader.instances_to_dict(changed)
+    delta['RemovedDataClassInstances'] = sorted(set(base_hashes) - current)
+    has_changes = has_changes or bool(changed or delta['RemovedDataClassInstances'])
+    #
+    inventories = loader.inventories_to_list()
+    delta['Inventories'] = inventories
+    has_changes = has_changes or _inventories_key(inventories) != _inventories_key(snapshot.get('Inventories') or [])
+    return delta if has_changes else None
@@ -0,0 +1,70 @@
+import ast
+import hashlib
+import json
+import os
+import pathlib
+import typing
+
+
+_SDK_PATH = pathlib.Path(__file__).parent
+
+
+def file_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def sdk_fingerprint() -> str:
+    hasher = hashlib.sha256()
+    for fpath in sorted(_SDK_PATH.rglob('*.py')):
+        hasher.update(str(fpath.relative_to(_SDK_PATH)).encode('utf-8'))
+        hasher.update(fpath.read_bytes())
+    return hasher.hexdigest()
+
+
+def module_deps(content: bytes, module_name: str, is_package: bool = False) -> typing.List[str]:
+    deps = set()
+    for node in ast.walk(ast.parse(content)):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                deps.add(alias.name)
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                parts = module_name.split('.')
+                base = parts[:len(parts) - node.level + (1 if is_package else 0)]
+                mod = '.'.join(base + ([node.module] if node.module else []))
+            else:
+                mod = node.module
+            deps.add(mod)
+            # 'from package import module' imports a submodule
+            for alias in node.names:
+                deps.add(f'{mod}.{alias.name}')
+    return sorted(deps)
+
+
+class DiscoveryCache(object):
+    def __init__(self, path, fingerprint: str):
+        self._path = pathlib.Path(path)
+        self._fingerprint = fingerprint
+        self._modules = {}
+        try:
+            with open(self._path, 'r') as f:
+                j_data = json.load(f)
+            if j_data.get('fingerprint') == fingerprint:
+                self._modules = j_data.get('modules', {})
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+    def get(self, module_name: str) -> typing.Optional[dict]:
+        return self._modules.get(module_name)
+
+    def put(self, module_name: str, entry: dict):
+        self._modules[module_name] = entry
+
+    def save(self, module_names: typing.Iterable[str]):
+        module_names = set(module_names)
+        self._modules = {k: v for k, v in self._modules.items() if k in module_names}
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(dict(fingerprint=self._fingerprint, modules=self._modules), f)
+        os.replace(tmp_path, self._path)
@@ -0,0 +1,119 @@
+import concurrent.futures
+import hashlib
+import os
+import requests
+import typing
+
+from .transport import HttpTransport
+
+
+_CHUNK_SIZE = 1 << 20
+
+# (bytes completed, total size if known); completed goes back to 0 when the download has to start over
+ProgressCallback = typing.Callable[[int, typing.Optional[int]], None]
+
+
+def _hash_file(hasher, filepath: str, chunk_size: int = _CHUNK_SIZE):
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            hasher.update(chunk)
+
+
+def _range_size(resp: requests.Response) -> typing.Optional[int]:
+    # a 416 answer carries the full size as 'bytes */<size>'
+    _, _, size = resp.headers.get('Content-Range', '').rpartition('/')
+    return int(size) if size.isdigit() else None
+
+
+def download_to_file(transport: HttpTransport,
+                     url: str,
+                     filepath: str,
+                     sha256: typing.Optional[str] = None,
+                     resume: bool = True,
+                     retries: int = 3,
+                     chunk_size: int = _CHUNK_SIZE,
+                     on_progress: typing.Optional[ProgressCallback] = None) -> str:
+    part_path = f'{filepath}.part'
+    if not resume and os.path.exists(part_path):
+        os.remove(part_path)
+    attempt = 0
+    while True:
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {'Range': f'bytes={offset}-'} if offset else None
+        try:
+            with transport.get(url, headers=headers, stream=True) as resp:
+                hasher = hashlib.sha256()
+                if offset and resp.status_code == 416:
+                    if _range_size(resp) != offset:
+                        # the partial file is not a prefix of this file, start over
+                        os.remove(part_path)
+                        continue
+                    # the previous attempt already got the whole file
+                    _hash_file(hasher, part_path)
+                    if on_progress:
+                        on_progress(offset, offset)
+                    break
+                resp.raise_for_status()
+                if offset and resp.status_code == 206:
+                    _hash_file(hasher, part_path)
+                    mode = 'ab'
+                else:
+                    offset = 0
+                    mode = 'wb'
+                content_length = resp.headers.get('Content-Length')
+                total = offset + int(content_length) if content_length else None
+                if on_progress:
+                    on_progress(offset, total)
+                completed = offset
+                with open(part_path, mode) as f:
+                    for chunk in resp.iter_content(chunk_size):
+                        f.write(chunk)
+                        hasher.update(chunk)
+                        completed += len(chunk)
+                        if on_progress:
+                            on_progress(completed, total)
+            break
+        except (requests.exceptions.ChunkedEncodingError, requests.exceptions.ConnectionError):
+            if attempt == retries:
+                raise
+            attempt += 1
+    digest = hasher.hexdigest()
+    if sha256 and digest != sha256.lower():
+        os.remove(part_path)
+        raise ValueError(f"Checksum mismatch for {filepath}: expected {sha256}, got {digest}")
+    os.replace(part_path, filepath)
+    return digest
+
+
+def download_many(download_fn: typing.Callable[..., str],
+                  files: typing.Dict[str, str],
+                  sha256: typing.Optional[typing.Dict[str, str]] = None,
+                  max_workers: int = 4,
+                  show_progress: bool = True) -> typing.Dict[str, str]:
+    sha256 = sha256 or {}
+    progress = None
+    if show_progress:
+        from rich.progress import Progress, DownloadColumn, TransferSpeedColumn, BarColumn, TextColumn
+        progress = Progress(TextColumn('{task.description}'), BarColumn(), DownloadColumn(), TransferSpeedColumn())
+
+    def _download(file_uid, filepath):
+        on_progress = None
+        if progress is not None:
+            task_id = progress.add_task(os.path.basename(filepath), total=None)
+
+            def on_progress(completed, total):
+                progress.update(task_id, completed=completed, total=total)
+        return download_fn(file_uid, filepath, sha256=sha256.get(file_uid), progress=on_progress)
+
+    results = {}
+    if progress is not None:
+        progress.start()
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(_download, file_uid, filepath): file_uid for file_uid, filepath in files.items()}
+            for fut in concurrent.futures.as_completed(futures):
+                results[futures[fut]] = fut.result()
+    finally:
+        if progress is not None:
+            progress.stop()
+    return results
@@ -0,0 +1,98 @@
+import copy
+import inspect
+import pydantic
+import pydantic.validators
+import typing
+
+
+# Trusted DTO encoding: for data that is already valid (DataLoader output), fill in defaults and
+# coerce values the way pydantic would, without running validators or creating model instances.
+
+
+def _coercion(tp, validator):
+    # pydantic's own coercion, so values it would reject (a list for a str, ...) are rejected here too
+    def coerce(v):
+        if type(v) is tp:
+            return v
+        try:
+            return validator(v)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"{e}, got {type(v).__name__} {v!r}") from e
+    return coerce
+
+
+_str_value = _coercion(str, pydantic.validators.str_validator)
+_SCALAR_ENCODERS = {
+    int: _coercion(int, pydantic.validators.int_validator),
+    float: _coercion(float, pydantic.validators.float_validator),
+    bool: _coercion(bool, pydantic.validators.bool_validator),
+}
+
+
+def _optional(encoder):
+    return lambda v: None if v is None else encoder(v)
+
+
+def _value_encoder(tp) -> typing.Optional[typing.Callable]:
+    # None means the value is already in its encoded form
+    t_origin = typing.get_origin(tp)
+    t_args = typing.get_args(tp)
+    if t_origin is typing.Union:
+        args = [arg for arg in t_args if arg is not type(None)]
+        encoder = _value_encoder(args[0]) if len(args) == 1 else None
+        return _optional(encoder) if encoder is not None else None
+    elif t_origin is list:
+        encoder = _value_encoder(t_args[0])
+        return list if encoder is None else lambda v: [encoder(x) for x in v]
+    elif t_origin is dict:
+        encoder = _value_encoder(t_args[1])
+        return dict if encoder is None else lambda v: {k: encoder(x) for k, x in v.items()}
+    elif t_origin is tuple:
+        encoders = [_value_encoder(arg) or (lambda x: x) for arg in t_args]
+        return lambda v: tuple(encoder(x) for encoder, x in zip(encoders, v))
+    elif inspect.isclass(tp) and issubclass(tp, pydantic.BaseModel):
+        return dto_encoder(tp)
+    elif tp is str:
+        return _str_value
+    return _SCALAR_ENCODERS.get(tp)
+
+
+_dto_encoders = {}
+
+
+def dto_encoder(model) -> typing.Callable[[typing.Any], dict]:
+    encoder = _dto_encoders.get(model)
+    if encoder is not None:
+        return encoder
+    fields = []
+
+    def encode(data) -> dict:
+        if isinstance(data, pydantic.BaseModel):
+            return data.dict()
+        j = {}
+        for fname, field, value_encoder in fields:
+            if fname in data:
+                v = data[fname]
+                j[fname] = v if value_encoder is None or (v is None and field.allow_none) else value_encoder(v)
+            else:
+                j[fname] = copy.deepcopy(field.default) if field.default_factory is None else field.default_factory()
+        return j
+    # registered before the fields are resolved, so self-referencing models terminate
+    _dto_encoders[model] = encode
+    hints = typing.get_type_hints(model)
+    for fname, field in model.__fields__.items():
+        fields.append((fname, field, _value_encoder(hints.get(fname, field.outer_type_))))
+    return encode
+
+
+def field_encoder(model, fname: str) -> typing.Callable:
+    field = model.__fields__[fname]
+    encoder = _value_encoder(typing.get_type_hints(model).get(fname, field.outer_type_))
+    if encoder is None:
+        return lambda v: v
+    return _optional(encoder)
+
+
+def construct_trusted(model, data: dict):
+    # nested DTOs stay plain dicts, which serialize to the same JSON
+    return model.construct(**dto_encoder(model)(data))
@@ -1,3 +1,4 @@
-from .data import DataRef, BaseData
+from .data import DataRef, BaseData, InstanceProvider
+from .query import Query
 from .models import DataModel, Upgradeable
 from .inventory import Inventory
@@ -11,7 +11,8 @@ class _BaseModelMeta(type(BaseModel)):
         '_upgrade_material',
         '_upgrade_target',
         '_is_ladder',
-        '_struct'
+        '_struct',
+        '_compact'
     )
 
     def __new__(mcs, cls_name, bases, namespace):
@@ -0,0 +1,165 @@
+import csv
+import json
+import os
+import typing
+
+from pydantic.validators import str_validator
+
+from .types import INT_RANGES, Ulid, is_new_type
+from .data import BaseData, DataRef, resolve_data_path
+from .compact import CompactStore
+
+
+def _read_table(path: str) -> typing.Tuple[typing.List[str], typing.List[int], typing.List[list]]:
+    # returns (header, row numbers, rows); rows are aligned to the header
+    if path.lower().endswith('.csv'):
+        with open(path, 'r', newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            row_nos = []
+            rows = []
+            for row_no, row in enumerate(reader, start=2):
+                if not row:
+                    continue
+                if len(row) != len(header):
+                    raise Exception(f"{path}, row {row_no}: expected {len(header)} values, got {len(row)}")
+                row_nos.append(row_no)
+                rows.append(row)
+        return header, row_nos, rows
+    with open(path, 'r') as f:
+        return _dict_table(path, ((row_no, json.loads(line)) for row_no, line in enumerate(f, start=1) if line.strip()))
+
+
+def _dict_table(source: str, numbered_rows) -> typing.Tuple[typing.List[str], typing.List[int], typing.List[list]]:
+    header = None
+    row_nos = []
+    rows = []
+    for row_no, row in numbered_rows:
+        if header is None:
+            header = list(row.keys())
+        elif len(row) != len(header) or any(k not in row for k in header):
+            raise Exception(f"{source}, row {row_no}: fields {sorted(row)} don't match {sorted(header)}")
+        row_nos.append(row_no)
+        rows.append([row[k] for k in header])
+    return header or [], row_nos, rows
+
+
+def _int_range(tp) -> typing.Optional[typing.Tuple[int, int]]:
+    return INT_RANGES.get(tp) if is_new_type(tp) else None
+
+
+def _is_int_type(tp) -> bool:
+    return tp is int or (is_new_type(tp) and tp.__supertype__ is int)
+
+
+def _coerce_int_column(source: str, fname: str, tp, values: list, row_nos: typing.List[int]) -> list:
+    bounds = _int_range(tp)
+    # int() runs in C over the whole column, rows are only looked at when something is wrong
+    try:
+        column = list(map(int, values))
+    except (ValueError, TypeError):
+        for i, v in enumerate(values):
+            try:
+                int(v)
+            except (ValueError, TypeError):
+                raise Exception(f"{source}, row {row_nos[i]}: '{fname}'={v!r} is not a valid integer")
+        raise
+    if bounds is not None and column and (min(column) < bounds[0] or max(column) > bounds[1]):
+        for i, v in enumerate(column):
+            if not bounds[0] <= v <= bounds[1]:
+                raise Exception(f"{source}, row {row_nos[i]}: '{fname}'={v} is out of {tp.__name__} range {bounds}")
+    return column
+
+
+def _validate_column(source: str, fname: str, validate, values: list, row_nos: typing.List[int]) -> list:
+    # refs and ulids are interned/cached, so repeated values are checked once; pydantic's errors are TypeErrors
+    try:
+        return list(map(validate, values))
+    except (ValueError, TypeError):
+        for i, v in enumerate(values):
+            try:
+                validate(v)
+            except (ValueError, TypeError) as e:
+                raise Exception(f"{source}, row {row_nos[i]}: '{fname}'={v!r}: {e}")
+        raise
+
+
+def define_many(cls, source, module: typing.Optional[str] = None, lineno: typing.Optional[int] = None) -> int:
+    if isinstance(source, (str, os.PathLike)):
+        source = resolve_data_path(source, module)
+        BaseData.add_data_file(module, source)
+        header, row_nos, rows = _read_table(source)
+    else:
+        source_name = f"rows of '{cls.__name__}'"
+        header, row_nos, rows = _dict_table(source_name, enumerate(source, start=1))
+        source = source_name
+    # column presence is checked once for the whole table
+    for fname in cls.__fields__.keys():
+        if fname not in header:
+            raise Exception(f"Can't create instances of '{cls.__name__}' from {source}: field '{fname}' is undefined")
+    columns = dict(zip(header, zip(*rows))) if rows else {fname: () for fname in header}
+    #
+    ids = [str(v) for v in columns['id']]
+    registered = BaseData.store(cls)
+    if len(set(ids)) != len(ids) or not registered.keys().isdisjoint(ids):
+        seen = set(registered.keys())
+        for i, id_ in enumerate(ids):
+            if id_ in seen:
+                raise Exception(f"{source}, row {row_nos[i]}: instance of '{cls.__name__}' with id='{id_}' is already defined")
+            seen.add(id_)
+    #
+    # the columns are checked here, validators only run in the constructor
+    trusted = not (cls.__validators__ or cls.__pre_root_validators__ or cls.__post_root_validators__)
+    values = {'id': ids}
+    for fname, field in cls.__fields__.items():
+        if fname == 'id':
+            continue
+        tp = field.outer_type_
+        column = list(columns[fname])
+        if _is_int_type(tp) and not field.allow_none:
+            values[fname] = _coerce_int_column(source, fname, tp, column, row_nos)
+        elif tp is str and not field.allow_none:
+            # the same coercion the constructor would do: numbers and bytes become str, anything else is an error
+            values[fname] = _validate_column(source, fname, str_validator, column, row_nos)
+        elif typing.get_origin(tp) == DataRef and not field.allow_none:
+            values[fname] = _validate_column(source, fname, DataRef.validate_ref, column, row_nos)
+        elif tp is Ulid and not field.allow_none:
+            values[fname] = _validate_column(source, fname, Ulid.validate, column, row_nos)
+        else:
+            values[fname] = column
+            trusted = False
+    #
+    if trusted and isinstance(registered, CompactStore):
+        registered.extend(values, (module, lineno))
+        BaseData.touch(cls)
+        return len(ids)
+    #
+    field_names = list(values.keys())
+    fields_set = set(field_names)
+    instances = []
+    for i, row in enumerate(zip(*values.values())):
+        kwargs = dict(zip(field_names, row))
+        if trusted and not cls.__private_attributes__:
+            # every column is already coerced and range-checked, so this is what BaseModel.construct() would do
+            inst = cls.__new__(cls)
+            object.__setattr__(inst, '__dict__', kwargs)
+            object.__setattr__(inst, '__fields_set__', fields_set)
+        elif trusted:
+            inst = cls.construct(**kwargs)
+        else:
+            try:
+                inst = cls(**kwargs)
+            except Exception as e:
+                raise Exception(f"{source}, row {row_nos[i]}: {e}") from e
+        instances.append(inst)
+    #
+    if isinstance(registered, CompactStore):
+        for inst in instances:
+            registered.append(inst.__dict__, (module, lineno))
+    else:
+        sources = BaseData._sources.setdefault(cls, {})
+        for inst in instances:
+            registered[inst.id] = inst
+            sources[inst.id] = (module, lineno)
+    BaseData.touch(cls)
+    return len(instances)
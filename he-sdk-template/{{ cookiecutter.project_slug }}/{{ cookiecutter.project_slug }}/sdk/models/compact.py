@@ -0,0 +1,284 @@
+import array
+import typing
+
+from .types import *
+
+
+_INT_TYPECODES = {
+    UInt64: 'Q',
+    Int64: 'q',
+    UInt32: 'I',
+    Int32: 'i',
+}
+
+
+class _IntColumn(object):
+    def __init__(self, typecode: str):
+        self._data = array.array(typecode)
+
+    def append(self, v):
+        try:
+            self._data.append(v)
+        except (OverflowError, TypeError):
+            # doesn't fit the typed array (plain int out of int64, or not an int at all)
+            self._data = list(self._data)
+            self._data.append(v)
+
+    def extend(self, values):
+        size = len(self._data)
+        try:
+            self._data.extend(values)
+        except (OverflowError, TypeError):
+            del self._data[size:]
+            self._data = list(self._data)
+            self._data.extend(values)
+
+    def __getitem__(self, i):
+        return self._data[i]
+
+    def take(self, indices) -> list:
+        data = self._data
+        return [data[i] for i in indices]
+
+
+class _StrColumn(object):
+    # every distinct string is kept once, rows hold indices into the pool; a pool entry costs about as much as
+    # 16 rows, so a column of mostly distinct strings (names, descriptions) drops it and keeps the strings as is
+    _UNPOOL_MIN_ROWS = 4096
+    _UNPOOL_RATIO = 16
+
+    def __init__(self):
+        self._pool = {}
+        self._strings = []
+        self._data = array.array('I')
+
+    def append(self, v):
+        pool = self._pool
+        if pool is None:
+            self._data.append(v)
+            return
+        i = pool.get(v)
+        if i is None:
+            i = pool[v] = len(self._strings)
+            self._strings.append(v)
+        self._data.append(i)
+        if len(self._data) >= self._UNPOOL_MIN_ROWS and len(self._strings) * self._UNPOOL_RATIO > len(self._data):
+            self._unpool()
+
+    def extend(self, values):
+        for v in values:
+            self.append(v)
+
+    def _unpool(self):
+        strings = self._strings
+        self._data = [strings[i] for i in self._data]
+        self._pool = self._strings = None
+
+    def __getitem__(self, i):
+        if self._pool is None:
+            return self._data[i]
+        return self._strings[self._data[i]]
+
+    def take(self, indices) -> list:
+        data = self._data
+        if self._pool is None:
+            return [data[i] for i in indices]
+        strings = self._strings
+        return [strings[data[i]] for i in indices]
+
+    def groups(self) -> dict:
+        if self._pool is None:
+            groups = {}
+            for row, v in enumerate(self._data):
+                groups.setdefault(v, []).append(row)
+            return groups
+        groups = {}
+        for row, i in enumerate(self._data):
+            groups.setdefault(i, []).append(row)
+        return {self._strings[i]: rows for i, rows in groups.items()}
+
+
+class _NullableColumn(object):
+    # Optional fields: a byte per row marks None, the typed column holds a placeholder for those rows
+    def __init__(self, column, placeholder):
+        self._column = column
+        self._placeholder = placeholder
+        self._nulls = bytearray()
+
+    def append(self, v):
+        self._nulls.append(v is None)
+        self._column.append(self._placeholder if v is None else v)
+
+    def extend(self, values):
+        values = list(values)
+        placeholder = self._placeholder
+        self._nulls.extend([v is None for v in values])
+        self._column.extend([placeholder if v is None else v for v in values])
+
+    def __getitem__(self, i):
+        return None if self._nulls[i] else self._column[i]
+
+    def take(self, indices) -> list:
+        nulls = self._nulls
+        values = self._column.take(indices)
+        return [None if nulls[i] else v for i, v in zip(indices, values)]
+
+
+class _ObjColumn(object):
+    def __init__(self):
+        self._data = []
+
+    def append(self, v):
+        self._data.append(v)
+
+    def extend(self, values):
+        self._data.extend(values)
+
+    def __getitem__(self, i):
+        return self._data[i]
+
+    def take(self, indices) -> list:
+        data = self._data
+        return [data[i] for i in indices]
+
+
+def _make_column(field):
+    tp = field.outer_type_
+    if is_new_type(tp) and tp in _INT_TYPECODES:
+        column, placeholder = _IntColumn(_INT_TYPECODES[tp]), 0
+    elif tp is int:
+        column, placeholder = _IntColumn('q'), 0
+    elif tp is str or tp is Ulid:
+        column, placeholder = _StrColumn(), ''
+    else:
+        return _ObjColumn()
+    return _NullableColumn(column, placeholder) if field.allow_none else column
+
+
+class CompactRows(object):
+    # a subset of store rows; iterating gives row views, serializers read the columns instead
+    def __init__(self, store: 'CompactStore', indices):
+        self.store = store
+        self.indices = indices
+
+    def __iter__(self):
+        view = self.store.view
+        for i in self.indices:
+            yield view(i)
+
+    def __len__(self):
+        return len(self.indices)
+
+    def ids(self) -> list:
+        ids = self.store.ids
+        return [ids[i] for i in self.indices]
+
+    def column(self, fname: str) -> list:
+        return self.store.columns[fname].take(self.indices)
+
+    def linenos(self) -> list:
+        return [lineno or None for lineno in self.store._linenos.take(self.indices)]
+
+
+class CompactStore(object):
+    # registry of a BaseData subclass with `_compact = True`, in place of its {id: instance} dict;
+    # instances handed out are views built on demand, so changing one doesn't change the stored row
+    def __init__(self, cls):
+        self._cls = cls
+        self.ids = []
+        self._index = {}
+        self.field_names = [fname for fname in cls.__fields__.keys() if fname != 'id']
+        self.columns = {fname: _make_column(cls.__fields__[fname]) for fname in self.field_names}
+        self._fields_set = set(cls.__fields__.keys())
+        self._modules = _StrColumn()
+        self._linenos = _IntColumn('i')
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, id_):
+        return id_ in self._index
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __getitem__(self, id_):
+        return self.view(self._index[id_])
+
+    def get(self, id_, default=None):
+        i = self._index.get(id_)
+        return default if i is None else self.view(i)
+
+    def keys(self):
+        return self._index.keys()
+
+    def values(self):
+        return CompactRows(self, range(len(self.ids)))
+
+    def items(self):
+        for i, id_ in enumerate(self.ids):
+            yield id_, self.view(i)
+
+    def append(self, values: dict, source: typing.Tuple[typing.Optional[str], typing.Optional[int]] = (None, None)):
+        id_ = values['id']
+        if id_ in self._index:
+            raise Exception(f"Instance of '{self._cls.__name__}' with id='{id_}' is already defined")
+        self._index[id_] = len(self.ids)
+        self.ids.append(id_)
+        for fname in self.field_names:
+            self.columns[fname].append(values[fname])
+        self._modules.append(source[0])
+        self._linenos.append(source[1] or 0)
+
+    def extend(self, columns: typing.Dict[str, list], source: typing.Tuple[typing.Optional[str], typing.Optional[int]] = (None, None)):
+        # columns are already validated, ids already checked for duplicates
+        start = len(self.ids)
+        ids = columns['id']
+        self._index.update(zip(ids, range(start, start + len(ids))))
+        self.ids.extend(ids)
+        for fname in self.field_names:
+            self.columns[fname].extend(columns[fname])
+        self._modules.extend([source[0]] * len(ids))
+        self._linenos.extend([source[1] or 0] * len(ids))
+
+    def source(self, id_: str) -> typing.Tuple[typing.Optional[str], typing.Optional[int]]:
+        i = self._index.get(id_)
+        if i is None:
+            return None, None
+        return self._modules[i], self._linenos[i] or None
+
+    def drop_sources(self, modules: typing.Collection[str]) -> int:
+        # removes the rows defined by the given modules, the remaining rows are copied into new columns
+        keep = [i for i, module in enumerate(self._modules.take(range(len(self.ids)))) if module not in modules]
+        dropped = len(self.ids) - len(keep)
+        if not dropped:
+            return 0
+        ids = [self.ids[i] for i in keep]
+        columns = {fname: self.columns[fname].take(keep) for fname in self.field_names}
+        module_column = self._modules.take(keep)
+        lineno_column = self._linenos.take(keep)
+        self.ids = ids
+        self._index = {id_: i for i, id_ in enumerate(ids)}
+        self.columns = {fname: _make_column(self._cls.__fields__[fname]) for fname in self.field_names}
+        for fname in self.field_names:
+            self.columns[fname].extend(columns[fname])
+        self._modules = _StrColumn()
+        self._modules.extend(module_column)
+        self._linenos = _IntColumn('i')
+        self._linenos.extend(lineno_column)
+        return dropped
+
+    def indices_by_module(self) -> typing.Dict[typing.Optional[str], typing.List[int]]:
+        return self._modules.groups()
+
+    def view(self, i: int):
+        values = {'id': self.ids[i]}
+        for fname in self.field_names:
+            values[fname] = self.columns[fname][i]
+        cls = self._cls
+        if cls.__private_attributes__:
+            return cls.construct(**values)
+        inst = cls.__new__(cls)
+        object.__setattr__(inst, '__dict__', values)
+        object.__setattr__(inst, '__fields_set__', self._fields_set)
+        return inst
@@ -1,16 +1,28 @@
 from collections import defaultdict
 from pydantic import Field, validator, ValidationError
 from pydantic.fields import ModelField
+import csv
+import json
+import os
+import sys
 import typing
+import weakref
 
 from .types import *
 from .base import _BaseModel
+from .compact import CompactStore
 
 
 class BaseData(_BaseModel):
     _abstract = True
 
     _registry = {}
+    _sources = {}
+    _providers = {}
+    _by_name = {}
+    # weak, so that a class dropped by drop_modules isn't kept alive by its version
+    _versions = weakref.WeakKeyDictionary()
+    _data_files = {}
 
     id: str = Field(...)
 
@@ -27,24 +39,245 @@ class BaseData(_BaseModel):
         for inst in BaseData._registry[cls].values():
             yield inst
 
+    @staticmethod
+    def store(cls):
+        # {id: instance} dict, or a CompactStore for classes with `_compact = True`
+        store = BaseData._registry.get(cls)
+        if store is None:
+            store = BaseData._registry[cls] = CompactStore(cls) if cls._compact else {}
+            BaseData._by_name[cls.__name__] = cls
+        return store
+
+    @staticmethod
+    def version(cls) -> int:
+        # changes whenever instances of cls are added, so anything derived from them can tell it's stale
+        return BaseData._versions.get(cls, 0)
+
+    @staticmethod
+    def touch(cls):
+        BaseData._versions[cls] = BaseData._versions.get(cls, 0) + 1
+
+    @staticmethod
+    def add_data_file(module: typing.Optional[str], path: str):
+        # files a module read instances from, a cached or loaded module is stale once they change
+        files = BaseData._data_files.setdefault(module, [])
+        path = os.path.abspath(path)
+        if path not in files:
+            files.append(path)
+
+    @staticmethod
+    def data_files(modules: typing.Optional[typing.Collection[str]] = None) -> typing.List[str]:
+        return [path for module, files in BaseData._data_files.items() if modules is None or module in modules for path in files]
+
+    @staticmethod
+    def drop_modules(modules: typing.Collection[str]):
+        # forget the classes, instances and providers the given modules defined, so they can be imported again
+        for cls in list(BaseData._registry):
+            store = BaseData._registry[cls]
+            if cls.__module__ in modules:
+                del BaseData._registry[cls]
+                BaseData._sources.pop(cls, None)
+                if BaseData._by_name.get(cls.__name__) is cls:
+                    del BaseData._by_name[cls.__name__]
+            elif isinstance(store, CompactStore):
+                store.drop_sources(modules)
+            else:
+                sources = BaseData._sources.get(cls, {})
+                for id_ in [id_ for id_, (module, _) in sources.items() if module in modules]:
+                    del store[id_]
+                    del sources[id_]
+            BaseData.touch(cls)
+        for module in modules:
+            BaseData._data_files.pop(module, None)
+        for cls in list(BaseData._providers):
+            providers = [provider for provider in BaseData._providers[cls] if provider.module not in modules]
+            if providers and cls.__module__ not in modules:
+                BaseData._providers[cls] = providers
+            else:
+                del BaseData._providers[cls]
+
+    @staticmethod
+    def dataclass(name: str):
+        return BaseData._by_name.get(name)
+
+    @staticmethod
+    def get(cls, id_: str, default=None):
+        # cls is a data class or its name, as in a DataRef
+        if isinstance(cls, str):
+            cls = BaseData._by_name.get(cls)
+        store = BaseData._registry.get(cls)
+        if store is None:
+            return default
+        return store.get(id_, default)
+
+    @staticmethod
+    def providers(cls) -> typing.List['InstanceProvider']:
+        return BaseData._providers.get(cls, [])
+
+    @staticmethod
+    def provided_dataclasses():
+        for cls in BaseData._providers:
+            yield cls
+
+    @staticmethod
+    def provided_instances(cls):
+        for _, _, inst in BaseData.provided_rows(cls):
+            yield inst
+
+    @staticmethod
+    def provided_rows(cls):
+        # validated one row at a time and never registered, so only ids are kept
+        ids = set(BaseData._registry.get(cls, {}).keys())
+        for provider in BaseData.providers(cls):
+            for row_no, row in provider.rows():
+                try:
+                    inst = cls.validate_row(row)
+                except Exception as e:
+                    raise Exception(f"{provider.describe()}, row {row_no}: {e}") from e
+                if inst.id in ids:
+                    raise Exception(f"Instance of '{cls.__name__}' with id='{inst.id}' is already defined ({provider.describe()}, row {row_no})")
+                ids.add(inst.id)
+                yield provider, row_no, inst
+
+    @staticmethod
+    def source(cls, id_: str) -> typing.Tuple[typing.Optional[str], typing.Optional[int]]:
+        store = BaseData._registry.get(cls)
+        if isinstance(store, CompactStore):
+            return store.source(id_)
+        return BaseData._sources.get(cls, {}).get(id_, (None, None))
+
     @classmethod
-    def define(cls, **kwargs):
+    def validate_row(cls, row: dict):
         for fname in cls.__fields__.keys():
-            if fname not in kwargs:
+            if fname not in row:
                 raise Exception(f"Can't create instance of '{cls.__name__}': field '{fname}' is undefined")
-        inst = cls(**kwargs)
-        if cls not in BaseData._registry:
-            BaseData._registry[cls] = {}
-        if inst.id in BaseData._registry[cls]:
+        return cls(**row)
+
+    @classmethod
+    def define(cls, **kwargs):
+        inst = cls.validate_row(kwargs)
+        store = BaseData.store(cls)
+        if inst.id in store:
             raise Exception(f"Instance of '{cls.__name__}' with id='{inst.id}' is already defined")
-        BaseData._registry[cls][inst.id] = inst
+        frame = sys._getframe(1)
+        source = (frame.f_globals.get('__name__'), frame.f_lineno)
+        if isinstance(store, CompactStore):
+            store.append(inst.__dict__, source)
+        else:
+            store[inst.id] = inst
+            BaseData._sources.setdefault(cls, {})[inst.id] = source
+        BaseData.touch(cls)
         return inst
 
+    @classmethod
+    def define_many(cls, source):
+        # bulk define() from a .csv/.jsonl path or an iterable of field dicts
+        from .bulk import define_many
+        frame = sys._getframe(1)
+        return define_many(cls, source, frame.f_globals.get('__name__'), frame.f_lineno)
+
+    @classmethod
+    def query(cls) -> 'Query':
+        # registered instances only, lazy providers aren't read
+        from .query import Query
+        return Query(cls)
+
+    @classmethod
+    def where(cls, **conditions) -> 'Query':
+        return cls.query().where(**conditions)
+
+    @classmethod
+    def order_by(cls, *fnames: str) -> 'Query':
+        return cls.query().order_by(*fnames)
+
+    @classmethod
+    def index_stats(cls) -> typing.List[dict]:
+        from .query import index_stats
+        return index_stats(cls)
+
+    @classmethod
+    def provide(cls, source):
+        # lazy instances: a function returning field dicts, a .jsonl/.csv path or an iterable,
+        # read only when the app definition is serialized
+        frame = sys._getframe(1)
+        provider = InstanceProvider(cls, source, frame.f_globals.get('__name__'), frame.f_lineno)
+        BaseData._providers.setdefault(cls, []).append(provider)
+        return provider
+
+
+def resolve_data_path(path, module: typing.Optional[str]) -> str:
+    if os.path.splitext(str(path))[1].lower() not in ('.jsonl', '.csv'):
+        raise ValueError(f"Unsupported instance source '{path}': expected a .jsonl or .csv file")
+    # relative paths are relative to the module that uses them
+    module_file = getattr(sys.modules.get(module), '__file__', None)
+    if module_file and not os.path.isabs(path):
+        return os.path.join(os.path.dirname(module_file), path)
+    return str(path)
+
+
+class InstanceProvider(object):
+    def __init__(self, cls, source, module: typing.Optional[str] = None, lineno: typing.Optional[int] = None):
+        self._cls = cls
+        self._source = source
+        self._module = module
+        self._lineno = lineno
+        # rows already read from a one-shot iterator, replayed by the next pass
+        self._read_rows = []
+        if isinstance(source, (str, os.PathLike)):
+            self._source = resolve_data_path(source, module)
+        elif not callable(source) and not hasattr(source, '__iter__'):
+            raise ValueError(f"Unsupported instance source for '{cls.__name__}': {source!r}")
+
+    @property
+    def module(self) -> typing.Optional[str]:
+        return self._module
+
+    def describe(self) -> str:
+        if isinstance(self._source, (str, os.PathLike)):
+            return str(self._source)
+        return f"instance source of '{self._cls.__name__}' at {self._module}:{self._lineno}"
+
+    def rows(self) -> typing.Iterator[typing.Tuple[int, dict]]:
+        source = self._source
+        if isinstance(source, (str, os.PathLike)):
+            if str(source).lower().endswith('.csv'):
+                with open(source, 'r', newline='') as f:
+                    # row 1 is the header
+                    yield from enumerate(csv.DictReader(f), start=2)
+            else:
+                with open(source, 'r') as f:
+                    for row_no, line in enumerate(f, start=1):
+                        if line.strip():
+                            yield row_no, json.loads(line)
+        elif callable(source):
+            yield from enumerate(source(), start=1)
+        elif iter(source) is source:
+            # export and release in one pipeline both read the rows, so an iterator is kept as it is consumed
+            yield from enumerate(self._replay(source), start=1)
+        else:
+            yield from enumerate(source, start=1)
+
+    def _replay(self, source):
+        read_rows = self._read_rows
+        i = 0
+        while True:
+            if i == len(read_rows):
+                try:
+                    read_rows.append(next(source))
+                except StopIteration:
+                    return
+            yield read_rows[i]
+            i += 1
+
 
 ReferencedType = typing.TypeVar('ReferencedType')
 
 
 class DataRef(typing.Generic[ReferencedType]):
+    # validated refs are interned, so rows referencing the same item share one object: don't modify them
+    __slots__ = ('data_type', 'id')
+
+    _interned = {}
 
     def __init__(self, data_type: ReferencedType, id_: str):
         self.data_type = data_type
@@ -62,13 +295,28 @@ class DataRef(typing.Generic[ReferencedType]):
 
     @classmethod
     def validate_ref(cls, v):
+        # only the format is checked here, the target may be defined later;
+        # DataLoader.check_refs() resolves every reference once all modules are loaded
+        if isinstance(v, DataRef):
+            return v
         if not isinstance(v, str):
-            raise ValidationError("Data reference should be string")
-        try:
-            kls, id_ = v.split('/')
-        except:
-            raise ValidationError(f"Invalid data reference: {v}")
-        return DataRef(kls, id_)
+            raise TypeError("Data reference should be string")
+        ref = DataRef._interned.get(v)
+        if ref is not None:
+            return ref
+        kls, sep, id_ = v.partition('/')
+        if not sep or not kls or not id_ or '/' in id_:
+            raise ValueError(f"Invalid data reference: {v}")
+        ref = DataRef._interned[v] = DataRef(kls, id_)
+        return ref
+
+    def __eq__(self, other):
+        if not isinstance(other, DataRef):
+            return NotImplemented
+        return self.data_type == other.data_type and self.id == other.id
+
+    def __hash__(self):
+        return hash((self.data_type, self.id))
 
     def __repr__(self):
         return f"'{self.data_type}/{self.id}'"
\ No newline at end of file
@@ -1,6 +1,7 @@
 from {{ cookiecutter.project_slug }}.sdk.models import BaseData, DataRef
 
 import inflection
+import sys
 
 
 class Inventory(object):
@@ -9,6 +10,8 @@ class Inventory(object):
     def __init__(self, name='UserInventory'):
         self._name = name
         self._items = {}
+        self._item_modules = {}
+        self._module = sys._getframe(1).f_globals.get('__name__')
         #
         if name in Inventory._registry:
             raise Exception(f"Inventory with name '{name}' already defined")
@@ -18,6 +21,17 @@ class Inventory(object):
     def all():
         return Inventory._registry.values()
 
+    @staticmethod
+    def drop_modules(modules):
+        # forget the inventories and items the given modules added
+        for name, inv in list(Inventory._registry.items()):
+            if inv._module in modules:
+                del Inventory._registry[name]
+                continue
+            for item_id in [item_id for item_id, module in inv._item_modules.items() if module in modules]:
+                del inv._items[item_id]
+                del inv._item_modules[item_id]
+
     @staticmethod
     def user():
         global _default_inventory
@@ -27,16 +41,29 @@ class Inventory(object):
     def name(self):
         return self._name
 
+    @property
+    def module(self):
+        return self._module
+
     def add(self, item: BaseData):
         if item.id in self._items:
             raise Exception(f"Inventory already have item with id='{item.id}'")
         self._items[item.id] = item
+        self._item_modules[item.id] = sys._getframe(1).f_globals.get('__name__')
         return self
 
+    def items_with_modules(self):
+        for item_id, item in self._items.items():
+            yield self.item_to_dict(item), self._item_modules.get(item_id)
+
+    @staticmethod
+    def item_to_dict(item: BaseData):
+        return dict(Id=item.id, Typename=inflection.camelize(type(item).__name__))
+
     def to_dict(self):
         return dict(
             Name=self._name,
-            Items=[dict(Id=item.id, Typename=inflection.camelize(type(item).__name__)) for item in self._items.values()]
+            Items=[self.item_to_dict(item) for item in self._items.values()]
         )
 
 
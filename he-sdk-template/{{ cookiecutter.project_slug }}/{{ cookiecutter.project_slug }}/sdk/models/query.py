@@ -0,0 +1,296 @@
+import bisect
+import time
+import typing
+import weakref
+
+from .data import BaseData, DataRef
+from .compact import CompactStore
+
+
+# Queries over registered instances, answered from secondary indexes built on first use;
+# an index is dropped as soon as its class gets new instances (BaseData.version changes)
+
+
+class _HashIndex(object):
+    kind = 'hash'
+
+    def __init__(self, ids: list, values: list):
+        started = time.perf_counter()
+        self._ids = {}
+        for id_, v in zip(ids, values):
+            self._ids.setdefault(v, []).append(id_)
+        self.size = len(ids)
+        self.keys = len(self._ids)
+        self.build_time = time.perf_counter() - started
+        self.uses = 0
+
+    def count(self, value) -> int:
+        return len(self._ids.get(value, ()))
+
+    def lookup(self, value) -> list:
+        self.uses += 1
+        return self._ids.get(value, [])
+
+
+class _SortedIndex(object):
+    kind = 'sorted'
+
+    def __init__(self, ids: list, values: list):
+        started = time.perf_counter()
+        # position breaks ties, so equal values keep definition order
+        pairs = sorted((v, i) for i, v in enumerate(values) if v is not None)
+        self._values = [v for v, _ in pairs]
+        self._ids = [ids[i] for _, i in pairs]
+        self._nulls = [id_ for id_, v in zip(ids, values) if v is None]
+        self.size = len(ids)
+        self.keys = len(self._values)
+        self.build_time = time.perf_counter() - started
+        self.uses = 0
+
+    def _bounds(self, lo, hi) -> typing.Tuple[int, int]:
+        start = 0 if lo is None else bisect.bisect_left(self._values, lo)
+        end = len(self._values) if hi is None else bisect.bisect_right(self._values, hi)
+        return start, max(start, end)
+
+    def count(self, lo, hi) -> int:
+        start, end = self._bounds(lo, hi)
+        return end - start
+
+    def lookup(self, lo, hi) -> list:
+        self.uses += 1
+        start, end = self._bounds(lo, hi)
+        return self._ids[start:end]
+
+    def ordered(self, reverse: bool = False) -> list:
+        # None sorts last either way
+        self.uses += 1
+        return (self._ids[::-1] if reverse else self._ids) + self._nulls
+
+
+class _ValueIndex(object):
+    # id -> value, so candidates are checked without building instances
+    kind = 'values'
+
+    def __init__(self, ids: list, values: list):
+        started = time.perf_counter()
+        self.values = dict(zip(ids, values))
+        self.size = len(ids)
+        self.keys = len(self.values)
+        self.build_time = time.perf_counter() - started
+        self.uses = 0
+
+
+_INDEX_KINDS = {index_cls.kind: index_cls for index_cls in (_HashIndex, _SortedIndex, _ValueIndex)}
+
+
+class _ClassIndexes(object):
+    def __init__(self, version: int):
+        self.version = version
+        # (kind, field name) -> index, or None if the values can't be indexed that way
+        self.indexes = {}
+
+
+# weak, so that the indexes of a class dropped by BaseData.drop_modules go away with it
+_indexes = weakref.WeakKeyDictionary()
+
+
+def _column(cls, fname: str) -> typing.Tuple[list, list]:
+    store = BaseData.store(cls)
+    if isinstance(store, CompactStore):
+        rows = store.values()
+        return rows.ids(), (rows.ids() if fname == 'id' else rows.column(fname))
+    return list(store.keys()), [data_inst.__dict__[fname] for data_inst in store.values()]
+
+
+def _get_index(cls, kind: str, fname: str):
+    entry = _indexes.get(cls)
+    if entry is None or entry.version != BaseData.version(cls):
+        entry = _indexes[cls] = _ClassIndexes(BaseData.version(cls))
+    key = (kind, fname)
+    if key not in entry.indexes:
+        ids, values = _column(cls, fname)
+        try:
+            entry.indexes[key] = _INDEX_KINDS[kind](ids, values)
+        except TypeError:
+            # unhashable or mutually unorderable values
+            entry.indexes[key] = None
+        return entry.indexes[key], True
+    return entry.indexes[key], False
+
+
+def _in_range(value, lo, hi) -> bool:
+    # like the sorted index: None and values that don't compare with the bounds never match
+    if value is None:
+        return False
+    try:
+        return (lo is None or lo <= value) and (hi is None or value <= hi)
+    except TypeError:
+        return False
+
+
+def _values(cls, fname: str) -> dict:
+    index, _ = _get_index(cls, 'values', fname)
+    index.uses += 1
+    return index.values
+
+
+def index_stats(cls) -> typing.List[dict]:
+    entry = _indexes.get(cls)
+    if entry is None or entry.version != BaseData.version(cls):
+        return []
+    return [dict(field=fname, kind=kind, usable=index is not None,
+                 size=index.size if index else 0, keys=index.keys if index else 0,
+                 build_ms=round(index.build_time * 1000, 3) if index else 0, uses=index.uses if index else 0)
+            for (kind, fname), index in entry.indexes.items()]
+
+
+class Query(object):
+    def __init__(self, cls):
+        self._cls = cls
+        self._equals = []
+        self._ranges = []
+        self._order = []
+        self._limit = None
+
+    def _copy(self) -> 'Query':
+        query = Query(self._cls)
+        query._equals = list(self._equals)
+        query._ranges = list(self._ranges)
+        query._order = list(self._order)
+        query._limit = self._limit
+        return query
+
+    def _field(self, fname: str):
+        field = self._cls.__fields__.get(fname)
+        if field is None:
+            raise ValueError(f"'{self._cls.__name__}' has no field '{fname}'")
+        return field
+
+    def where(self, **conditions) -> 'Query':
+        query = self._copy()
+        for fname, value in conditions.items():
+            field = self._field(fname)
+            if typing.get_origin(field.outer_type_) == DataRef and isinstance(value, str):
+                value = DataRef.validate_ref(value)
+            query._equals.append((fname, value))
+        return query
+
+    def range(self, fname: str, lo=None, hi=None) -> 'Query':
+        # lo <= value <= hi, either bound may be omitted; None values never match
+        self._field(fname)
+        query = self._copy()
+        query._ranges.append((fname, lo, hi))
+        return query
+
+    def order_by(self, *fnames: str) -> 'Query':
+        # '-Field' for descending
+        query = self._copy()
+        for fname in fnames:
+            reverse = fname.startswith('-')
+            fname = fname.lstrip('-')
+            self._field(fname)
+            query._order.append((fname, reverse))
+        return query
+
+    def limit(self, n: int) -> 'Query':
+        query = self._copy()
+        query._limit = n
+        return query
+
+    def _run(self) -> typing.Tuple[list, dict]:
+        cls = self._cls
+        store = BaseData.store(cls)
+        plan = dict(cls=cls.__name__, rows=len(store), filters=[], driver=None, checked=0, order=None, results=0)
+        # every filter that has an index reports how many rows it matches, the most selective one drives the query
+        filters = []
+        for fname, value in self._equals:
+            if fname == 'id':
+                filters.append(dict(field=fname, op='==', value=value, index='id', built=False,
+                                    matches=int(value in store), lookup=lambda value=value: [value] if value in store else []))
+                continue
+            index, built = _get_index(cls, 'hash', fname)
+            try:
+                matches = index.count(value) if index else None
+            except TypeError:
+                index, matches = None, None
+            filters.append(dict(field=fname, op='==', value=value, index=index and index.kind, built=built, matches=matches,
+                                lookup=index and (lambda index=index, value=value: index.lookup(value))))
+        for fname, lo, hi in self._ranges:
+            index, built = _get_index(cls, 'sorted', fname)
+            try:
+                matches = index.count(lo, hi) if index else None
+            except TypeError:
+                index, matches = None, None
+            filters.append(dict(field=fname, op='range', lo=lo, hi=hi, index=index and index.kind, built=built, matches=matches,
+                                lookup=index and (lambda index=index, lo=lo, hi=hi: index.lookup(lo, hi))))
+        #
+        indexed = [f for f in filters if f['lookup'] is not None]
+        driver = min(indexed, key=lambda f: f['matches']) if indexed else None
+        order_index = None
+        if driver is not None:
+            plan['driver'] = driver['field']
+            ids = driver['lookup']()
+        elif len(self._order) == 1 and not filters:
+            fname, reverse = self._order[0]
+            order_index, built = _get_index(cls, 'sorted', fname)
+            ids = order_index.ordered(reverse) if order_index else list(store.keys())
+        else:
+            ids = list(store.keys())
+        #
+        checks = [f for f in filters if f is not driver]
+        if order_index is not None:
+            plan['order'] = 'index'
+            results = list(ids)
+        elif checks or self._order:
+            # the remaining filters and the ordering read the candidates' values
+            results = list(ids)
+            plan['checked'] = len(results)
+            for f in checks:
+                values = _values(cls, f['field'])
+                if f['op'] == '==':
+                    value = f['value']
+                    results = [id_ for id_ in results if values[id_] == value]
+                else:
+                    lo, hi = f['lo'], f['hi']
+                    results = [id_ for id_ in results if _in_range(values[id_], lo, hi)]
+            # stable sorts from the last key to the first; None sorts last either way
+            for fname, reverse in reversed(self._order):
+                values = _values(cls, fname)
+                present = [id_ for id_ in results if values[id_] is not None]
+                try:
+                    present.sort(key=values.__getitem__, reverse=reverse)
+                except TypeError:
+                    types = sorted({type(values[id_]).__name__ for id_ in present})
+                    raise ValueError(f"Can't order '{cls.__name__}' by '{fname}': "
+                                     f"its values of type {', '.join(types)} don't compare") from None
+                results = present + [id_ for id_ in results if values[id_] is None]
+                plan['order'] = 'sort'
+        else:
+            results = list(ids)
+        if self._limit is not None:
+            results = results[:self._limit]
+        for f in filters:
+            del f['lookup']
+        plan['filters'] = filters
+        plan['results'] = len(results)
+        return results, plan
+
+    def ids(self) -> typing.List[str]:
+        return self._run()[0]
+
+    def all(self) -> list:
+        store = BaseData.store(self._cls)
+        return [store[id_] for id_ in self.ids()]
+
+    def __iter__(self):
+        return iter(self.all())
+
+    def first(self):
+        ids = self.limit(1).ids()
+        return BaseData.store(self._cls)[ids[0]] if ids else None
+
+    def count(self) -> int:
+        return len(self.ids())
+
+    def explain(self) -> dict:
+        return self._run()[1]
@@ -1,3 +1,4 @@
+import functools
 import sys
 import typing
 from ulid import ULID
@@ -18,13 +19,26 @@ class Ulid(str):
     def validate(cls, v):
         if not isinstance(v, str):
             raise TypeError('string required')
-        u = ULID.from_str(v)
-        return cls(str(u))
+        return _parse_ulid(v) if cls is Ulid else cls(str(ULID.from_str(v)))
 
     def __repr__(self):
         return f'Ulid({super().__repr__()})'
 
 
+@functools.lru_cache(maxsize=1 << 16)
+def _parse_ulid(v: str) -> Ulid:
+    # ids repeat a lot across rows, and Ulid is immutable, so parsed values are shared
+    return Ulid(str(ULID.from_str(v)))
+
+
+INT_RANGES = {
+    UInt64: (0, 2 ** 64 - 1),
+    Int64: (-2 ** 63, 2 ** 63 - 1),
+    UInt32: (0, 2 ** 32 - 1),
+    Int32: (-2 ** 31, 2 ** 31 - 1),
+}
+
+
 def is_new_type(tp):
     if sys.version_info[:3] >= (3, 10, 0) and sys.version_info.releaselevel != 'beta':
         return tp is typing.NewType or isinstance(tp, typing.NewType)
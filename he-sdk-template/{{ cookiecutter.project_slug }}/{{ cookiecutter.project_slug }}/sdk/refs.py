@@ -0,0 +1,100 @@
+import typing
+
+from {{ cookiecutter.project_slug }}.sdk.models import BaseData, DataRef
+
+
+# Where DataRefs can be in a field value ('shape'), JSON-ready so it can be cached with the class:
+# 'ref' - the value is a reference, ['list', shape] - every item, ['dict', key shape, value shape]
+
+
+def ref_shape(tp):
+    t_origin = typing.get_origin(tp)
+    t_args = typing.get_args(tp)
+    if t_origin == DataRef:
+        return 'ref'
+    elif t_origin is typing.Union:
+        shapes = [ref_shape(arg) for arg in t_args if arg is not type(None)]
+        return shapes[0] if len(shapes) == 1 else None
+    elif t_origin in (list, set, frozenset):
+        shape = ref_shape(t_args[0]) if t_args else None
+        return ['list', shape] if shape else None
+    elif t_origin is dict:
+        key_shape, value_shape = (ref_shape(t_args[0]), ref_shape(t_args[1])) if t_args else (None, None)
+        return ['dict', key_shape, value_shape] if key_shape or value_shape else None
+    return None
+
+
+def iter_refs(shape, value) -> typing.Iterator[typing.Tuple[str, str]]:
+    # (class name, id) of every reference in a value, live (DataRef) or serialized ('Class/id')
+    if value is None:
+        return
+    if shape == 'ref':
+        if isinstance(value, DataRef):
+            yield str(value.data_type), str(value.id)
+        else:
+            cls_name, _, id_ = str(value).partition('/')
+            yield cls_name, id_
+    elif shape[0] == 'list':
+        for v in value:
+            yield from iter_refs(shape[1], v)
+    elif shape[0] == 'dict':
+        for k, v in value.items():
+            if shape[1]:
+                yield from iter_refs(shape[1], k)
+            if shape[2]:
+                yield from iter_refs(shape[2], v)
+
+
+def location(source, id_: str) -> str:
+    # source is a data class (registered instance), ('module', name, lineno) or ('row', file, row number)
+    if isinstance(source, type):
+        module, lineno = BaseData.source(source, id_)
+        return f"{module}:{lineno}" if lineno else str(module)
+    elif source[0] == 'row':
+        return f"{source[1]}, row {source[2]}"
+    return f"{source[1]}:{source[2]}" if source[2] else str(source[1])
+
+
+class RefIndex(object):
+    def __init__(self):
+        # class name -> containers of its ids
+        self._ids = {}
+        # (class name, id, field name, referenced class name, referenced id, source)
+        self._refs = []
+        self._referrers = None
+
+    def add_ids(self, cls_name: str, ids: typing.Container[str]):
+        self._ids.setdefault(cls_name, []).append(ids)
+
+    def add_refs(self, cls_name: str, id_: str, fname: str, shape, value, source):
+        for ref_cls_name, ref_id in iter_refs(shape, value):
+            self._refs.append((cls_name, id_, fname, ref_cls_name, ref_id, source))
+            self._referrers = None
+
+    def __len__(self):
+        return len(self._refs)
+
+    def has_class(self, cls_name: str) -> bool:
+        return cls_name in self._ids
+
+    def resolve(self, cls_name: str, id_: str) -> bool:
+        containers = self._ids.get(cls_name)
+        if containers is None:
+            return False
+        return any(id_ in ids for ids in containers)
+
+    def dangling(self) -> list:
+        return [ref for ref in self._refs if not self.resolve(ref[3], ref[4])]
+
+    def referrers(self, cls_name: str, id_: str) -> typing.List[typing.Tuple[str, str, str]]:
+        # (class name, id, field name) of every instance referencing cls_name/id_
+        if self._referrers is None:
+            self._referrers = {}
+            for ref in self._refs:
+                self._referrers.setdefault((ref[3], ref[4]), []).append(ref[:3])
+        return list(self._referrers.get((cls_name, id_), []))
+
+    def describe(self, ref) -> str:
+        cls_name, id_, fname, ref_cls_name, ref_id, source = ref
+        reason = "no such instance" if self.has_class(ref_cls_name) else f"unknown data class '{ref_cls_name}'"
+        return f"{location(source, id_)}: {cls_name}(id='{id_}').{fname} -> '{ref_cls_name}/{ref_id}': {reason}"
@@ -0,0 +1,237 @@
+import inflection
+import typing
+import weakref
+
+from {{ cookiecutter.project_slug }}.sdk.models.types import is_new_type, Ulid
+from {{ cookiecutter.project_slug }}.sdk.models.base import _BaseModel
+from {{ cookiecutter.project_slug }}.sdk.models import DataRef
+from {{ cookiecutter.project_slug }}.sdk.models.compact import CompactRows
+from {{ cookiecutter.project_slug }}.sdk.refs import ref_shape
+
+
+class Wrapped(object):
+    def __init__(self, cls):
+        self._cls = cls
+        self._names = None
+        self._data = None
+
+    def _name(self, key):
+        if self._names is None:
+            entity_name = inflection.camelize(self._cls.__name__)
+            var_name = inflection.underscore(self._cls.__name__)
+            var_name_camel = inflection.camelize(var_name)
+            self._names = dict(
+                entity_name=entity_name,
+                entity_name_plural=inflection.pluralize(entity_name),
+                entity_name_us=inflection.underscore(entity_name),
+                var_name=var_name,
+                var_name_camel=var_name_camel,
+                var_name_camel_plural=inflection.pluralize(var_name_camel),
+                var_name_plural=inflection.pluralize(var_name),
+            )
+        return self._names[key]
+
+    @property
+    def uid(self):
+        return self._cls._uid
+
+    @property
+    def storage_flags(self):
+        return self._cls._storage_flags
+
+    @property
+    def data(self):
+        return self._data
+
+    @property
+    def entity_name(self):
+        return self._name('entity_name')
+
+    @property
+    def entity_name_plural(self):
+        return self._name('entity_name_plural')
+
+    @property
+    def entity_name_us(self):
+        return self._name('entity_name_us')
+
+    @property
+    def var_name(self):
+        return self._name('var_name')
+
+    @property
+    def var_name_camel(self):
+        return self._name('var_name_camel')
+
+    @property
+    def var_name_camel_plural(self):
+        return self._name('var_name_camel_plural')
+
+    @property
+    def var_name_plural(self):
+        return self._name('var_name_plural')
+
+
+def json_value(v):
+    if isinstance(v, DataRef):
+        return v.ref_str()
+    elif isinstance(v, (list, tuple)):
+        return [json_value(x) for x in v]
+    elif isinstance(v, dict):
+        return {str(k): json_value(x) for k, x in v.items()}
+    elif v is None or isinstance(v, (bool, int, float, str)):
+        return v
+    return str(v)
+
+
+_cs_types = {}
+
+
+def get_cs_type(fdef: type, dto=False):
+    try:
+        return _cs_types[fdef, dto]
+    except KeyError:
+        cs_type = _cs_types[fdef, dto] = _get_cs_type(fdef, dto)
+        return cs_type
+    except TypeError:
+        # unhashable annotation
+        return _get_cs_type(fdef, dto)
+
+
+def _get_cs_type(fdef: type, dto=False):
+    #
+    t_origin = typing.get_origin(fdef)
+    #
+    if is_new_type(fdef):
+        return fdef.__name__.lower()
+    elif fdef == int:
+        return "int"
+    elif fdef == str:
+        return "string"
+    elif fdef == Ulid:
+        return "Ulid"
+    elif t_origin:
+        t_args = typing.get_args(fdef)
+        if t_origin is typing.Optional:
+            return get_cs_type(t_args[0])
+        elif t_origin is list:
+            return f"List<{get_cs_type(t_args[0], dto=dto)}>"
+        elif t_origin is dict:
+            return f"Dict<{get_cs_type(t_args[0], dto=dto)}, {get_cs_type(t_args[1], dto=dto)}>"
+        elif t_origin == DataRef:
+            return f"{get_cs_type(t_args[0], dto=dto)}"
+        else:
+            assert False, f"{t_origin} not supported"
+    else:
+        if issubclass(fdef, _BaseModel) and dto:
+            wrp_cls = Wrapped(fdef)
+            return f'{wrp_cls.var_name_camel}DTO'
+        return fdef.__name__
+
+
+def _ref_target(fdef):
+    if typing.get_origin(fdef) == DataRef:
+        return typing.get_args(fdef)[0]
+    for arg in typing.get_args(fdef):
+        target = _ref_target(arg)
+        if target is not None:
+            return target
+    return None
+
+
+def _ref_str(v):
+    return v.ref_str() if isinstance(v, DataRef) else json_value(v)
+
+
+def _value_encoder(fdef) -> typing.Optional[typing.Callable]:
+    # None means the stored value is already JSON-ready
+    if is_new_type(fdef) or fdef in (int, str, bool, float, Ulid):
+        return None
+    if typing.get_origin(fdef) == DataRef:
+        return _ref_str
+    return json_value
+
+
+class FieldSchema(object):
+    def __init__(self, name: str, annotation):
+        self.name = name
+        self.annotation = annotation
+        self.cs_type = get_cs_type(annotation)
+        self.dto_type = get_cs_type(annotation, dto=True)
+        self.ref_target = _ref_target(annotation)
+        self.ref_shape = ref_shape(annotation)
+        self.encoder = _value_encoder(annotation)
+
+
+class ClassSchema(object):
+    def __init__(self, cls):
+        self.cls = cls
+        self.name = cls.__name__
+        self.fields = [FieldSchema(fname, fdef.outer_type_) for fname, fdef in cls.__fields__.items() if fname != 'id']
+        self.field_names = [f.name for f in self.fields]
+        self.ref_fields = {f.name: f.ref_shape for f in self.fields if f.ref_shape}
+        self.wrapped = Wrapped(cls)
+        self._class_def = [{'Name': f.name, 'Typename': f.cs_type} for f in self.fields]
+        self._columns = [(f.name, f.encoder) for f in self.fields]
+
+    def class_def(self) -> dict:
+        return dict(
+            Name=self.name,
+            Fields=[dict(f) for f in self._class_def]
+        )
+
+    def instance_to_json(self, data_inst) -> dict:
+        values = data_inst.__dict__
+        return dict(
+            Name=data_inst.id,
+            Fields=[{'Name': fname, 'Value': values[fname] if encoder is None else encoder(values[fname])}
+                    for fname, encoder in self._columns]
+        )
+
+    def instances_to_json(self, data_insts: typing.Iterable) -> typing.List[dict]:
+        return list(self.iter_instances_json(data_insts))
+
+    def iter_instances_json(self, data_insts: typing.Iterable, batch_size: int = 4096):
+        if not isinstance(data_insts, CompactRows):
+            for data_inst in data_insts:
+                yield self.instance_to_json(data_inst)
+            return
+        # compact rows are read column by column, a batch at a time
+        indices = data_insts.indices
+        for start in range(0, len(indices), batch_size):
+            batch = CompactRows(data_insts.store, indices[start:start + batch_size])
+            columns = [(fname, self._encode_column(batch, fname, encoder)) for fname, encoder in self._columns]
+            for j, id_ in enumerate(batch.ids()):
+                yield dict(
+                    Name=id_,
+                    Fields=[{'Name': fname, 'Value': column[j]} for fname, column in columns]
+                )
+
+    @staticmethod
+    def _encode_column(rows: CompactRows, fname: str, encoder) -> list:
+        column = rows.column(fname)
+        return column if encoder is None else [encoder(v) for v in column]
+
+    def instances_to_table(self, data_insts: typing.Iterable) -> dict:
+        if isinstance(data_insts, CompactRows):
+            return dict(Fields=list(self.field_names), Names=data_insts.ids(),
+                        Columns=[self._encode_column(data_insts, fname, encoder) for fname, encoder in self._columns])
+        names = []
+        rows = []
+        for data_inst in data_insts:
+            names.append(data_inst.id)
+            rows.append(data_inst.__dict__)
+        columns = [[values[fname] for values in rows] if encoder is None else [encoder(values[fname]) for values in rows]
+                   for fname, encoder in self._columns]
+        return dict(Fields=list(self.field_names), Names=names, Columns=columns)
+
+
+_schemas = weakref.WeakKeyDictionary()
+
+
+def compile_schema(cls) -> ClassSchema:
+    try:
+        return _schemas[cls]
+    except KeyError:
+        schema = _schemas[cls] = ClassSchema(cls)
+        return schema
@@ -0,0 +1,385 @@
+import ast
+import importlib
+import pathlib
+import re
+import typing
+
+from {{ cookiecutter.project_slug }}.sdk.models.data import DataRef
+
+
+_SDK_MODELS_PATH = pathlib.Path(__file__).parent.joinpath('models')
+_ULID_RE = re.compile(r'^[0-7][0-9A-HJKMNP-TV-Z]{25}$')
+
+_BUILTIN_TYPES = {
+    'int': ('int', 'int'),
+    'str': ('str', 'string'),
+    'float': ('float', 'float'),
+    'bool': ('bool', 'bool')
+}
+_GENERICS = {
+    'List': 'list',
+    'list': 'list',
+    'Dict': 'dict',
+    'dict': 'dict',
+    'Optional': 'optional',
+    'DataRef': 'ref'
+}
+_TYPING_GENERICS = ('List', 'Dict', 'Optional')
+_ROOT_CLASSES = {
+    'BaseData': ('data', [('id', ('str', 'string'))]),
+    'DataModel': ('model', [])
+}
+
+
+class _StaticFallback(Exception):
+    pass
+
+
+def _literal(node):
+    try:
+        return ast.literal_eval(node)
+    except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+        raise _StaticFallback()
+
+
+def cs_type(spec) -> str:
+    kind = spec[0]
+    if kind in ('int', 'str', 'float', 'bool', 'ulid'):
+        return spec[1]
+    elif kind == 'list':
+        return f"List<{cs_type(spec[1])}>"
+    elif kind == 'dict':
+        return f"Dict<{cs_type(spec[1])}, {cs_type(spec[2])}>"
+    elif kind in ('ref', 'optional'):
+        return cs_type(spec[1])
+    return spec[1]
+
+
+def ref_shape(spec):
+    # same shapes as sdk.refs.ref_shape, from a static type spec
+    kind = spec[0]
+    if kind == 'ref':
+        return 'ref'
+    elif kind == 'optional':
+        return ref_shape(spec[1])
+    elif kind == 'list':
+        shape = ref_shape(spec[1])
+        return ['list', shape] if shape else None
+    elif kind == 'dict':
+        key_shape, value_shape = ref_shape(spec[1]), ref_shape(spec[2])
+        return ['dict', key_shape, value_shape] if key_shape or value_shape else None
+    return None
+
+
+def _check_value(spec, v):
+    kind = spec[0]
+    if kind == 'int' and type(v) is int:
+        return v
+    elif kind == 'str' and type(v) is str:
+        return v
+    elif kind == 'float' and type(v) in (int, float):
+        return float(v)
+    elif kind == 'bool' and type(v) is bool:
+        return v
+    elif kind == 'ulid' and type(v) is str and _ULID_RE.match(v):
+        return v
+    elif kind == 'ref' and type(v) is str:
+        try:
+            DataRef.validate_ref(v)
+        except (TypeError, ValueError):
+            raise _StaticFallback()
+        return v
+    elif kind == 'list' and type(v) in (list, tuple):
+        return [_check_value(spec[1], x) for x in v]
+    elif kind == 'dict' and type(v) is dict:
+        return {str(_check_value(spec[1], k)): _check_value(spec[2], x) for k, x in v.items()}
+    elif kind == 'optional':
+        return None if v is None else _check_value(spec[1], v)
+    raise _StaticFallback()
+
+
+def _sdk_new_types() -> typing.Dict[str, tuple]:
+    new_types = {'Ulid': ('ulid', 'Ulid')}
+    tree = ast.parse(_SDK_MODELS_PATH.joinpath('types.py').read_bytes())
+    for stmt in tree.body:
+        if isinstance(stmt, ast.Assign) and isinstance(stmt.value, ast.Call):
+            func = stmt.value.func
+            func_name = func.attr if isinstance(func, ast.Attribute) else getattr(func, 'id', None)
+            if func_name == 'NewType' and len(stmt.value.args) == 2 and isinstance(stmt.value.args[1], ast.Name):
+                name = stmt.targets[0].id
+                base = _BUILTIN_TYPES.get(stmt.value.args[1].id)
+                if base is not None:
+                    new_types[name] = (base[0], name.lower())
+    return new_types
+
+
+def _star_names(module) -> typing.List[str]:
+    # the names `from module import *` binds
+    names = getattr(module, '__all__', None)
+    if names is None:
+        names = [name for name in vars(module) if not name.startswith('_')]
+    return list(names)
+
+
+class _ModuleInfo(object):
+    def __init__(self, module_name: str, tree: ast.Module):
+        self.module_name = module_name
+        self.tree = tree
+        self.classes = {}
+        # module level names in binding order, a later import shadows an earlier class or import like at runtime
+        self.names = {}
+        # a star import from a project module may bind any name
+        self.star_project = False
+
+
+class StaticExtractor(object):
+    def __init__(self, package_name: str, files: typing.Dict[str, pathlib.Path]):
+        self._package_name = package_name
+        self._sdk_name = package_name.split('.')[0] + '.sdk'
+        self._files = files
+        self._modules = {}
+        self._resolved = {}
+        self._new_types = _sdk_new_types()
+        # sdk objects by identity, so that a name resolves to what the import would bind, whatever module it came from
+        sdk_types = importlib.import_module(self._sdk_name + '.models.types')
+        self._known = {id(getattr(typing, name)): name for name in _TYPING_GENERICS}
+        self._known[id(DataRef)] = 'DataRef'
+        self._known.update((id(getattr(sdk_types, name)), name) for name in self._new_types if hasattr(sdk_types, name))
+        self._sdk_classes = dict(_ROOT_CLASSES)
+        self._load_sdk_classes()
+
+    def _load_sdk_classes(self):
+        module_name = self._sdk_name + '.models.models'
+        info = self._module_info(module_name, ast.parse(_SDK_MODELS_PATH.joinpath('models.py').read_bytes()), False)
+        for stmt in info.tree.body:
+            if isinstance(stmt, ast.ClassDef) and stmt.name not in self._sdk_classes:
+                try:
+                    self._sdk_classes[stmt.name] = self._class_spec(info, stmt)
+                except _StaticFallback:
+                    pass
+        sdk_models = importlib.import_module(self._sdk_name + '.models')
+        for name in self._sdk_classes:
+            cls = getattr(sdk_models, name, None) or getattr(importlib.import_module(module_name), name, None)
+            if cls is not None:
+                self._known[id(cls)] = name
+
+    def _sdk_ref(self, obj):
+        if obj is typing:
+            return ('module', 'typing')
+        name = self._known.get(id(obj))
+        return ('sdk', name) if name is not None else ('unknown', )
+
+    def _sdk_module(self, module_name: str):
+        try:
+            return importlib.import_module(module_name)
+        except ImportError:
+            return None
+
+    def _parse(self, module_name: str) -> typing.Optional[_ModuleInfo]:
+        if module_name in self._modules:
+            return self._modules[module_name]
+        info = None
+        fpath = self._files.get(module_name)
+        if fpath is not None:
+            try:
+                info = self._module_info(module_name, ast.parse(fpath.read_bytes()), fpath.name == '__init__.py')
+            except SyntaxError:
+                info = None
+        self._modules[module_name] = info
+        return info
+
+    def _module_info(self, module_name: str, tree: ast.Module, is_package: bool) -> _ModuleInfo:
+        info = _ModuleInfo(module_name, tree)
+        for stmt in tree.body:
+            if isinstance(stmt, ast.ClassDef):
+                info.classes[stmt.name] = stmt
+                info.names[stmt.name] = ('project', module_name, stmt.name)
+            elif isinstance(stmt, ast.Import):
+                for alias in stmt.names:
+                    if alias.name == 'typing':
+                        info.names[alias.asname or 'typing'] = ('module', 'typing')
+                    else:
+                        info.names[alias.asname or alias.name.split('.')[0]] = ('unknown', )
+            elif isinstance(stmt, ast.ImportFrom):
+                if stmt.level:
+                    parts = module_name.split('.')
+                    base = parts[:len(parts) - stmt.level + (1 if is_package else 0)]
+                    mod = '.'.join(base + ([stmt.module] if stmt.module else []))
+                else:
+                    mod = stmt.module or ''
+                is_sdk = mod == self._sdk_name or mod.startswith(self._sdk_name + '.')
+                module = typing if mod == 'typing' else self._sdk_module(mod) if is_sdk else None
+                for alias in stmt.names:
+                    local_name = alias.asname or alias.name
+                    if module is not None and alias.name == '*':
+                        for name in _star_names(module):
+                            info.names[name] = self._sdk_ref(getattr(module, name))
+                    elif module is not None:
+                        info.names[local_name] = self._sdk_ref(getattr(module, alias.name, None))
+                    elif is_sdk or mod == 'typing':
+                        # the import fails, let it report that
+                        info.names[local_name] = ('unknown', )
+                    elif alias.name == '*':
+                        info.star_project = True
+                    else:
+                        info.names[local_name] = ('project', mod, alias.name)
+        return info
+
+    def _lookup(self, info: _ModuleInfo, name: str):
+        ref = info.names.get(name)
+        if ref is not None:
+            if ref[0] == 'unknown':
+                raise _StaticFallback()
+            return ref
+        if not info.star_project and (name in _BUILTIN_TYPES or name in ('list', 'dict')):
+            return ('builtin', name)
+        raise _StaticFallback()
+
+    def _resolve_class(self, module_name: str, name: str):
+        key = (module_name, name)
+        if key in self._resolved:
+            if self._resolved[key] is None:
+                raise _StaticFallback()
+            return self._resolved[key]
+        # guards against cyclic inheritance while resolving
+        self._resolved[key] = None
+        info = self._parse(module_name)
+        if info is None or name not in info.classes or info.names.get(name) != ('project', module_name, name):
+            raise _StaticFallback()
+        spec = self._class_spec(info, info.classes[name])
+        self._resolved[key] = spec
+        return spec
+
+    def _base_spec(self, info: _ModuleInfo, node):
+        if not isinstance(node, ast.Name):
+            raise _StaticFallback()
+        ref = self._lookup(info, node.id)
+        if ref[0] == 'sdk' and ref[1] in self._sdk_classes:
+            return self._sdk_classes[ref[1]]
+        elif ref[0] == 'project':
+            return self._resolve_class(ref[1], ref[2])
+        raise _StaticFallback()
+
+    def _class_spec(self, info: _ModuleInfo, node: ast.ClassDef):
+        if len(node.bases) != 1 or node.keywords or node.decorator_list:
+            raise _StaticFallback()
+        kind, base_fields = self._base_spec(info, node.bases[0])
+        fields = list(base_fields)
+        for stmt in node.body:
+            if isinstance(stmt, ast.AnnAssign) and isinstance(stmt.target, ast.Name) and not stmt.target.id.startswith('_'):
+                if stmt.value is not None:
+                    _literal(stmt.value)
+                spec = self._type_spec(info, stmt.annotation)
+                fname = stmt.target.id
+                for i, (name, _) in enumerate(fields):
+                    if name == fname:
+                        fields[i] = (fname, spec)
+                        break
+                else:
+                    fields.append((fname, spec))
+            elif isinstance(stmt, ast.Assign) and all(isinstance(t, ast.Name) and t.id.startswith('_') for t in stmt.targets):
+                _literal(stmt.value)
+            elif isinstance(stmt, ast.Pass):
+                continue
+            elif isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Constant) and isinstance(stmt.value.value, str):
+                continue
+            else:
+                raise _StaticFallback()
+        return kind, fields
+
+    def _generic_name(self, info: _ModuleInfo, node) -> str:
+        if isinstance(node, ast.Name):
+            ref = self._lookup(info, node.id)
+        elif isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) \
+                and self._lookup(info, node.value.id) == ('module', 'typing'):
+            ref = self._sdk_ref(getattr(typing, node.attr, None))
+        else:
+            raise _StaticFallback()
+        if ref[0] not in ('sdk', 'builtin') or ref[1] not in _GENERICS:
+            raise _StaticFallback()
+        return _GENERICS[ref[1]]
+
+    def _type_spec(self, info: _ModuleInfo, node, nested=False):
+        if isinstance(node, ast.Name):
+            ref = self._lookup(info, node.id)
+            if ref[0] == 'builtin' and ref[1] in _BUILTIN_TYPES:
+                return _BUILTIN_TYPES[ref[1]]
+            elif ref[0] == 'sdk' and ref[1] in self._new_types:
+                return self._new_types[ref[1]]
+            elif ref[0] == 'project':
+                self._resolve_class(ref[1], ref[2])
+                return ('class', ref[2])
+        elif isinstance(node, ast.Subscript):
+            generic = self._generic_name(info, node.value)
+            args = node.slice.elts if isinstance(node.slice, ast.Tuple) else [node.slice]
+            if generic == 'list' and len(args) == 1:
+                return ('list', self._type_spec(info, args[0], nested=True))
+            elif generic == 'dict' and len(args) == 2:
+                return ('dict', self._type_spec(info, args[0], nested=True), self._type_spec(info, args[1], nested=True))
+            elif generic == 'ref' and len(args) == 1:
+                return ('ref', self._type_spec(info, args[0], nested=True))
+            elif generic == 'optional' and len(args) == 1 and not nested:
+                return ('optional', self._type_spec(info, args[0], nested=True))
+        raise _StaticFallback()
+
+    def _define_row(self, info: _ModuleInfo, call: ast.Call):
+        func = call.func
+        if not (isinstance(func, ast.Attribute) and func.attr == 'define' and isinstance(func.value, ast.Name)):
+            raise _StaticFallback()
+        if call.args or any(kw.arg is None for kw in call.keywords):
+            raise _StaticFallback()
+        ref = self._lookup(info, func.value.id)
+        if ref[0] != 'project':
+            raise _StaticFallback()
+        kind, fields = self._resolve_class(ref[1], ref[2])
+        if kind != 'data':
+            raise _StaticFallback()
+        kwargs = {kw.arg: kw.value for kw in call.keywords}
+        values = {}
+        for fname, spec in fields:
+            if fname not in kwargs:
+                raise _StaticFallback()
+            values[fname] = _check_value(spec, _literal(kwargs[fname]))
+        row = dict(
+            Name=values['id'],
+            Fields=[{'Name': fname, 'Value': values[fname]} for fname, _ in fields if fname != 'id']
+        )
+        return ref[2], row
+
+    def extract(self, module_name: str) -> typing.Optional[dict]:
+        info = self._parse(module_name)
+        if info is None:
+            return None
+        try:
+            classes = []
+            for name in sorted(info.classes):
+                kind, fields = self._resolve_class(module_name, name)
+                j = dict(Name=name, Fields=[{'Name': fname, 'Typename': cs_type(spec)} for fname, spec in fields if fname != 'id'])
+                refs = {fname: ref_shape(spec) for fname, spec in fields if fname != 'id' and ref_shape(spec)}
+                classes.append({'kind': kind, 'def': j, 'refs': refs})
+            #
+            instances = {}
+            linenos = {}
+            seen = set()
+            for stmt in info.tree.body:
+                if isinstance(stmt, (ast.Import, ast.ImportFrom, ast.ClassDef, ast.Pass)):
+                    continue
+                elif isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Constant) and isinstance(stmt.value.value, str):
+                    continue
+                elif isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Call):
+                    call = stmt.value
+                elif isinstance(stmt, ast.Assign) and len(stmt.targets) == 1 and isinstance(stmt.targets[0], ast.Name) \
+                        and isinstance(stmt.value, ast.Call):
+                    call = stmt.value
+                else:
+                    raise _StaticFallback()
+                cls_name, row = self._define_row(info, call)
+                if (cls_name, row['Name']) in seen:
+                    # let the import report the duplicate
+                    raise _StaticFallback()
+                seen.add((cls_name, row['Name']))
+                instances.setdefault(cls_name, []).append(row)
+                linenos.setdefault(cls_name, []).append(stmt.lineno)
+        except (_StaticFallback, RecursionError):
+            return None
+        return dict(classes=classes, instances=instances, linenos=linenos, inventories={}, new_inventories=[])
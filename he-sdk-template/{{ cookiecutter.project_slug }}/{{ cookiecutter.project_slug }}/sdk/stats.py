@@ -0,0 +1,52 @@
+import collections
+import threading
+
+
+class LatencyStats(object):
+    def __init__(self, window=1024):
+        self._lock = threading.Lock()
+        self._samples = collections.deque(maxlen=window)
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, elapsed: float):
+        with self._lock:
+            self.count += 1
+            self.total += elapsed
+            self.min = elapsed if self.min is None else min(self.min, elapsed)
+            self.max = elapsed if self.max is None else max(self.max, elapsed)
+            self._samples.append(elapsed)
+
+    def add_error(self):
+        with self._lock:
+            self.errors += 1
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def percentile(self, p: float):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        idx = min(len(samples) - 1, int(round(p / 100.0 * (len(samples) - 1))))
+        return samples[idx]
+
+    def to_dict(self):
+        return dict(
+            count=self.count,
+            errors=self.errors,
+            total=self.total,
+            min=self.min,
+            max=self.max,
+            mean=self.mean,
+            p50=self.percentile(50),
+            p95=self.percentile(95)
+        )
+
+    def __repr__(self):
+        return f'LatencyStats({self.to_dict()})'
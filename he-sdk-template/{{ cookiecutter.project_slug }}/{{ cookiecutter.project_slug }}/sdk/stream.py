@@ -0,0 +1,63 @@
+import json
+import typing
+
+
+# JSON array/object whose items are only produced while it is being written
+
+
+class StreamList(object):
+    def __init__(self, items: typing.Iterable):
+        self.items = items
+
+
+class StreamDict(object):
+    def __init__(self, items: typing.Iterable[typing.Tuple[str, typing.Any]]):
+        self.items = items
+
+
+def materialize(value):
+    if isinstance(value, StreamList):
+        return [materialize(v) for v in value.items]
+    elif isinstance(value, StreamDict):
+        return {k: materialize(v) for k, v in value.items}
+    return value
+
+
+def iter_json(value, indent: typing.Optional[int] = None, default=None, level: int = 0) -> typing.Iterator[str]:
+    # same text as json.dumps(materialize(value), indent=indent, default=default)
+    if not isinstance(value, (StreamList, StreamDict)):
+        text = json.dumps(value, indent=indent, default=default)
+        if indent is not None and level:
+            text = text.replace('\n', '\n' + ' ' * (indent * level))
+        yield text
+        return
+    is_dict = isinstance(value, StreamDict)
+    open_char, close_char = ('{', '}') if is_dict else ('[', ']')
+    if indent is None:
+        item_sep, first_sep, last_sep = ', ', '', ''
+    else:
+        first_sep = '\n' + ' ' * (indent * (level + 1))
+        item_sep = ',' + first_sep
+        last_sep = '\n' + ' ' * (indent * level)
+    empty = True
+    for item in value.items:
+        yield open_char + first_sep if empty else item_sep
+        empty = False
+        if is_dict:
+            key, item = item
+            yield json.dumps(str(key)) + ': '
+        yield from iter_json(item, indent=indent, default=default, level=level + 1)
+    yield open_char + close_char if empty else last_sep + close_char
+
+
+def write_json(value, fp, indent: typing.Optional[int] = None, default=None, buffer_size: int = 1 << 16):
+    buf = []
+    size = 0
+    for chunk in iter_json(value, indent=indent, default=default):
+        buf.append(chunk)
+        size += len(chunk)
+        if size >= buffer_size:
+            fp.write(''.join(buf))
+            buf = []
+            size = 0
+    fp.write(''.join(buf))
@@ -0,0 +1,85 @@
+import random
+import requests
+import threading
+import time
+import typing
+import urllib.parse
+from requests.adapters import HTTPAdapter
+
+from .stats import LatencyStats
+
+
+_IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+_RETRY_STATUSES = frozenset([429, 502, 503, 504])
+
+
+class HttpTransport(object):
+    def __init__(self,
+                 pool_size: int = 10,
+                 timeout: typing.Tuple[float, float] = (5.0, 60.0),
+                 retries: int = 3,
+                 backoff: float = 0.5,
+                 backoff_max: float = 10.0):
+        self._timeout = timeout
+        self._retries = retries
+        self._backoff = backoff
+        self._backoff_max = backoff_max
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        self._stats_lock = threading.Lock()
+        self._stats = {}
+
+    @property
+    def session(self) -> requests.Session:
+        return self._session
+
+    @property
+    def stats(self) -> typing.Dict[str, LatencyStats]:
+        return dict(self._stats)
+
+    def close(self):
+        self._session.close()
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def request(self, method: str, url: str, retry: typing.Optional[bool] = None, **kwargs) -> requests.Response:
+        if retry is None:
+            retry = method.upper() in _IDEMPOTENT_METHODS
+        kwargs.setdefault('timeout', self._timeout)
+        attempts = self._retries + 1 if retry else 1
+        stats = self._get_stats(method, url)
+        for attempt in range(attempts):
+            is_last = attempt == attempts - 1
+            t_start = time.perf_counter()
+            try:
+                resp = self._session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                stats.add_error()
+                if is_last:
+                    raise
+                self._sleep(attempt)
+                continue
+            stats.add(time.perf_counter() - t_start)
+            if resp.status_code in _RETRY_STATUSES and not is_last:
+                resp.close()
+                self._sleep(attempt)
+                continue
+            return resp
+
+    def _sleep(self, attempt: int):
+        # full jitter, so that concurrent callers don't retry in lockstep
+        time.sleep(random.uniform(0, min(self._backoff_max, self._backoff * (2 ** attempt))))
+
+    def _get_stats(self, method: str, url: str) -> LatencyStats:
+        key = f'{method.upper()} {urllib.parse.urlsplit(url).path}'
+        stats = self._stats.get(key)
+        if stats is None:
+            with self._stats_lock:
+                stats = self._stats.setdefault(key, LatencyStats())
+        return stats
@@ -0,0 +1,193 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+import typing
+
+
+# File change notifications for a source tree: inotify through libc where there is one, polling otherwise
+
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_IGNORED = 0x00008000
+_IN_ISDIR = 0x40000000
+_IN_MASK = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE | _IN_DELETE_SELF
+
+_EVENT = struct.Struct('iIII')
+
+
+def _is_source(path: str) -> bool:
+    return path.endswith('.py')
+
+
+def _is_source_dir(name: str) -> bool:
+    return name != '__pycache__' and not name.startswith('.')
+
+
+def _source_dirs(root: str) -> typing.Iterator[str]:
+    for dirpath, dirnames, _ in os.walk(root):
+        dirnames[:] = [d for d in dirnames if _is_source_dir(d)]
+        yield dirpath
+
+
+class _InotifyBackend(object):
+    name = 'inotify'
+
+    def __init__(self, root: str):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        # AttributeError on systems without inotify, the caller falls back to polling
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        # wd -> (directory, whether it's in the source tree or only holds watched files)
+        self._dirs = {}
+        self._files = set()
+        for path in _source_dirs(root):
+            self._watch(path)
+
+    def _watch(self, path: str, tree: bool = True):
+        wd = self._add_watch(self._fd, os.fsencode(path), _IN_MASK)
+        if wd >= 0:
+            self._dirs[wd] = (path, tree or self._dirs.get(wd, (None, False))[1])
+
+    def add_files(self, paths: typing.Iterable[str]):
+        for path in paths:
+            self._files.add(path)
+            self._watch(os.path.dirname(path), tree=False)
+
+    def wait(self, timeout: typing.Optional[float]) -> typing.Set[str]:
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+        try:
+            data = os.read(self._fd, 1 << 16)
+        except BlockingIOError:
+            return set()
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, name_len = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = os.fsdecode(data[offset:offset + name_len].rstrip(b'\0'))
+            offset += name_len
+            if mask & _IN_IGNORED:
+                self._dirs.pop(wd, None)
+                continue
+            if wd not in self._dirs:
+                continue
+            dirpath, tree = self._dirs[wd]
+            path = os.path.join(dirpath, name) if name else dirpath
+            if path in self._files:
+                changed.add(path)
+            elif not tree:
+                continue
+            elif mask & _IN_ISDIR:
+                if not _is_source_dir(name):
+                    # e.g. the __pycache__ the next import creates
+                    continue
+                if mask & (_IN_CREATE | _IN_MOVED_TO):
+                    # files can land in a new directory before it's watched, so it counts as changed itself
+                    for sub in _source_dirs(path):
+                        self._watch(sub)
+                changed.add(path)
+            elif _is_source(path):
+                changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self._fd)
+
+
+class _PollingBackend(object):
+    name = 'polling'
+
+    def __init__(self, root: str, interval: float = 0.5):
+        self._root = root
+        self._interval = interval
+        self._files = set()
+        self._stamps = self._scan()
+
+    def add_files(self, paths: typing.Iterable[str]):
+        new_files = set(paths) - self._files
+        self._files.update(new_files)
+        stamps = self._scan()
+        for path in new_files:
+            if path in stamps:
+                self._stamps[path] = stamps[path]
+
+    def _scan(self) -> typing.Dict[str, typing.Tuple[int, int]]:
+        stamps = {}
+        for dirpath in _source_dirs(self._root):
+            for entry in os.scandir(dirpath):
+                if entry.is_file() and _is_source(entry.name):
+                    st = entry.stat()
+                    stamps[entry.path] = (st.st_mtime_ns, st.st_size)
+        for path in self._files:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            stamps[path] = (st.st_mtime_ns, st.st_size)
+        return stamps
+
+    def wait(self, timeout: typing.Optional[float]) -> typing.Set[str]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            stamps = self._scan()
+            changed = set(path for path in set(stamps) | set(self._stamps) if stamps.get(path) != self._stamps.get(path))
+            self._stamps = stamps
+            if changed:
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+            time.sleep(self._interval if deadline is None else max(0.0, min(self._interval, deadline - time.monotonic())))
+
+    def close(self):
+        pass
+
+
+class Watcher(object):
+    def __init__(self, root, debounce: float = 0.3, poll: bool = False, poll_interval: float = 0.5):
+        self._debounce = debounce
+        self._backend = None
+        if not poll:
+            try:
+                self._backend = _InotifyBackend(str(root))
+            except (OSError, AttributeError):
+                self._backend = None
+        if self._backend is None:
+            self._backend = _PollingBackend(str(root), poll_interval)
+
+    @property
+    def backend(self) -> str:
+        return self._backend.name
+
+    def watch_files(self, paths: typing.Iterable[str]):
+        # files outside the tree, or with other extensions, that also count as changes
+        self._backend.add_files([os.path.abspath(path) for path in paths])
+
+    def changes(self) -> typing.Iterator[typing.List[str]]:
+        # a burst of saves comes out as one batch, once nothing changed for `debounce` seconds
+        while True:
+            batch = self._backend.wait(None)
+            if not batch:
+                continue
+            while True:
+                more = self._backend.wait(self._debounce)
+                if not more:
+                    break
+                batch |= more
+            yield sorted(batch)
+
+    def close(self):
+        self._backend.close()
@@ -1,10 +1,14 @@
+import concurrent.futures
 import json
 import pydantic
-import sys
-import multiprocessing
+import random
 import threading
+import time
+import typing
 import websocket
 
+from .stats import LatencyStats
+
 
 class JobData(pydantic.BaseModel):
     job_id: str
@@ -19,40 +23,87 @@ def _get_ws_job_id(v):
     return parts[1] if len(parts) == 2 else None
 
 
-def _ws_listener(ws, queue: multiprocessing.Queue):
-    while True:
-        try:
-            msg = ws.recv()
-            if not msg:
-                continue
-            jmsg = json.loads(msg)
-            if jmsg['event'] == 'message':
-                job_id = _get_ws_job_id(jmsg.get('subscription'))
-                if not job_id:
-                    continue
-                print(jmsg)
-                is_success = jmsg['data'].get('status') == 'success'
-                job_data = JobData(job_id=job_id, success=is_success, retval=jmsg['data'].get('retval'))
-                print(job_data)
-                queue.put(job_data)
-        except websocket.WebSocketConnectionClosedException:
-            # handle connection closed, probably break the loop
-            print("Connection closed")
-            sys.exit(0)
-        except Exception as e:
-            print("Other error occured. {}".format(e))
-            sys.exit(0)
+def _copy_outcome(source: concurrent.futures.Future, dest: concurrent.futures.Future):
+    if dest.done():
+        return
+    try:
+        error = source.exception()
+        if error is None:
+            dest.set_result(source.result())
+        else:
+            dest.set_exception(error)
+    except concurrent.futures.CancelledError:
+        dest.cancel()
+    except concurrent.futures.InvalidStateError:
+        # the caller cancelled its future meanwhile
+        pass
+
+
+class _JobDispatcher(object):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._futures = {}
+
+    def future(self, job_id: str) -> concurrent.futures.Future:
+        with self._lock:
+            fut = self._futures.get(job_id)
+            if fut is None:
+                fut = self._futures[job_id] = concurrent.futures.Future()
+            return fut
+
+    def resolve(self, job_data: JobData):
+        # a job nobody waits for any more, e.g. a repeated message, is ignored
+        with self._lock:
+            fut = self._futures.get(job_data.job_id)
+        if fut is not None and not fut.done():
+            fut.set_result(job_data)
+
+    def release(self, job_id: str):
+        with self._lock:
+            self._futures.pop(job_id, None)
+
+    def fail_pending(self, error: Exception):
+        with self._lock:
+            futures = list(self._futures.values())
+        for fut in futures:
+            if not fut.done():
+                fut.set_exception(error)
 
 
 class HeWsClient(object):
-    def __init__(self, url: str, ticket: str):
+    def __init__(self, url: str, ticket: str,
+                 ticket_provider: typing.Optional[typing.Callable[[], str]] = None,
+                 ping_interval: float = 20.0,
+                 ping_timeout: float = 10.0,
+                 reconnect_attempts: int = 10,
+                 backoff: float = 0.5,
+                 backoff_max: float = 30.0):
         self._url = url
-        self._mgr = multiprocessing.Manager()
-        self._queue = self._mgr.Queue()
+        self._ticket = ticket
+        self._ticket_provider = ticket_provider
+        self._ping_interval = ping_interval
+        self._ping_timeout = ping_timeout
+        self._reconnect_attempts = reconnect_attempts
+        self._backoff = backoff
+        self._backoff_max = backoff_max
+        self._dispatcher = _JobDispatcher()
+        self._subscriptions = set()
+        self._send_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._error = None
+        # ping payload -> send time, written by the heartbeat and read by the listener
+        self._pings = {}
+        self._pings_lock = threading.Lock()
+        self._ping_seq = 0
+        self._latency = LatencyStats()
+        self._reconnects = 0
         self._ws = websocket.create_connection(self._url)
-        self._thread = threading.Thread(target=_ws_listener, args=(self._ws, self._queue,), daemon=True)
+        self._thread = threading.Thread(target=self._listen, daemon=True)
         self._thread.start()
-        self._job_results = {}
+        self._heartbeat_thread = None
+        if ping_interval:
+            self._heartbeat_thread = threading.Thread(target=self._heartbeat, daemon=True)
+            self._heartbeat_thread.start()
         #
         self.auth(ticket)
 
@@ -60,18 +111,168 @@ class HeWsClient(object):
     def url(self):
         return self._url
 
+    @property
+    def latency(self) -> LatencyStats:
+        return self._latency
+
+    @property
+    def stats(self) -> dict:
+        return dict(
+            reconnects=self._reconnects,
+            pending_jobs=len(self._pending_jobs()),
+            rtt=self._latency.to_dict()
+        )
+
+    def close(self):
+        self._closed.set()
+        self._ws.close()
+        # nobody would resolve the jobs still waited for
+        self._fail(ConnectionError(f"Websocket connection to {self._url} closed"))
+
     def auth(self, ticket):
-        self._ws.send(json.dumps({'event': 'auth', 'method': 'ticket', 'ticket': ticket}))
+        self._send({'event': 'auth', 'method': 'ticket', 'ticket': ticket})
+
+    def _send(self, msg: dict):
+        if self._error is not None:
+            raise self._error
+        with self._send_lock:
+            self._ws.send(json.dumps(msg))
 
     def _subscribe_for_job(self, job_id):
-        self._ws.send(json.dumps({"event": "subscribe", "subscription": f"jobs.{job_id}"}))
+        if self._error is not None:
+            raise self._error
+        with self._send_lock:
+            if job_id in self._subscriptions:
+                return
+            self._subscriptions.add(job_id)
+            try:
+                self._ws.send(json.dumps({"event": "subscribe", "subscription": f"jobs.{job_id}"}))
+            except (websocket.WebSocketException, OSError):
+                # the listener is reconnecting and will resubscribe all pending jobs
+                pass
 
-    def wait_for_job(self, job_id: str):
-        self._subscribe_for_job(job_id)
-        #
-        job_data = self._job_results.get(job_id)
-        while job_data is None:
-            q_job_data = self._queue.get()
-            self._job_results[q_job_data.job_id] = q_job_data
-            job_data = self._job_results.get(job_id)
-        return job_data
+    def _pending_jobs(self) -> typing.List[str]:
+        # finished jobs are dropped by _forget_job
+        return list(self._subscriptions)
+
+    def _forget_job(self, job_id: str):
+        # the caller holds the future, so a finished job needs neither its entry nor a resubscription
+        self._dispatcher.release(job_id)
+        self._subscriptions.discard(job_id)
+
+    def _handle_message(self, msg):
+        jmsg = json.loads(msg)
+        if jmsg['event'] == 'message':
+            job_id = _get_ws_job_id(jmsg.get('subscription'))
+            if not job_id:
+                return
+            print(jmsg)
+            is_success = jmsg['data'].get('status') == 'success'
+            job_data = JobData(job_id=job_id, success=is_success, retval=jmsg['data'].get('retval'))
+            print(job_data)
+            self._dispatcher.resolve(job_data)
+
+    def _handle_pong(self, payload: bytes):
+        with self._pings_lock:
+            sent_at = self._pings.pop(payload.decode('utf-8', 'ignore'), None)
+        if sent_at is not None:
+            self._latency.add(time.perf_counter() - sent_at)
+
+    def _listen(self):
+        while not self._closed.is_set():
+            ws = self._ws
+            try:
+                opcode, frame = ws.recv_data_frame(True)
+                if opcode == websocket.ABNF.OPCODE_CLOSE:
+                    raise websocket.WebSocketConnectionClosedException("Connection closed by server")
+                elif opcode == websocket.ABNF.OPCODE_PONG:
+                    self._handle_pong(frame.data)
+                elif opcode == websocket.ABNF.OPCODE_TEXT and frame.data:
+                    self._handle_message(frame.data.decode('utf-8'))
+            except (websocket.WebSocketException, OSError) as e:
+                if self._closed.is_set():
+                    return
+                print(f"Connection lost: {e}")
+                if not self._reconnect():
+                    self._fail(ConnectionError(f"Websocket connection to {self._url} lost"))
+                    return
+            except Exception as e:
+                print("Other error occured. {}".format(e))
+
+    def _reconnect(self) -> bool:
+        for attempt in range(self._reconnect_attempts):
+            time.sleep(random.uniform(0, min(self._backoff_max, self._backoff * (2 ** attempt))))
+            if self._closed.is_set():
+                return False
+            try:
+                ticket = self._ticket_provider() if self._ticket_provider else self._ticket
+                ws = websocket.create_connection(self._url)
+                with self._send_lock:
+                    self._ws = ws
+                    with self._pings_lock:
+                        self._pings.clear()
+                    ws.send(json.dumps({'event': 'auth', 'method': 'ticket', 'ticket': ticket}))
+                    for job_id in self._pending_jobs():
+                        ws.send(json.dumps({"event": "subscribe", "subscription": f"jobs.{job_id}"}))
+                self._reconnects += 1
+                print(f"Reconnected to {self._url}")
+                return True
+            except Exception as e:
+                print(f"Reconnect attempt {attempt + 1} failed: {e}")
+        return False
+
+    def _fail(self, error: Exception):
+        self._error = error
+        self._dispatcher.fail_pending(error)
+
+    def _heartbeat(self):
+        while not self._closed.wait(self._ping_interval):
+            if self._error is not None:
+                return
+            now = time.perf_counter()
+            with self._pings_lock:
+                timed_out = any(now - sent_at > self._ping_timeout for sent_at in self._pings.values())
+                if timed_out:
+                    self._pings.clear()
+            if timed_out:
+                # no pong in time, drop the socket so that the listener reconnects
+                self._ws.shutdown()
+                continue
+            self._ping_seq += 1
+            seq = str(self._ping_seq)
+            try:
+                with self._send_lock:
+                    with self._pings_lock:
+                        self._pings[seq] = time.perf_counter()
+                    self._ws.ping(seq)
+            except (websocket.WebSocketException, OSError):
+                pass
+
+    def job_future(self, job_id: str) -> concurrent.futures.Future:
+        # every caller gets its own future, so that one giving up on the job (cancelling it, e.g. an asyncio
+        # timeout) doesn't cancel it for the others
+        shared = self._dispatcher.future(job_id)
+        try:
+            self._subscribe_for_job(job_id)
+        except Exception:
+            self._forget_job(job_id)
+            raise
+        shared.add_done_callback(lambda _: self._forget_job(job_id))
+        fut = concurrent.futures.Future()
+        shared.add_done_callback(lambda _: _copy_outcome(shared, fut))
+        return fut
+
+    def wait_for_job(self, job_id: str, timeout: typing.Optional[float] = None) -> JobData:
+        return self.job_future(job_id).result(timeout=timeout)
+
+    def wait_for_jobs(self, job_ids: typing.Iterable[str], timeout: typing.Optional[float] = None) -> typing.List[JobData]:
+        futures = [self.job_future(job_id) for job_id in job_ids]
+        done, not_done = concurrent.futures.wait(futures, timeout=timeout)
+        if not_done:
+            raise concurrent.futures.TimeoutError(f"{len(not_done)} of {len(futures)} jobs are still running")
+        return [fut.result() for fut in futures]
+
+    def as_completed(self, job_ids: typing.Iterable[str], timeout: typing.Optional[float] = None) -> typing.Iterator[JobData]:
+        futures = [self.job_future(job_id) for job_id in job_ids]
+        for fut in concurrent.futures.as_completed(futures, timeout=timeout):
+            yield fut.result()